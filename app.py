@@ -1,67 +1,192 @@
-from flask import Flask, render_template, request, jsonify, send_file
-from audio_recorder import AudioRecorder
+import multiprocessing
+from flask import Flask, Response, abort, render_template, request, jsonify, send_file
 from tts_handler import TTSHandler
-from gpt_handler import GPTHandler
-import whisper
-import tempfile
-import os
-from config import SAMPLE_RATE, CHANNELS, ELEVEN_LABS_VOICE_ID, MAX_ROUNDS
+from sentence_segmenter import segment_stream
+from transcription import load_audio
+from transcription_queue import transcription_scheduler
+from audio_codec import AudioDecodeError
+from artifact_store import artifact_store
+from opening_cache import OpeningAudio
+from metrics import metrics
+from openai_scheduler import openai_scheduler, SchedulerBusy
+import debate_service as debates
+from config import (ELEVEN_LABS_VOICE_ID, SESSION_COOKIE_NAME, SESSION_TTL_SECONDS, SENTENCE_MIN_CHARS,
+                    SPECULATIVE_REBUTTALS, ARTIFACT_TTL_SECONDS, TTS_OUTPUT_FORMAT, TTS_OUTPUT_BITRATE)
 
 app = Flask(__name__)
 
-audio_recorder = AudioRecorder(SAMPLE_RATE, CHANNELS)
-gpt = GPTHandler()
-round_count = 1
-tts = TTSHandler()
-whisper_model = whisper.load_model("small")
+# The server never plays audio locally, so the mixer is skipped entirely
+tts = TTSHandler(playback=False, output_format=TTS_OUTPUT_FORMAT, output_bitrate=TTS_OUTPUT_BITRATE)
+# Spawned helper processes (e.g. pyttsx3 workers) re-import the main module; only the server itself warms up
+if multiprocessing.parent_process() is None:
+    debates.start_warmup(tts)
+
+def session_id():
+    return request.cookies.get(SESSION_COOKIE_NAME)
+
+def no_session_response():
+    return jsonify({'error': debates.NO_SESSION_ERROR}), 400
+
+@app.errorhandler(SchedulerBusy)
+def scheduler_busy(error):
+    """Shed load while the OpenAI queue is full rather than letting requests pile up."""
+    return jsonify({'error': debates.BUSY_ERROR}), 503, debates.busy_headers(error)
+
+def synthesize(text):
+    """Synthesize text and return the audio file."""
+    return tts.text_to_speech(text, ELEVEN_LABS_VOICE_ID)
+
+def wants_stream():
+    return request.form.get('stream') == '1'
+
+def stream_turn(session, user_input, closing=False, gpt=None, text=None, audio_file=None):
+    """Stream a response as newline-delimited JSON, one event per spoken sentence.
+
+    The first line carries the turn metadata, each following line a sentence
+    and its audio artifact id, and the last line marks the end of the turn
+    (or carries an error if the turn failed once streaming had started).
+    A response that is already known (e.g. a speculative draft or cached
+    opening) is only segmented and synthesized, or sent whole if its audio
+    is known too.
+    """
+    gpt = gpt or debates.gpt_for(session)
+    if text is None:
+        # Refuse now, while a 503 can still be sent instead of a truncated stream
+        openai_scheduler.ensure_capacity()
+        deltas = gpt.stream_response(user_input, round_number=session.round_count, is_closing=closing)
+    else:
+        deltas = [text]
+
+    generated_opening = user_input is None and text is None
+    opening_audio = OpeningAudio() if generated_opening else None
+
+    def events():
+        yield debates.turn_event(session, closing)
+        try:
+            if audio_file is not None:
+                yield debates.sentence_event(text, audio_file)
+            else:
+                sentences = segment_stream(deltas, SENTENCE_MIN_CHARS)
+                for sentence, sentence_audio in tts.stream_to_speech(sentences, ELEVEN_LABS_VOICE_ID):
+                    yield debates.sentence_event(sentence, sentence_audio, opening_audio)
+            debates.finish_turn(session, gpt, closing,
+                                gpt.conversation_history[-1]['content'] if generated_opening else None,
+                                opening_audio)
+        except Exception as e:
+            # The status line is already sent (e.g. the OpenAI queue timed out), so report it in-band
+            yield debates.error_event(e)
+            return
+        finally:
+            if opening_audio is not None:
+                opening_audio.discard()
+        yield debates.done_event()
+
+    return Response(events(), mimetype='application/x-ndjson')
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', speculative=SPECULATIVE_REBUTTALS)
 
 @app.route('/set_debate_context', methods=['POST'])
 def set_debate_context():
-    motion = request.form['motion']
     position = request.form['position']
-    gpt.set_debate_context(position, motion)
-    
+    session = debates.start_debate(session_id(), request.form['motion'], position)
+
     if position == 'for':
-        opening_arguments = gpt.generate_response(None, round_number=round_count)
-        audio_file = tts.text_to_speech(opening_arguments, ELEVEN_LABS_VOICE_ID)
-        return jsonify({'text': opening_arguments, 'audio': audio_file})
-    
-    return jsonify({'success': True})
+        gpt = debates.gpt_for(session)
+        opening_arguments, audio_file = debates.cached_opening(session, gpt)
+
+    if position == 'for' and wants_stream():
+        response = stream_turn(session, None, gpt=gpt, text=opening_arguments, audio_file=audio_file)
+    elif position == 'for':
+        generated = None
+        if opening_arguments is None:
+            opening_arguments = generated = gpt.generate_response(None, round_number=session.round_count)
+        if audio_file is None:
+            audio_file = synthesize(opening_arguments)
+            if generated is not None:
+                debates.remember_opening(session, generated, audio_file)
+        audio = artifact_store.publish(audio_file)
+        debates.finish_turn(session, gpt)
+        response = jsonify({'text': opening_arguments, 'audio': audio})
+    else:
+        debates.sessions.save(session)
+        response = jsonify({'success': True})
+
+    response.set_cookie(SESSION_COOKIE_NAME, session.session_id,
+                        max_age=SESSION_TTL_SECONDS, httponly=True, samesite='Lax')
+    return response
 
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
     audio_data = request.files['audio'].read()
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temporary_audio:
-        temporary_audio.write(audio_data)
-        temporary_audio_path = temporary_audio.name
+    try:
+        transcription = transcription_scheduler.transcribe(load_audio(audio_data))
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'transcription': transcription})
+
+@app.route('/speculate', methods=['POST'])
+def speculate():
+    """Start drafting the next response from the speech recorded so far."""
+    if not SPECULATIVE_REBUTTALS:
+        return jsonify({'speculating': False})
+    session = debates.sessions.load(session_id())
+    if session is None:
+        return no_session_response()
 
-    result = whisper_model.transcribe(temporary_audio_path)
-    os.unlink(temporary_audio_path)
-    
-    return jsonify({'transcription': result["text"]})
+    try:
+        partial = transcription_scheduler.transcribe(load_audio(request.files['audio'].read()))
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'speculating': debates.speculate(session, debates.gpt_for(session), partial)})
 
 @app.route('/generate_response', methods=['POST'])
 def generate_response():
-    global round_count
+    session = debates.start_turn(session_id())
+    if session is None:
+        return no_session_response()
+
     transcription = request.form['transcription']
-    round_count += 1
-    
-    if round_count >= MAX_ROUNDS:
-        closing_statement = gpt.generate_response(transcription, round_number=round_count, is_closing=True)
-        audio_file = tts.text_to_speech(closing_statement, ELEVEN_LABS_VOICE_ID)
-        return jsonify({'text': closing_statement, 'audio': audio_file, 'is_closing': True, 'round_count': round_count})
-    else:
-        rebuttal = gpt.generate_response(transcription, round_number=round_count)
-        audio_file = tts.text_to_speech(rebuttal, ELEVEN_LABS_VOICE_ID)
-        return jsonify({'text': rebuttal, 'audio': audio_file, 'is_closing': False, 'round_count': round_count})
+    round_count = session.round_count
+    closing = debates.is_closing(session)
+    gpt = debates.gpt_for(session)
+    draft = debates.speculative_response(session, gpt, transcription, closing)
+    if wants_stream():
+        return stream_turn(session, transcription, closing=closing, gpt=gpt, text=draft)
+
+    text = draft or gpt.generate_response(transcription, round_number=round_count, is_closing=closing)
+    debates.finish_turn(session, gpt, closing)
+    audio = artifact_store.publish(synthesize(text))
+    return jsonify({'text': text, 'audio': audio, 'is_closing': closing, 'round_count': round_count})
+
+@app.route('/audio/<artifact_id>')
+def serve_audio(artifact_id):
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        abort(404)
+    # Artifacts never change once published, so the id doubles as a strong ETag
+    response = send_file(artifact.path or artifact.open(), mimetype=artifact.mimetype, conditional=True,
+                         etag=artifact.artifact_id, last_modified=artifact.last_modified,
+                         max_age=ARTIFACT_TTL_SECONDS)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: models are resident and turns will not pay load latency."""
+    body, status = debates.readiness()
+    return jsonify(body), status
 
-@app.route('/audio/<path:filename>')
-def serve_audio(filename):
-    return send_file(filename, mimetype='audio/wav')
+@app.route('/metrics')
+def export_metrics():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,298 @@
+import io
+import os
+import re
+import shutil
+import time
+import uuid
+import atexit
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
+from typing import Dict, Optional
+from config import (ARTIFACT_BACKEND, ARTIFACT_MAX_MB, ARTIFACT_MAX_COUNT, ARTIFACT_TTL_SECONDS,
+                    ARTIFACT_SWEEP_INTERVAL, ARTIFACT_DIR)
+
+TMPFS_DIRECTORY = "/dev/shm"
+ARTIFACT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+MIMETYPES = {
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.ogg': 'audio/ogg',
+    '.opus': 'audio/ogg'
+}
+
+class Artifact:
+    """A published audio file, kept on disk or as an in-memory buffer."""
+
+    def __init__(self, artifact_id: str, suffix: str, size: int, path: Optional[str] = None,
+                 data: Optional[bytes] = None):
+        self.artifact_id = artifact_id
+        self.suffix = suffix
+        self.size = size
+        self.path = path
+        self.data = data
+        self.created = time.time()
+        self.last_access = self.created
+
+    @property
+    def mimetype(self) -> str:
+        return MIMETYPES.get(self.suffix.lower(), 'application/octet-stream')
+
+    @property
+    def last_modified(self) -> datetime:
+        return datetime.fromtimestamp(self.created, timezone.utc)
+
+    def open(self):
+        """Return a binary file object with the artifact's contents."""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, 'rb')
+
+class ArtifactStore:
+    """Bounded store for generated audio.
+
+    Scratch files (TTS chunks, intermediate conversions) are handed out by
+    new_path() and removed with discard(). Finished audio is published to
+    get an opaque id that the web app serves. Published artifacts are
+    evicted least-recently-used beyond the byte and count budgets, and a
+    background sweeper deletes anything older than the TTL.
+
+    Backends: 'disk' uses the system temp directory, 'tmpfs' keeps files in
+    RAM-backed /dev/shm, and 'memory' additionally moves published audio
+    into in-process buffers so serving it never touches disk.
+
+    With a shared directory, published files are named after their id, so
+    a worker can serve an artifact another worker published. Each file is
+    evicted by the process that published it, and every worker's sweeper
+    also deletes any file in the directory not touched within the TTL, so
+    files left behind by a worker that died do not pile up.
+    """
+
+    def __init__(self, backend: str = ARTIFACT_BACKEND, max_bytes: int = ARTIFACT_MAX_MB * 1024 * 1024,
+                 max_count: int = ARTIFACT_MAX_COUNT, ttl: float = ARTIFACT_TTL_SECONDS,
+                 sweep_interval: float = ARTIFACT_SWEEP_INTERVAL, shared_directory: Optional[str] = ARTIFACT_DIR):
+        if backend not in ('disk', 'tmpfs', 'memory'):
+            raise ValueError(f"Unknown artifact backend: {backend}")
+        if shared_directory and backend == 'memory':
+            raise ValueError("A shared artifact directory cannot be used with the 'memory' backend")
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.shared = bool(shared_directory)
+        if self.shared:
+            os.makedirs(shared_directory, exist_ok=True)
+            self.directory = shared_directory
+        else:
+            self.directory = self._make_directory()
+        self._artifacts: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._scratch: Dict[str, float] = {}  # path -> creation time
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self.evictions = 0
+        self.expirations = 0
+        atexit.register(self.cleanup_all)
+        # A forked child (e.g. a gunicorn worker) inherits the sweeper attribute but not its thread
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _make_directory(self) -> str:
+        root = tempfile.gettempdir()
+        if self.backend in ('tmpfs', 'memory') and os.path.isdir(TMPFS_DIRECTORY):
+            root = TMPFS_DIRECTORY
+        return tempfile.mkdtemp(prefix='debate_bot_', dir=root)
+
+    def new_path(self, suffix: str) -> str:
+        """Create an empty tracked scratch file and return its path."""
+        self._ensure_sweeper()
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.directory)
+        os.close(fd)
+        with self._lock:
+            self._scratch[path] = time.time()
+        return path
+
+    def discard(self, path: str) -> None:
+        """Delete a scratch file."""
+        if not path:
+            return
+        with self._lock:
+            self._scratch.pop(path, None)
+        self._remove_file(path)
+
+    def publish(self, path: str) -> str:
+        """Take ownership of a finished audio file and return its artifact id."""
+        artifact_id = uuid.uuid4().hex
+        suffix = os.path.splitext(path)[1]
+        size = os.path.getsize(path)
+        if self.backend == 'memory':
+            with open(path, 'rb') as audio:
+                artifact = Artifact(artifact_id, suffix, size, data=audio.read())
+            self.discard(path)
+        else:
+            if self.shared:
+                published_path = os.path.join(self.directory, artifact_id + suffix)
+                shutil.move(path, published_path)
+                with self._lock:
+                    self._scratch.pop(path, None)
+                path = published_path
+            artifact = Artifact(artifact_id, suffix, size, path=path)
+
+        with self._lock:
+            self._scratch.pop(path, None)
+            self._artifacts[artifact_id] = artifact
+            self._total_bytes += size
+            self._evict()
+        self._ensure_sweeper()
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is not None:
+                artifact.last_access = time.time()
+                self._artifacts.move_to_end(artifact_id)
+        if artifact is None:
+            artifact = self._find_shared(artifact_id)
+        if artifact is not None and self.shared:
+            # Other workers expire shared files by mtime, so mark this one as in use
+            try:
+                os.utime(artifact.path)
+            except OSError:
+                pass
+        return artifact
+
+    def _find_shared(self, artifact_id: str) -> Optional[Artifact]:
+        """Look up an artifact published by another worker in the shared directory."""
+        if not self.shared or not ARTIFACT_ID_PATTERN.match(artifact_id):
+            return None
+        for suffix in MIMETYPES:
+            path = os.path.join(self.directory, artifact_id + suffix)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Not owned by this process, so it is neither tracked nor counted against the budget
+            artifact = Artifact(artifact_id, suffix, stat.st_size, path=path)
+            artifact.created = stat.st_mtime
+            return artifact
+        return None
+
+    def remove(self, artifact_id: str) -> None:
+        with self._lock:
+            artifact = self._artifacts.pop(artifact_id, None)
+            if artifact is None:
+                return
+            self._total_bytes -= artifact.size
+        if artifact.path:
+            self._remove_file(artifact.path)
+
+    def sweep(self) -> None:
+        """Delete published artifacts and scratch files not used within the TTL."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired_ids = [a.artifact_id for a in self._artifacts.values() if a.last_access < cutoff]
+            expired_paths = [path for path, created in self._scratch.items() if created < cutoff]
+            for path in expired_paths:
+                del self._scratch[path]
+            self.expirations += len(expired_ids) + len(expired_paths)
+        for artifact_id in expired_ids:
+            self.remove(artifact_id)
+        for path in expired_paths:
+            self._remove_file(path)
+        if self.shared:
+            self._sweep_shared(cutoff)
+
+    def _sweep_shared(self, cutoff: float) -> None:
+        """Delete untracked files in the shared directory last modified before cutoff."""
+        with self._lock:
+            owned = set(self._scratch) | {a.path for a in self._artifacts.values() if a.path}
+        stale = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.path in owned:
+                        continue
+                    try:
+                        if entry.is_file() and entry.stat().st_mtime < cutoff:
+                            stale.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logging.warning(f"Failed to scan artifact directory {self.directory}: {e}")
+            return
+        for path in stale:
+            self._remove_file(path)
+        with self._lock:
+            self.expirations += len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'artifacts': len(self._artifacts),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_count': self.max_count,
+                'scratch_files': len(self._scratch),
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def cleanup_all(self) -> None:
+        """Remove every tracked file."""
+        with self._lock:
+            paths = list(self._scratch) + [a.path for a in self._artifacts.values() if a.path]
+            self._scratch.clear()
+            self._artifacts.clear()
+            self._total_bytes = 0
+        for path in paths:
+            self._remove_file(path)
+        if self.shared:
+            return
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self._artifacts and (self._total_bytes > self.max_bytes or len(self._artifacts) > self.max_count):
+            _, artifact = self._artifacts.popitem(last=False)
+            self._total_bytes -= artifact.size
+            self.evictions += 1
+            if artifact.path:
+                self._remove_file(artifact.path)
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True)
+                self._sweeper.start()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.warning(f"Artifact sweep failed: {e}")
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Failed to remove temporary file {path}: {e}")
+
+artifact_store = ArtifactStore()
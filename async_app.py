@@ -0,0 +1,220 @@
+"""Asyncio serving mode.
+
+The same routes as app.py, served by Quart on an ASGI server. OpenAI and
+ElevenLabs calls are awaited on the event loop, so a debate waiting on an
+upstream API costs a coroutine rather than a worker thread; audio decoding
+and concatenation run on a bounded executor, Whisper on the batched
+transcription worker, and session store and cache access on the default
+executor.
+
+    hypercorn async_app:app --bind 0.0.0.0:8000
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, Response, abort, render_template, request, jsonify, send_file
+from tts_handler import TTSHandler
+from gpt_handler import AsyncGPTHandler
+from sentence_segmenter import segment_async_stream
+from transcription import load_audio
+from transcription_queue import transcription_scheduler
+from audio_codec import AudioDecodeError
+from artifact_store import artifact_store
+from opening_cache import OpeningAudio
+from metrics import metrics
+from openai_scheduler import openai_scheduler, SchedulerBusy
+import debate_service as debates
+from config import (ELEVEN_LABS_VOICE_ID, SESSION_COOKIE_NAME, SESSION_TTL_SECONDS, SENTENCE_MIN_CHARS,
+                    SPECULATIVE_REBUTTALS, ASYNC_AUDIO_WORKERS, ARTIFACT_TTL_SECONDS, TTS_OUTPUT_FORMAT,
+                    TTS_OUTPUT_BITRATE)
+
+app = Quart(__name__)
+
+# The server never plays audio locally, so the mixer is skipped entirely
+tts = TTSHandler(playback=False, output_format=TTS_OUTPUT_FORMAT, output_bitrate=TTS_OUTPUT_BITRATE)
+# Decoding uploads shells out to ffmpeg and holds the GIL for numpy work
+audio_executor = ThreadPoolExecutor(max_workers=ASYNC_AUDIO_WORKERS, thread_name_prefix='audio')
+# Spawned helper processes (e.g. pyttsx3 workers) re-import the main module; only the server itself warms up
+if multiprocessing.parent_process() is None:
+    debates.start_warmup(tts)
+
+def session_id():
+    return request.cookies.get(SESSION_COOKIE_NAME)
+
+def gpt_for(session):
+    return debates.gpt_for(session, AsyncGPTHandler)
+
+def no_session_response():
+    return jsonify({'error': debates.NO_SESSION_ERROR}), 400
+
+@app.errorhandler(SchedulerBusy)
+async def scheduler_busy(error):
+    """Shed load while the OpenAI queue is full rather than letting requests pile up."""
+    return jsonify({'error': debates.BUSY_ERROR}), 503, debates.busy_headers(error)
+
+async def run_audio_work(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(audio_executor, function, *args)
+
+async def transcribe_upload(audio_data):
+    """Decode an upload on the audio executor and await its batched transcript."""
+    audio = await run_audio_work(load_audio, audio_data)
+    return await asyncio.wrap_future(transcription_scheduler.submit(audio))
+
+async def synthesize(text):
+    """Synthesize text and return the audio file."""
+    return await tts.text_to_speech_async(text, ELEVEN_LABS_VOICE_ID)
+
+async def wants_stream():
+    return (await request.form).get('stream') == '1'
+
+async def _single(text):
+    yield text
+
+def stream_turn(session, user_input, closing=False, gpt=None, text=None, audio_file=None):
+    """Stream a response as newline-delimited JSON, one event per spoken sentence.
+
+    Same protocol as app.stream_turn.
+    """
+    gpt = gpt or gpt_for(session)
+    if text is None:
+        # Refuse now, while a 503 can still be sent instead of a truncated stream
+        openai_scheduler.ensure_capacity()
+        deltas = gpt.stream_response(user_input, round_number=session.round_count, is_closing=closing)
+    else:
+        deltas = _single(text)
+
+    generated_opening = user_input is None and text is None
+    opening_audio = OpeningAudio() if generated_opening else None
+
+    async def events():
+        yield debates.turn_event(session, closing)
+        try:
+            if audio_file is not None:
+                yield debates.sentence_event(text, audio_file)
+            else:
+                sentences = segment_async_stream(deltas, SENTENCE_MIN_CHARS)
+                async for sentence, sentence_audio in tts.stream_to_speech_async(sentences, ELEVEN_LABS_VOICE_ID):
+                    yield debates.sentence_event(sentence, sentence_audio, opening_audio)
+            await asyncio.to_thread(debates.finish_turn, session, gpt, closing,
+                                    gpt.conversation_history[-1]['content'] if generated_opening else None,
+                                    opening_audio)
+        except Exception as e:
+            # The status line is already sent (e.g. the OpenAI queue timed out), so report it in-band
+            yield debates.error_event(e)
+            return
+        finally:
+            if opening_audio is not None:
+                opening_audio.discard()
+        yield debates.done_event()
+
+    return Response(events(), mimetype='application/x-ndjson')
+
+@app.route('/')
+async def index():
+    return await render_template('index.html', speculative=SPECULATIVE_REBUTTALS)
+
+@app.route('/set_debate_context', methods=['POST'])
+async def set_debate_context():
+    form = await request.form
+    position = form['position']
+    session = await asyncio.to_thread(debates.start_debate, session_id(), form['motion'], position)
+
+    if position == 'for':
+        gpt = gpt_for(session)
+        opening_arguments, audio_file = await asyncio.to_thread(debates.cached_opening, session, gpt)
+
+    if position == 'for' and await wants_stream():
+        response = stream_turn(session, None, gpt=gpt, text=opening_arguments, audio_file=audio_file)
+    elif position == 'for':
+        generated = None
+        if opening_arguments is None:
+            opening_arguments = generated = await gpt.generate_response(None, round_number=session.round_count)
+        if audio_file is None:
+            audio_file = await synthesize(opening_arguments)
+            if generated is not None:
+                await asyncio.to_thread(debates.remember_opening, session, generated, audio_file)
+        audio = artifact_store.publish(audio_file)
+        await asyncio.to_thread(debates.finish_turn, session, gpt)
+        response = jsonify({'text': opening_arguments, 'audio': audio})
+    else:
+        await asyncio.to_thread(debates.sessions.save, session)
+        response = jsonify({'success': True})
+
+    response.set_cookie(SESSION_COOKIE_NAME, session.session_id,
+                        max_age=SESSION_TTL_SECONDS, httponly=True, samesite='Lax')
+    return response
+
+@app.route('/transcribe', methods=['POST'])
+async def transcribe():
+    audio_data = (await request.files)['audio'].read()
+    try:
+        transcription = await transcribe_upload(audio_data)
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'transcription': transcription})
+
+@app.route('/speculate', methods=['POST'])
+async def speculate():
+    """Start drafting the next response from the speech recorded so far."""
+    if not SPECULATIVE_REBUTTALS:
+        return jsonify({'speculating': False})
+    session = await asyncio.to_thread(debates.sessions.load, session_id())
+    if session is None:
+        return no_session_response()
+
+    try:
+        partial = await transcribe_upload((await request.files)['audio'].read())
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'speculating': debates.speculate(session, gpt_for(session), partial)})
+
+@app.route('/generate_response', methods=['POST'])
+async def generate_response():
+    session = await asyncio.to_thread(debates.start_turn, session_id())
+    if session is None:
+        return no_session_response()
+
+    transcription = (await request.form)['transcription']
+    round_count = session.round_count
+    closing = debates.is_closing(session)
+    gpt = gpt_for(session)
+    # Waiting for an unfinished draft blocks, so it runs on the default executor
+    draft = await asyncio.to_thread(debates.speculative_response, session, gpt, transcription, closing)
+    if await wants_stream():
+        return stream_turn(session, transcription, closing=closing, gpt=gpt, text=draft)
+
+    text = draft or await gpt.generate_response(transcription, round_number=round_count, is_closing=closing)
+    await asyncio.to_thread(debates.finish_turn, session, gpt, closing)
+    audio = artifact_store.publish(await synthesize(text))
+    return jsonify({'text': text, 'audio': audio, 'is_closing': closing, 'round_count': round_count})
+
+@app.route('/audio/<artifact_id>')
+async def serve_audio(artifact_id):
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        abort(404)
+    response = await send_file(artifact.path or artifact.open(), mimetype=artifact.mimetype, add_etags=False,
+                               last_modified=artifact.last_modified, cache_timeout=ARTIFACT_TTL_SECONDS)
+    # Artifacts never change once published, so the id doubles as a strong ETag
+    response.set_etag(artifact.artifact_id)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return await response.make_conditional(request, accept_ranges=True, complete_length=artifact.size)
+
+@app.route('/healthz')
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+async def readyz():
+    """Readiness: models are resident and turns will not pay load latency."""
+    body, status = debates.readiness()
+    return jsonify(body), status
+
+@app.route('/metrics')
+async def export_metrics():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+if __name__ == '__main__':
+    app.run()
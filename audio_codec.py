@@ -0,0 +1,182 @@
+import json
+import wave
+import subprocess
+from typing import Iterator, List, Tuple
+import numpy as numpy
+
+WHISPER_SAMPLE_RATE = 16000
+# File suffix of each output format
+OUTPUT_SUFFIXES = {'wav': '.wav', 'mp3': '.mp3', 'opus': '.ogg'}
+
+class AudioDecodeError(Exception):
+    """Raised when ffmpeg cannot decode the given audio"""
+    pass
+
+def decode_audio_bytes(data: bytes, sample_rate: int = WHISPER_SAMPLE_RATE) -> numpy.ndarray:
+    """Decode an encoded audio payload (webm, wav, mp3, ...) into mono float32 PCM.
+
+    The bytes are piped through ffmpeg's stdin and stdout, so nothing is
+    written to disk.
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+    try:
+        process = subprocess.run(command, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore').strip()}")
+
+    audio = numpy.frombuffer(process.stdout, numpy.int16).astype(numpy.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+def prepare_audio_array(audio: numpy.ndarray, sample_rate: int,
+                        target_rate: int = WHISPER_SAMPLE_RATE) -> numpy.ndarray:
+    """Turn a recorder array into the mono float32 buffer Whisper expects."""
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    if sample_rate != target_rate and len(audio):
+        duration = len(audio) / sample_rate
+        target_positions = numpy.arange(int(duration * target_rate)) * (sample_rate / target_rate)
+        audio = numpy.interp(target_positions, numpy.arange(len(audio)), audio)
+    return numpy.ascontiguousarray(audio, dtype=numpy.float32)
+
+PCM_BLOCK_FRAMES = 16384
+SAMPLE_WIDTH = 2  # 16-bit PCM throughout
+
+def probe_format(path: str) -> Tuple[int, int]:
+    """Return (sample_rate, channels) of an audio file."""
+    if path.endswith('.wav'):
+        with wave.open(path, 'rb') as wav:
+            return wav.getframerate(), wav.getnchannels()
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate,channels", "-of", "json", path
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+        stream = json.loads(output)["streams"][0]
+    except (FileNotFoundError, subprocess.CalledProcessError, KeyError, IndexError, ValueError) as e:
+        raise AudioDecodeError(f"Failed to probe {path}: {e}")
+    return int(stream["sample_rate"]), int(stream["channels"])
+
+def iter_pcm_blocks(path: str, sample_rate: int, channels: int,
+                    block_frames: int = PCM_BLOCK_FRAMES) -> Iterator[bytes]:
+    """Yield 16-bit PCM of a file in fixed-size blocks without decoding it all at once."""
+    block_bytes = block_frames * channels * SAMPLE_WIDTH
+    if path.endswith('.wav'):
+        try:
+            wav = wave.open(path, 'rb')
+        except (wave.Error, EOFError) as e:
+            raise AudioDecodeError(f"Failed to read {path}: {e}")
+        with wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (sample_rate, channels, SAMPLE_WIDTH):
+                while True:
+                    try:
+                        frames = wav.readframes(block_frames)
+                    except (wave.Error, EOFError) as e:
+                        raise AudioDecodeError(f"Failed to read {path}: {e}")
+                    if not frames:
+                        return
+                    yield frames
+
+    # Anything else is resampled/decoded by ffmpeg and read from its stdout pipe
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    try:
+        while True:
+            block = process.stdout.read(block_bytes)
+            if not block:
+                break
+            yield block
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise AudioDecodeError(f"Failed to decode {path}: {stderr.decode(errors='ignore').strip()}")
+
+class WavStreamWriter:
+    """Append PCM blocks to a WAV file; the header is finalized on close."""
+
+    def __init__(self, path: str, sample_rate: int, channels: int):
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(SAMPLE_WIDTH)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, block: bytes) -> None:
+        self._wav.writeframesraw(block)
+
+    def close(self) -> None:
+        self._wav.close()
+
+class EncoderStreamWriter:
+    """Pipe PCM blocks into an ffmpeg encoder (Opus, MP3) as they are produced."""
+
+    CODECS = {
+        'opus': ['-c:a', 'libopus', '-f', 'ogg'],
+        'mp3': ['-c:a', 'libmp3lame', '-f', 'mp3']
+    }
+
+    def __init__(self, path: str, sample_rate: int, channels: int, output_format: str, bitrate: str = '48k'):
+        command = [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0",
+            *self.CODECS[output_format], "-b:a", bitrate, path
+        ]
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise AudioDecodeError("ffmpeg is not installed")
+
+    def write(self, block: bytes) -> None:
+        self._process.stdin.write(block)
+
+    def close(self) -> None:
+        self._process.stdin.close()
+        stderr = self._process.stderr.read()
+        self._process.stderr.close()
+        if self._process.wait() != 0:
+            raise AudioDecodeError(f"Audio encoding failed: {stderr.decode(errors='ignore').strip()}")
+
+def open_pcm_writer(path: str, sample_rate: int, channels: int, output_format: str = 'wav',
+                    bitrate: str = '48k'):
+    if output_format == 'wav':
+        return WavStreamWriter(path, sample_rate, channels)
+    if output_format in EncoderStreamWriter.CODECS:
+        return EncoderStreamWriter(path, sample_rate, channels, output_format, bitrate)
+    raise ValueError(f"Unsupported audio output format: {output_format}")
+
+def concatenate_audio(audio_files: List[str], output_path: str, output_format: str = 'wav',
+                      bitrate: str = '48k') -> str:
+    """Stream the decoded PCM of each file, in order, into a single output file.
+
+    Only one block is held in memory at a time, whatever the total length.
+    All inputs are converted to the sample rate and channel count of the first.
+    """
+    sample_rate, channels = probe_format(audio_files[0])
+    writer = open_pcm_writer(output_path, sample_rate, channels, output_format, bitrate)
+    try:
+        for audio_file in audio_files:
+            for block in iter_pcm_blocks(audio_file, sample_rate, channels):
+                writer.write(block)
+    finally:
+        writer.close()
+    return output_path
+
+def convert_to_wav(source_path: str, wav_path: str) -> str:
+    """Decode any ffmpeg-readable file into a WAV without loading it whole."""
+    return concatenate_audio([source_path], wav_path)
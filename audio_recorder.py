@@ -1,9 +1,246 @@
 import sounddevice as sounddevice
 import soundfile as soundfile
 import numpy as numpy
-import queue
+import os
 import threading
+import logging
 import tempfile
+from collections import deque
+from typing import Callable, Iterator, List, Optional
+from metrics import metrics
+from config import RECORDER_RING_SECONDS, RECORDER_FRAME_SIZE, RECORDING_FORMAT
+
+class VoiceActivitySegmenter:
+    """Split a live mono stream into utterances using frame energy.
+
+    A segment ends after silence_ms of quiet following speech, or once it
+    reaches max_segment_seconds, so each one fits a single Whisper window.
+    """
+
+    def __init__(self, sample_rate, frame_ms=30, silence_ms=700, max_segment_seconds=25,
+                 min_threshold=0.01, preroll_ms=300):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.max_segment_frames = int(max_segment_seconds * 1000 / frame_ms)
+        self.min_threshold = min_threshold
+        self.noise_floor = min_threshold / 3
+        self._preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self._leftover = numpy.zeros(0, dtype=numpy.float32)
+        self._segment: List[numpy.ndarray] = []
+        self._quiet_frames = 0
+
+    def feed(self, block: numpy.ndarray) -> List[numpy.ndarray]:
+        """Add a recorder block and return any utterances it completed."""
+        if block.ndim == 2:
+            block = block.mean(axis=1)
+        samples = numpy.concatenate((self._leftover, block.astype(numpy.float32)))
+        usable = len(samples) - len(samples) % self.frame_size
+        self._leftover = samples[usable:]
+
+        completed = []
+        for start in range(0, usable, self.frame_size):
+            segment = self._push_frame(samples[start:start + self.frame_size])
+            if segment is not None:
+                completed.append(segment)
+        return completed
+
+    def flush(self) -> List[numpy.ndarray]:
+        """Return the utterance in progress once recording has stopped."""
+        if self._segment:
+            self._segment.append(self._leftover)
+        segment = self._emit()
+        self._leftover = numpy.zeros(0, dtype=numpy.float32)
+        return [segment] if segment is not None else []
+
+    def _push_frame(self, frame: numpy.ndarray):
+        rms = float(numpy.sqrt(numpy.mean(frame * frame)))
+        is_speech = rms > max(self.min_threshold, self.noise_floor * 3)
+
+        if not self._segment:
+            if not is_speech:
+                # Track background noise while nobody is talking
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+                self._preroll.append(frame)
+                return None
+            self._segment.extend(self._preroll)
+            self._preroll.clear()
+
+        self._segment.append(frame)
+        self._quiet_frames = 0 if is_speech else self._quiet_frames + 1
+        if self._quiet_frames >= self.silence_frames or len(self._segment) >= self.max_segment_frames:
+            return self._emit()
+        return None
+
+    def _emit(self):
+        if not self._segment:
+            return None
+        segment = numpy.concatenate(self._segment)
+        self._segment = []
+        self._quiet_frames = 0
+        return segment
+
+class RingBuffer:
+    """Preallocated multi-reader buffer of recent audio frames.
+
+    write() never allocates and never waits for readers to catch up, so it
+    is safe to call from the audio callback. It does share a lock with
+    readers, which copy their frames out while holding it, so a write can
+    wait for at most one read's copy (bounded by that read's max_frames).
+    Each reader keeps its own position; one that falls more than the
+    capacity behind skips ahead and has the skipped frames counted as
+    dropped rather than stalling the writer.
+    """
+
+    def __init__(self, capacity_frames: int, channels: int):
+        self.capacity = capacity_frames
+        self.channels = channels
+        self._data = numpy.zeros((capacity_frames, channels), dtype=numpy.float32)
+        self._written = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def frames_written(self) -> int:
+        return self._written
+
+    def write(self, block: numpy.ndarray) -> None:
+        block = block.reshape(len(block), -1)
+        # Only the end of an oversized block fits, but the rest still counts as written (and dropped)
+        skipped = max(0, len(block) - self.capacity)
+        block = block[skipped:]
+        with self._condition:
+            self._written += skipped
+            start = self._written % self.capacity
+            first = min(len(block), self.capacity - start)
+            self._data[start:start + first] = block[:first]
+            self._data[:len(block) - first] = block[first:]
+            self._written += len(block)
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def reader(self) -> "RingReader":
+        """Start reading from the oldest frame still held."""
+        with self._condition:
+            return RingReader(self, max(0, self._written - self.capacity))
+
+    def _read(self, reader: "RingReader", min_frames: int, max_frames: int) -> Optional[numpy.ndarray]:
+        with self._condition:
+            while self._written - reader.position < min_frames and not self._closed:
+                self._condition.wait()
+            behind = self._written - reader.position
+            if behind > self.capacity:
+                reader.dropped += behind - self.capacity
+                reader.position = self._written - self.capacity
+                behind = self.capacity
+            count = min(behind, max_frames)
+            if count == 0:
+                return None
+            start = reader.position % self.capacity
+            first = min(count, self.capacity - start)
+            frames = numpy.concatenate((self._data[start:start + first], self._data[:count - first]))
+            reader.position += count
+            return frames
+
+class RingReader:
+    """A reader's position in a RingBuffer."""
+
+    def __init__(self, ring: RingBuffer, position: int):
+        self.ring = ring
+        self.position = position
+        self.dropped = 0
+
+    def read(self, max_frames: int) -> Optional[numpy.ndarray]:
+        """Wait for any audio and return up to max_frames; None once the ring is closed and drained."""
+        return self.ring._read(self, 1, max_frames)
+
+    def read_exactly(self, frames: int) -> Optional[numpy.ndarray]:
+        """Wait for exactly `frames` frames; the final read after close may be shorter."""
+        return self.ring._read(self, frames, frames)
+
+class RingRecording:
+    """A recording held in a fixed-size ring buffer, optionally streamed to disk.
+
+    The recorder callback writes into the ring; a background thread drains
+    it to a WAV or FLAC file as it goes, and frames() hands fixed-size
+    frames to another consumer. Memory use is bounded by the ring size
+    whatever the length of the speech.
+    """
+
+    def __init__(self, sample_rate: int, channels: int, path: Optional[str] = None,
+                 file_format: str = RECORDING_FORMAT, buffer_seconds: float = RECORDER_RING_SECONDS,
+                 frame_size: int = RECORDER_FRAME_SIZE):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.path = path
+        self.frame_size = frame_size
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate), channels)
+        self.error: Optional[Exception] = None  # Why the file could not be written
+        self.source_error: Optional[Exception] = None  # Why recording stopped early (e.g. no microphone)
+        self.dropped = 0  # Frames the file writer missed by falling behind
+        self._writer = None
+        if path is not None:
+            # Register the disk reader before any audio arrives so nothing is skipped
+            self._writer = threading.Thread(target=self._drain_to_file,
+                                            args=(self.ring.reader(), file_format), daemon=True)
+            self._writer.start()
+
+    @property
+    def duration(self) -> float:
+        return self.ring.frames_written / self.sample_rate
+
+    def write(self, block: numpy.ndarray) -> None:
+        self.ring.write(block)
+
+    def close(self, error: Optional[Exception] = None) -> None:
+        """Mark the end of the recording; error is why it could not go on, if it failed."""
+        self.source_error = error
+        self.ring.close()
+
+    def frames(self) -> Iterator[numpy.ndarray]:
+        """Yield frame_size x channels frames until the recording ends."""
+        reader = self.ring.reader()
+        while True:
+            frames = reader.read_exactly(self.frame_size)
+            if frames is None:
+                break
+            yield frames
+        if self.source_error is not None:
+            raise self.source_error
+        if reader.dropped:
+            logging.warning(f"Frame consumer fell behind; {reader.dropped} frames were dropped")
+
+    def wait(self) -> Optional[str]:
+        """Wait for the file to be fully written and return its path.
+
+        Raises if recording failed, or the file could not be written or is missing audio.
+        """
+        if self._writer is not None:
+            self._writer.join()
+        if self.source_error is not None:
+            raise self.source_error
+        if self.error is not None:
+            raise self.error
+        if self.dropped:
+            raise RuntimeError(f"Recording writer fell behind; {self.dropped} frames were dropped")
+        return self.path
+
+    def _drain_to_file(self, reader: RingReader, file_format: str) -> None:
+        try:
+            with soundfile.SoundFile(self.path, 'w', samplerate=self.sample_rate, channels=self.channels,
+                                     format=file_format, subtype='PCM_16') as output:
+                while True:
+                    frames = reader.read(self.sample_rate // 4)
+                    if frames is None:
+                        break
+                    output.write(frames)
+        except Exception as e:
+            self.error = e
+        self.dropped = reader.dropped
 
 class AudioRecorder:
     def __init__(self, sample_rate=16000, channels=1):
@@ -28,60 +265,89 @@ class AudioRecorder:
             print(f"Using input device: {device_info['name']}")
             print(f"Recording for {duration} seconds...")
             
-            audio = sounddevice.rec(int(duration * self.sample_rate), 
-                          samplerate=self.sample_rate, 
-                          channels=self.channels, 
-                          dtype='float32',
-                          blocking=True)
+            with metrics.timed('recording'):
+                audio = sounddevice.rec(int(duration * self.sample_rate),
+                              samplerate=self.sample_rate,
+                              channels=self.channels,
+                              dtype='float32',
+                              blocking=True)
         except Exception as e:
             raise RuntimeError(f"Recording failed: {str(e)}")
         return audio, self.sample_rate
 
-    def continuous_recording(self):
-        """Record audio continuously until user presses Enter to stop."""
-        queue_instance = queue.Queue()
-        recording = True
-        audio_data = []
-        
+    def _stream_into(self, recording: RingRecording) -> None:
+        """Write microphone blocks straight from the audio callback into the recording until Enter."""
         def callback(indata, frames, time, status):
             if status:
                 print(f"Status: {status}")
-            queue_instance.put(indata.copy())
-        
-        def input_thread_func():
-            print("\nRecording... Press Enter to stop.")
-            input()  # Wait for Enter key
-            nonlocal recording
-            recording = False
-        
-        input_thread = threading.Thread(target=input_thread_func)
-        input_thread.daemon = True
-        input_thread.start()
-        
-        with sounddevice.InputStream(samplerate=self.sample_rate, channels=self.channels, callback=callback):
-            while recording:
-                try:
-                    audio_data.append(queue_instance.get(timeout=0.5))
-                except queue.Empty:
-                    continue
-                except KeyboardInterrupt:
-                    break
-        
-        if not audio_data:
+            recording.write(indata)
+
+        error = None
+        try:
+            with sounddevice.InputStream(samplerate=self.sample_rate, channels=self.channels,
+                                         dtype='float32', callback=callback):
+                print("\nRecording... Press Enter to stop.")
+                input()
+        except Exception as e:
+            # This runs on a background thread, so the recording's consumer re-raises it
+            error = RuntimeError(f"Recording failed: {e}")
+        finally:
+            recording.close(error)
+
+    def ring_recording(self, path: Optional[str] = None, file_format: str = RECORDING_FORMAT,
+                       **options) -> RingRecording:
+        """Start recording into a ring buffer on a background thread and return immediately.
+
+        Consume recording.frames() and/or call recording.wait() for the file.
+        """
+        recording = RingRecording(self.sample_rate, self.channels, path, file_format, **options)
+        threading.Thread(target=self._stream_into, args=(recording,), daemon=True).start()
+        return recording
+
+    def streaming_recording(self, on_segment: Callable[[numpy.ndarray], None], path: Optional[str] = None,
+                            **segmenter_options):
+        """Record until Enter, handing each completed utterance to on_segment as it ends.
+
+        With a path, the whole recording is also streamed to that file.
+        """
+        segmenter = VoiceActivitySegmenter(self.sample_rate, **segmenter_options)
+        recording = self.ring_recording(path)
+        recorded_any = False
+        with metrics.timed('recording'):
+            for frames in recording.frames():
+                recorded_any = True
+                for segment in segmenter.feed(frames):
+                    on_segment(segment)
+        recording.wait()
+
+        if not recorded_any:
             raise RuntimeError("No audio recorded")
-        
-        return numpy.concatenate(audio_data), self.sample_rate
+        for segment in segmenter.flush():
+            on_segment(segment)
+        return self.sample_rate
 
     def save_to_wav(self, audio, fs, filename):
         soundfile.write(filename, audio, fs)
 
-    def record_to_file(self, duration=None):
-        if duration:
-            audio, fs = self.record_audio(duration)
-        else:
-            audio, fs = self.continuous_recording()
+    def record_to_file(self, duration=None, file_format=RECORDING_FORMAT):
+        suffix = ".flac" if file_format.upper() == 'FLAC' else ".wav"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            filename = tmp.name
+        try:
+            if duration:
+                audio, fs = self.record_audio(duration)
+                soundfile.write(filename, audio, fs, format=file_format)
+                return filename
 
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            wav_filename = tmp.name
-        self.save_to_wav(audio, fs, wav_filename)
-        return wav_filename
+            # Stream to disk as it is recorded instead of holding the whole speech in memory
+            recording = self.ring_recording(filename, file_format)
+            with metrics.timed('recording'):
+                recording.wait()
+            if recording.duration == 0:
+                raise RuntimeError("No audio recorded")
+            return filename
+        except BaseException:
+            # The caller only owns the file once it is returned
+            if os.path.exists(filename):
+                os.remove(filename)
+            raise
@@ -0,0 +1,184 @@
+"""Local stand-ins for the OpenAI chat and ElevenLabs TTS APIs.
+
+Both servers only speak the subset of each API the bot uses, with
+configurable latency, so a full turn can be measured without network
+access or API keys.
+"""
+import io
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "the motion fails because my opponent ignores evidence that economic growth depends on "
+    "institutions rather than slogans and every serious study shows the opposite of what was "
+    "just claimed so let us examine the numbers carefully before we accept such a premise"
+).split()
+
+class FakeServiceConfig:
+    """Latency knobs shared by a fake server's request handlers."""
+
+    def __init__(self, first_byte_latency=0.3, tokens_per_second=80.0, response_words=300,
+                 audio_seconds_per_word=0.35, synthesis_realtime_factor=0.1, stream_chunk_bytes=4096):
+        self.first_byte_latency = first_byte_latency
+        self.tokens_per_second = tokens_per_second
+        self.response_words = response_words
+        self.audio_seconds_per_word = audio_seconds_per_word
+        self.synthesis_realtime_factor = synthesis_realtime_factor  # Seconds of work per second of audio
+        self.stream_chunk_bytes = stream_chunk_bytes
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+def fake_debate_text(words: int, seed: int = 0) -> str:
+    """Deterministic prose with sentence and paragraph breaks."""
+    rng = random.Random(seed)
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        length = rng.randint(8, 22)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    paragraphs = [" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+    return "\n\n".join(paragraphs)
+
+def sine_wav(seconds: float, sample_rate: int = 22050, frequency: float = 220.0) -> bytes:
+    frames = int(seconds * sample_rate)
+    samples = (int(8000 * math.sin(2 * math.pi * frequency * n / sample_rate)) for n in range(frames))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buffer.getvalue()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class FakeOpenAIHandler(_Handler):
+    """Serves POST /v1/chat/completions, streaming or not."""
+
+    def do_POST(self):
+        config = self.server.config
+        config.count_request()
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        request = self._read_json()
+        prompt_tokens = sum(len(m.get('content', '')) // 4 + 4 for m in request.get('messages', []))
+        words = min(config.response_words, request.get('max_tokens', config.response_words))
+        text = fake_debate_text(words, seed=config.requests)
+        tokens = re.findall(r'\S+\s*', text)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                 'total_tokens': prompt_tokens + len(tokens)}
+        base = {'id': 'chatcmpl-fake', 'created': int(time.time()), 'model': request.get('model', 'fake')}
+
+        time.sleep(config.first_byte_latency)
+        if not request.get('stream'):
+            time.sleep(len(tokens) / config.tokens_per_second)
+            self._send_json(200, {
+                **base, 'object': 'chat.completion',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                             'finish_reason': 'stop'}],
+                'usage': usage
+            })
+            return
+
+        self._start_chunked('text/event-stream')
+        for token in tokens:
+            event = {**base, 'object': 'chat.completion.chunk',
+                     'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            time.sleep(1.0 / config.tokens_per_second)
+        final = {**base, 'object': 'chat.completion.chunk',
+                 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+        self._write_chunk(f"data: {json.dumps(final)}\n\n".encode())
+        if request.get('stream_options', {}).get('include_usage'):
+            usage_event = {**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage}
+            self._write_chunk(f"data: {json.dumps(usage_event)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+class FakeElevenLabsHandler(_Handler):
+    """Serves POST /v1/text-to-speech/<voice_id>[/stream] with generated WAV audio."""
+
+    def do_POST(self):
+        config = self.server.config
+        config.count_request()
+        match = re.match(r'^/v1/text-to-speech/[^/]+(/stream)?/?$', self.path)
+        if match is None:
+            self._send_json(404, {'detail': 'not found'})
+            return
+
+        request = self._read_json()
+        seconds = max(0.2, len(request.get('text', '').split()) * config.audio_seconds_per_word)
+        audio = sine_wav(seconds)
+        time.sleep(config.first_byte_latency)
+
+        if not match.group(1):
+            time.sleep(seconds * config.synthesis_realtime_factor)
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(audio)))
+            self.end_headers()
+            self.wfile.write(audio)
+            return
+
+        self._start_chunked('audio/mpeg')
+        chunks = range(0, len(audio), config.stream_chunk_bytes)
+        delay = seconds * config.synthesis_realtime_factor / max(1, len(chunks))
+        for start in chunks:
+            self._write_chunk(audio[start:start + config.stream_chunk_bytes])
+            time.sleep(delay)
+        self._end_chunked()
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections from highly concurrent clients
+    request_queue_size = 512
+
+def start_server(handler_class, config: FakeServiceConfig, port: int = 0):
+    """Start a fake service on a background thread; returns (server, base_url)."""
+    server = _Server(("127.0.0.1", port), handler_class)
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
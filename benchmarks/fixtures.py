@@ -0,0 +1,77 @@
+"""WAV fixtures that stand in for the microphone during benchmarks."""
+import os
+import glob
+import time
+import numpy as numpy
+import soundfile as soundfile
+from audio_recorder import AudioRecorder
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def generate_fixture(path: str, seconds: float = 20.0, sample_rate: int = 16000, seed: int = 0) -> str:
+    """Write speech-like audio: bursts of modulated noise separated by pauses.
+
+    The pauses are long enough for the voice-activity segmenter to cut
+    utterances, so incremental transcription is exercised too.
+    """
+    rng = numpy.random.default_rng(seed)
+    pieces = []
+    total = 0
+    while total < seconds * sample_rate:
+        burst = int(rng.uniform(1.5, 4.0) * sample_rate)
+        envelope = 0.5 + 0.5 * numpy.sin(numpy.linspace(0, rng.uniform(8, 20) * numpy.pi, burst))
+        pieces.append((rng.normal(0, 0.15, burst) * envelope).astype(numpy.float32))
+        pause = int(rng.uniform(0.8, 1.2) * sample_rate)
+        pieces.append(rng.normal(0, 0.002, pause).astype(numpy.float32))
+        total += burst + pause
+    soundfile.write(path, numpy.concatenate(pieces), sample_rate)
+    return path
+
+def fixture_paths(count: int = 3, directory: str = FIXTURE_DIR):
+    """Return WAV fixtures from the directory, generating synthetic ones if it is empty.
+
+    Real recordings dropped into the directory are used as-is.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = sorted(glob.glob(os.path.join(directory, "*.wav")))
+    if not paths:
+        paths = [generate_fixture(os.path.join(directory, f"speech_{i}.wav"), seed=i) for i in range(count)]
+    return paths
+
+class FixtureRecorder(AudioRecorder):
+    """AudioRecorder that plays a WAV file into the normal recording paths.
+
+    With realtime=True blocks are delivered at the rate a microphone would
+    produce them, so work overlapped with recording is measured honestly.
+    """
+
+    def __init__(self, path: str, realtime: bool = True, block_frames: int = 1600):
+        audio, sample_rate = soundfile.read(path, dtype='float32', always_2d=True)
+        super().__init__(sample_rate, audio.shape[1])
+        self.audio = audio
+        self.realtime = realtime
+        self.block_frames = block_frames
+
+    def _record_blocks(self):
+        block_seconds = self.block_frames / self.sample_rate
+        started = time.perf_counter()
+        for index, start in enumerate(range(0, len(self.audio), self.block_frames)):
+            if self.realtime:
+                # A block is only available once it has been fully "spoken"
+                delay = started + (index + 1) * block_seconds - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield self.audio[start:start + self.block_frames]
+
+    def _stream_into(self, recording):
+        error = None
+        try:
+            for block in self._record_blocks():
+                recording.write(block)
+        except Exception as e:
+            error = e
+        finally:
+            recording.close(error)
+
+    def record_audio(self, duration):
+        return self.audio[:int(duration * self.sample_rate)], self.sample_rate
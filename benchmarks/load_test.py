@@ -0,0 +1,91 @@
+"""Load generator that plays whole debates against the Flask routes."""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import requests
+
+OPPONENT_SPEECH = ("My opponent's case rests on the assumption that regulation always stifles innovation, "
+                   "but history shows that clear rules often create the trust markets need to grow.")
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def consume_turn(session: requests.Session, base_url: str, response: requests.Response, started: float) -> dict:
+    """Read a streamed turn; time-to-first-audio includes fetching the first clip."""
+    response.raise_for_status()
+    first_audio = None
+    sentences = 0
+    for line in response.iter_lines():
+        if not line:
+            continue
+        event = json.loads(line)
+        if event.get('audio'):
+            sentences += 1
+            if first_audio is None:
+                session.get(f"{base_url}/audio/{event['audio']}").raise_for_status()
+                first_audio = time.perf_counter() - started
+    return {'time_to_first_audio': first_audio, 'total': time.perf_counter() - started, 'sentences': sentences}
+
+def run_debate(base_url: str, motion: str, rounds: int, fixture_path: Optional[str] = None) -> List[dict]:
+    """Play one debate as the 'for' side and return a record per timed request."""
+    session = requests.Session()
+    results = []
+
+    started = time.perf_counter()
+    response = session.post(f"{base_url}/set_debate_context",
+                            data={'motion': motion, 'position': 'for', 'stream': '1'}, stream=True)
+    results.append({'kind': 'opening', **consume_turn(session, base_url, response, started)})
+
+    for _ in range(rounds):
+        transcription = OPPONENT_SPEECH
+        if fixture_path:
+            started = time.perf_counter()
+            with open(fixture_path, 'rb') as audio:
+                response = session.post(f"{base_url}/transcribe", files={'audio': audio})
+            response.raise_for_status()
+            results.append({'kind': 'transcribe', 'total': time.perf_counter() - started})
+            transcription = response.json()['transcription'] or OPPONENT_SPEECH
+
+        started = time.perf_counter()
+        response = session.post(f"{base_url}/generate_response",
+                                data={'transcription': transcription, 'stream': '1'}, stream=True)
+        results.append({'kind': 'rebuttal', **consume_turn(session, base_url, response, started)})
+    return results
+
+def run_load(base_url: str, users: int, rounds: int, fixture_paths: Optional[List[str]] = None,
+             motion: str = "This house would regulate artificial intelligence") -> dict:
+    """Run `users` concurrent debates and summarize throughput and latency."""
+    started = time.perf_counter()
+    records, errors = [], []
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [
+            pool.submit(run_debate, base_url, motion, rounds,
+                        fixture_paths[i % len(fixture_paths)] if fixture_paths else None)
+            for i in range(users)
+        ]
+        for future in futures:
+            try:
+                records.extend(future.result())
+            except Exception as e:
+                errors.append(str(e))
+    elapsed = time.perf_counter() - started
+
+    turns = [r for r in records if r['kind'] in ('opening', 'rebuttal')]
+    ttfa = [r['time_to_first_audio'] for r in turns if r['time_to_first_audio'] is not None]
+    transcribes = [r['total'] for r in records if r['kind'] == 'transcribe']
+    return {
+        'users': users,
+        'rounds': rounds,
+        'elapsed_seconds': elapsed,
+        'turns': len(turns),
+        'turns_per_second': len(turns) / elapsed if elapsed else 0.0,
+        'errors': errors,
+        'time_to_first_audio': {'p50': percentile(ttfa, 0.5), 'p95': percentile(ttfa, 0.95)},
+        'turn_seconds': {'p50': percentile([r['total'] for r in turns], 0.5),
+                         'p95': percentile([r['total'] for r in turns], 0.95)},
+        'transcribe_seconds': {'p50': percentile(transcribes, 0.5), 'p95': percentile(transcribes, 0.95)}
+    }
@@ -0,0 +1,136 @@
+"""Offline end-to-end benchmark.
+
+Starts local fake OpenAI and ElevenLabs servers, points the bot at them
+and measures either the web app under concurrent debates or a single CLI
+turn fed from a WAV fixture.
+
+    python -m benchmarks.run_benchmark web --users 8 --rounds 2
+    python -m benchmarks.run_benchmark cli
+
+`python -m` only finds the package from the repository root; from
+anywhere else run the file directly (python path/to/benchmarks/run_benchmark.py).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_services import (FakeServiceConfig, FakeOpenAIHandler, FakeElevenLabsHandler,
+                                      start_server)
+
+def configure_environment(args):
+    """Point the bot at the fake services; must run before any bot module is imported."""
+    openai_config = FakeServiceConfig(first_byte_latency=args.openai_latency,
+                                      tokens_per_second=args.tokens_per_second,
+                                      response_words=args.words)
+    tts_config = FakeServiceConfig(first_byte_latency=args.tts_latency)
+    _, openai_url = start_server(FakeOpenAIHandler, openai_config)
+    _, eleven_labs_url = start_server(FakeElevenLabsHandler, tts_config)
+
+    os.environ.update({
+        'OPENAI_BASE_URL': openai_url,
+        'OPENAI_API_KEY': 'benchmark',
+        'ELEVEN_LABS_BASE_URL': eleven_labs_url,
+        'ELEVEN_LABS_API_KEY': 'benchmark',
+        'PLAYBACK_SINK': 'null',
+        # The fake API has no rate limits, so the client-side limiter should not be the bottleneck
+        'OPENAI_REQUESTS_PER_MINUTE': '100000',
+        'OPENAI_TOKENS_PER_MINUTE': '100000000'
+    })
+    if not args.cache:
+        os.environ['TTS_CACHE_ENABLED'] = 'false'
+    return openai_config, tts_config
+
+def stage_report():
+    from metrics import metrics
+    return {stage: snapshot for stage, snapshot in sorted(metrics.snapshot().items())}
+
+def benchmark_web(args):
+    from werkzeug.serving import make_server
+    from benchmarks.load_test import run_load
+    import app as web_app
+
+    server = make_server("127.0.0.1", 0, web_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    fixtures = None
+    if not args.no_transcribe:
+        # Fixtures come with the recorder, which needs PortAudio even though nothing is recorded
+        from benchmarks.fixtures import fixture_paths
+        fixtures = fixture_paths()
+    report = run_load(base_url, args.users, args.rounds, fixtures)
+    server.shutdown()
+    return report
+
+def benchmark_cli(args):
+    from benchmarks.fixtures import FixtureRecorder, fixture_paths
+    from gpt_handler import GPTHandler
+    from tts_handler import TTSHandler
+    from transcription import IncrementalTranscriber
+    from sentence_segmenter import segment_stream
+    from whisper_registry import whisper_registry
+    from config import ELEVEN_LABS_VOICE_ID, SENTENCE_MIN_CHARS
+
+    whisper_registry.warmup()
+    gpt = GPTHandler()
+    gpt.set_debate_context('against', "This house would regulate artificial intelligence")
+    tts = TTSHandler()
+    recorder = FixtureRecorder(fixture_paths()[0], realtime=True)
+
+    transcriber = IncrementalTranscriber(recorder.sample_rate)
+    recorder.streaming_recording(transcriber.add_segment)
+    stopped_speaking = time.perf_counter()
+    transcription = transcriber.finish() or "Regulation stifles innovation."
+    transcript_ready = time.perf_counter()
+
+    first_audio = None
+    deltas = gpt.stream_response(transcription, round_number=2)
+    for _, audio_file in tts.stream_to_speech(segment_stream(deltas, SENTENCE_MIN_CHARS), ELEVEN_LABS_VOICE_ID):
+        if first_audio is None:
+            first_audio = time.perf_counter()
+        tts.cleanup_audio(audio_file)
+    finished = time.perf_counter()
+
+    return {
+        'transcript_ready_after_speech_seconds': transcript_ready - stopped_speaking,
+        'time_to_first_audio_seconds': first_audio - stopped_speaking if first_audio else None,
+        'turn_seconds': finished - stopped_speaking
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Debate Bot benchmark")
+    parser.add_argument('mode', choices=['web', 'cli'])
+    parser.add_argument('--users', type=int, default=4, help="Concurrent debates (web mode)")
+    parser.add_argument('--rounds', type=int, default=2, help="Rebuttal rounds per debate (web mode)")
+    parser.add_argument('--no-transcribe', action='store_true', help="Skip uploading WAV fixtures to /transcribe")
+    parser.add_argument('--openai-latency', type=float, default=0.3, help="Fake OpenAI time to first byte")
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--words', type=int, default=300, help="Words per fake GPT response")
+    parser.add_argument('--tts-latency', type=float, default=0.2, help="Fake ElevenLabs time to first byte")
+    parser.add_argument('--cache', action='store_true', help="Leave the TTS cache enabled")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    openai_config, tts_config = configure_environment(args)
+    report = benchmark_web(args) if args.mode == 'web' else benchmark_cli(args)
+    report['stages'] = stage_report()
+    report['upstream_requests'] = {'openai': openai_config.requests, 'elevenlabs': tts_config.requests}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        if key != 'stages':
+            print(f"{key}: {value}")
+    print("stages:")
+    for stage, snapshot in report['stages'].items():
+        p50, p95, p99 = (snapshot[q] for q in ('p50', 'p95', 'p99'))
+        print(f"  {stage:<24} n={snapshot['count']:<5} p50={p50:.3f}s p95={p95:.3f}s p99={p99:.3f}s")
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,10 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ELEVEN_LABS_API_KEY = os.getenv("ELEVEN_LABS_API_KEY")
 
+# API endpoints (overridable to point at local stand-ins, e.g. for benchmarks)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None uses the official API
+ELEVEN_LABS_BASE_URL = os.getenv("ELEVEN_LABS_BASE_URL", "https://api.elevenlabs.io/v1")
+
 # Default settings
 SAMPLE_RATE = 16000
 CHANNELS = 1
@@ -34,6 +38,115 @@ When discussing topics or your own capabilities:
 4. Share informed perspectives on or against the motion
 
 Your position should always be according to your leanings and the motion given."""
+GPT_TEMPERATURE = 0.7
+PROMPT_VERSION = 1  # Bump when SYSTEM_PROMPT or the prompt templates change so cached responses are regenerated
+
+# OpenAI rate limiting settings (per process; match them to the account's limits)
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "30000"))
+OPENAI_PROCESSES = int(os.getenv("OPENAI_PROCESSES", "1"))  # Server processes sharing the limits above; each gets an equal share
+OPENAI_MAX_QUEUE = int(os.getenv("OPENAI_MAX_QUEUE", "64"))  # Calls waiting beyond this are rejected with a 503
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "30"))  # Seconds a non-batch call waits for its turn
+OPENAI_COMPLETION_ESTIMATE = 1000  # Completion tokens reserved per call until its real usage is known
 
 # ElevenLabs settings
 ELEVEN_LABS_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # Default voice
+
+# Session settings
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # 'memory' or 'sqlite'
+SESSION_COOKIE_NAME = "debate_session_id"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "debate_sessions.sqlite3")
+
+# Streaming settings
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"  # Speak sentences while GPT is still generating
+SENTENCE_MIN_CHARS = 40  # Shorter sentences are merged before synthesis
+STREAMING_TRANSCRIPTION = os.getenv("STREAMING_TRANSCRIPTION", "true").lower() == "true"  # Transcribe utterances while the user is still speaking
+
+# Whisper settings
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")  # Model size loaded by both the CLI and the web app
+WHISPER_MEMORY_CAP_MB = int(os.getenv("WHISPER_MEMORY_CAP_MB", "4096"))  # Unused models are evicted above this
+TRANSCRIBE_MAX_BATCH = int(os.getenv("TRANSCRIBE_MAX_BATCH", "8"))  # 30-second segments decoded per batch
+TRANSCRIBE_MAX_WAIT_MS = int(os.getenv("TRANSCRIBE_MAX_WAIT_MS", "50"))  # How long to wait for a batch to fill
+TRANSCRIBE_SPLIT_SEARCH_SECONDS = 5.0  # Clips over 30 s are cut at the quietest point in this final stretch of each segment
+
+# TTS cache settings
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "debate_bot", "tts"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+# TTS concurrency settings
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "8"))  # Threads shared by all chunk synthesis
+PYTTSX3_WORKERS = int(os.getenv("PYTTSX3_WORKERS", str(min(4, os.cpu_count() or 1))))  # Offline synthesis processes, one engine each
+TTS_SERVICE_CONCURRENCY = {  # Simultaneous requests per service
+    'elevenlabs': int(os.getenv("ELEVEN_LABS_CONCURRENCY", "4")),
+    'pyttsx3': PYTTSX3_WORKERS,
+    'gtts': 4
+}
+
+# Conversation history settings
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))  # Prompt tokens before older rounds are summarized
+HISTORY_KEEP_RECENT_MESSAGES = 4  # Most recent messages that are always sent verbatim
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+HISTORY_SUMMARY_MAX_TOKENS = 500
+
+# ElevenLabs HTTP settings
+ELEVEN_LABS_POOL_SIZE = int(os.getenv("ELEVEN_LABS_POOL_SIZE", "8"))  # Keep-alive connections shared by all threads
+ELEVEN_LABS_CONNECT_TIMEOUT = float(os.getenv("ELEVEN_LABS_CONNECT_TIMEOUT", "5"))
+ELEVEN_LABS_READ_TIMEOUT = float(os.getenv("ELEVEN_LABS_READ_TIMEOUT", "30"))
+ELEVEN_LABS_MAX_RETRIES = int(os.getenv("ELEVEN_LABS_MAX_RETRIES", "3"))
+ELEVEN_LABS_BACKOFF = float(os.getenv("ELEVEN_LABS_BACKOFF", "0.5"))  # Seconds, doubled per retry
+TTS_RETRY_COUNT = int(os.getenv("TTS_RETRY_COUNT", "3"))  # Attempts per chunk for the offline services
+TTS_RETRY_BACKOFF = float(os.getenv("TTS_RETRY_BACKOFF", "0.5"))
+
+# TTS provider hedging settings
+TTS_HEDGE_PERCENTILE = float(os.getenv("TTS_HEDGE_PERCENTILE", "0.95"))  # Latency percentile after which the next provider is started
+TTS_HEDGE_DEFAULT_DEADLINE = float(os.getenv("TTS_HEDGE_DEFAULT_DEADLINE", "10"))  # Seconds per 500 characters, until enough latencies are known
+TTS_HEDGE_MIN_DEADLINE = float(os.getenv("TTS_HEDGE_MIN_DEADLINE", "0.5"))
+TTS_CIRCUIT_FAILURES = int(os.getenv("TTS_CIRCUIT_FAILURES", "3"))  # Consecutive failures that open a provider's circuit
+TTS_CIRCUIT_COOLDOWN = float(os.getenv("TTS_CIRCUIT_COOLDOWN", "30"))  # Seconds before a broken provider is tried again
+
+# Audio artifact settings
+ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "disk")  # 'disk', 'tmpfs' (RAM-backed files) or 'memory' (in-process buffers)
+ARTIFACT_MAX_MB = int(os.getenv("ARTIFACT_MAX_MB", "1024"))
+ARTIFACT_MAX_COUNT = int(os.getenv("ARTIFACT_MAX_COUNT", "2000"))
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", "1800"))  # Generated audio is deleted after this
+ARTIFACT_SWEEP_INTERVAL = int(os.getenv("ARTIFACT_SWEEP_INTERVAL", "60"))
+# Directory shared by every server worker so any of them can serve audio another published.
+# Required with more than one worker; unset, each process uses a private temp directory.
+# Not supported with the 'memory' backend, whose audio lives inside one process.
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR")
+# Format of audio served by the web app: 'wav', 'mp3' or 'opus' (Ogg; not played by older Safari)
+TTS_OUTPUT_FORMAT = os.getenv("TTS_OUTPUT_FORMAT", "mp3")
+TTS_OUTPUT_BITRATE = os.getenv("TTS_OUTPUT_BITRATE", "48k")
+
+# Speculative generation settings
+SPECULATIVE_REBUTTALS = os.getenv("SPECULATIVE_REBUTTALS", "false").lower() == "true"  # Draft rebuttals from partial transcripts
+SPECULATION_MIN_WORDS = 30  # Partial transcripts shorter than this are not worth a draft
+SPECULATION_REGROW_RATIO = 1.5  # Redraft once the partial transcript has grown by this factor
+SPECULATION_REUSE_SIMILARITY = 0.9  # Final transcripts at least this similar reuse the draft as-is
+SPECULATION_REVISE_SIMILARITY = 0.6  # Between the two thresholds the draft is revised by a cheaper model
+SPECULATION_REVISION_MODEL = os.getenv("SPECULATION_REVISION_MODEL", "gpt-4o-mini")
+SPECULATION_WAIT_SECONDS = 60  # How long a final turn waits for a draft that is still being generated
+
+# Opening argument cache settings
+OPENING_CACHE_ENABLED = os.getenv("OPENING_CACHE_ENABLED", "true").lower() == "true"
+OPENING_CACHE_DIR = os.getenv("OPENING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "debate_bot", "openings"))
+OPENING_CACHE_MAX_MB = int(os.getenv("OPENING_CACHE_MAX_MB", "256"))
+OPENING_CACHE_MAX_AGE_DAYS = int(os.getenv("OPENING_CACHE_MAX_AGE_DAYS", "30"))
+OPENING_CACHE_VARIANTS = int(os.getenv("OPENING_CACHE_VARIANTS", "3"))  # Distinct speeches kept per motion and position
+
+# Async server settings
+ASYNC_AUDIO_WORKERS = int(os.getenv("ASYNC_AUDIO_WORKERS", "4"))  # Threads for decoding uploads in async_app.py
+
+# Playback settings
+PLAYBACK_SINK = os.getenv("PLAYBACK_SINK", "sounddevice")  # 'sounddevice', or 'null' to discard audio without hardware
+PLAYBACK_SAMPLE_RATE = 44100  # Every clip is resampled to this rate so queued clips join seamlessly
+PLAYBACK_BLOCK_FRAMES = 1024  # Frames per device callback
+PLAYBACK_BUFFER_SECONDS = 2.0  # Decoded audio held ahead of the device
+
+# Recorder settings
+RECORDER_RING_SECONDS = 30  # Audio held in memory for slow consumers; older audio is dropped for them
+RECORDER_FRAME_SIZE = 1024  # Samples per frame handed to frame consumers
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "WAV")  # 'WAV' or 'FLAC' for recordings written to disk
@@ -0,0 +1,164 @@
+"""Debate turn logic shared by the Flask (app.py) and Quart (async_app.py) servers.
+
+The apps only translate HTTP to and from these helpers. Everything here is
+synchronous: the async server runs anything that touches the session store
+or the disk with asyncio.to_thread so the event loop never blocks on it.
+"""
+import json
+import math
+import logging
+import threading
+from gpt_handler import GPTHandler
+from session_store import create_session_store
+from whisper_registry import whisper_registry
+from transcription_queue import transcription_scheduler
+from artifact_store import artifact_store
+from tts_cache import tts_cache
+from history_manager import history_manager
+from metrics import metrics
+from speculation import speculator
+from opening_cache import opening_cache
+from openai_scheduler import openai_scheduler, SchedulerBusy
+from offline_tts import pyttsx3_pool
+from config import ELEVEN_LABS_VOICE_ID, MAX_ROUNDS, SPECULATIVE_REBUTTALS, OPENING_CACHE_ENABLED
+
+sessions = create_session_store()
+warmup_state = {'ready': threading.Event(), 'error': None}
+
+metrics.register_collector('whisper', whisper_registry.stats)
+metrics.register_collector('transcription_queue', transcription_scheduler.stats)
+metrics.register_collector('tts_cache', tts_cache.stats)
+metrics.register_collector('history', history_manager.stats)
+metrics.register_collector('artifacts', artifact_store.stats)
+metrics.register_collector('speculation', speculator.stats)
+metrics.register_collector('openings', opening_cache.stats)
+metrics.register_collector('openai_scheduler', openai_scheduler.stats)
+metrics.register_collector('pyttsx3_pool', pyttsx3_pool.stats)
+
+NO_SESSION_ERROR = 'No active debate session. Start a new debate.'
+BUSY_ERROR = 'The server is busy. Please try again shortly.'
+TURN_FAILED_ERROR = 'Generating the response failed. Please try again.'
+
+def start_warmup(tts):
+    """Load models in the background so the server can bind immediately."""
+    def warm_up():
+        try:
+            tts.warmup()
+            whisper_registry.warmup()
+            warmup_state['ready'].set()
+        except Exception as e:
+            warmup_state['error'] = str(e)
+            logging.error(f"Model warmup failed: {e}")
+
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+def readiness():
+    """Return the /readyz body and status code."""
+    if warmup_state['ready'].is_set():
+        return {'status': 'ready'}, 200
+    status = 'failed' if warmup_state['error'] else 'warming'
+    return {'status': status, 'error': warmup_state['error']}, 503
+
+def busy_headers(error):
+    return {'Retry-After': str(math.ceil(error.retry_after))}
+
+def gpt_for(session, handler_class=GPTHandler):
+    """Build a GPT handler that reads and writes the session's history."""
+    gpt = handler_class(conversation_history=session.conversation_history)
+    gpt.set_debate_context(session.position, session.motion)
+    return gpt
+
+def start_debate(session_id, motion, position):
+    """Reset (or create) the caller's session for a new debate."""
+    session = sessions.load(session_id) or sessions.create()
+    session.reset(motion, position)
+    speculator.discard(session.session_id)
+    return session
+
+def start_turn(session_id):
+    """Load the session and advance it to the next round; None if there is no debate."""
+    session = sessions.load(session_id)
+    if session is not None:
+        session.round_count += 1
+    return session
+
+def is_closing(session):
+    return session.round_count >= MAX_ROUNDS
+
+def remember_opening(session, text, audio_file=None):
+    if OPENING_CACHE_ENABLED:
+        opening_cache.put(session.motion, session.position, text, audio_file,
+                          ELEVEN_LABS_VOICE_ID if audio_file else None)
+
+def cached_opening(session, gpt):
+    """Return a cached opening argument and its audio file (None if it must be synthesized).
+
+    The opening is recorded in the session's history as if it had just been generated.
+    """
+    if not OPENING_CACHE_ENABLED:
+        return None, None
+    cached = opening_cache.get(session.motion, session.position, ELEVEN_LABS_VOICE_ID)
+    if cached is None:
+        return None, None
+    gpt.record_exchange(None, session.round_count, cached['text'])
+    audio_file = opening_cache.copy_audio(cached['audio_path']) if cached['audio_path'] else None
+    return cached['text'], audio_file
+
+def speculative_response(session, gpt, transcription, closing):
+    """Return the turn's response from a speculative draft, or None to generate it.
+
+    Blocks while an unfinished draft completes.
+    """
+    if not SPECULATIVE_REBUTTALS:
+        return None
+    if closing:
+        gpt.own_points = speculator.take_own_points(session.session_id)
+    return speculator.resolve(session.session_id, gpt, transcription, session.round_count, closing)
+
+def speculate(session, gpt, partial):
+    """Start drafting the session's next response from a partial transcript."""
+    round_number = session.round_count + 1
+    return speculator.speculate(session.session_id, gpt, partial, round_number,
+                                is_closing=round_number >= MAX_ROUNDS)
+
+def after_turn(session, gpt):
+    """Prepare the closing statement's points while the user speaks their last turn."""
+    if SPECULATIVE_REBUTTALS and session.round_count + 1 == MAX_ROUNDS:
+        speculator.prefetch_own_points(session.session_id, gpt)
+
+def finish_turn(session, gpt, closing=False, opening_text=None, opening_audio=None):
+    """Persist a completed turn; passing opening_text caches a freshly generated opening.
+
+    opening_audio is the OpeningAudio collected while the opening was streamed.
+    """
+    sessions.save(session)
+    if opening_text is not None:
+        audio_file = opening_audio.join() if opening_audio is not None else None
+        try:
+            remember_opening(session, opening_text, audio_file)
+        finally:
+            artifact_store.discard(audio_file)
+    if not closing:
+        after_turn(session, gpt)
+
+def turn_event(session, closing):
+    """First line of a streamed turn: its metadata."""
+    return json.dumps({'is_closing': closing, 'round_count': session.round_count}) + "\n"
+
+def sentence_event(text, audio_file, opening_audio=None):
+    """Publish a sentence's audio and return its stream line; opening_audio keeps a copy first."""
+    if opening_audio is not None:
+        opening_audio.add(audio_file)
+    return json.dumps({'text': text, 'audio': artifact_store.publish(audio_file)}) + "\n"
+
+def done_event():
+    return json.dumps({'done': True}) + "\n"
+
+def error_event(error):
+    """Last line of a streamed turn that failed after its headers were sent."""
+    if isinstance(error, SchedulerBusy):
+        message = BUSY_ERROR
+    else:
+        logging.error(f"Streamed turn failed: {error}")
+        message = TURN_FAILED_ERROR
+    return json.dumps({'error': message}) + "\n"
@@ -1,40 +1,140 @@
+import asyncio
 import requests
-import tempfile
-import pygame
-from config import ELEVEN_LABS_API_KEY
+import threading
+from typing import AsyncIterator, Iterator
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from artifact_store import artifact_store
+from config import (ELEVEN_LABS_API_KEY, ELEVEN_LABS_BASE_URL, ELEVEN_LABS_POOL_SIZE, ELEVEN_LABS_CONNECT_TIMEOUT,
+                    ELEVEN_LABS_READ_TIMEOUT, ELEVEN_LABS_MAX_RETRIES, ELEVEN_LABS_BACKOFF)
+
+_session = None
+_async_client = None
+_session_lock = threading.Lock()
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session used for every ElevenLabs call.
+
+    Rate limits and transient server errors are retried with exponential
+    backoff (honouring Retry-After) by the connection pool itself.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=ELEVEN_LABS_MAX_RETRIES,
+                backoff_factor=ELEVEN_LABS_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=None,
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ELEVEN_LABS_POOL_SIZE,
+                                  max_retries=retry, pool_block=True)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def get_async_client():
+    """Return the process-wide httpx client used by the async server."""
+    global _async_client
+    with _session_lock:
+        if _async_client is None:
+            import httpx
+            _async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=ELEVEN_LABS_POOL_SIZE,
+                                    max_keepalive_connections=ELEVEN_LABS_POOL_SIZE),
+                timeout=httpx.Timeout(ELEVEN_LABS_READ_TIMEOUT, connect=ELEVEN_LABS_CONNECT_TIMEOUT)
+            )
+        return _async_client
+
+class ElevenLabsError(Exception):
+    """Raised when the ElevenLabs API rejects a request"""
+    pass
 
 class ElevenLabsHandler:
     def __init__(self):
         self.api_key = ELEVEN_LABS_API_KEY
-        self.base_url = "https://api.elevenlabs.io/v1"
-        pygame.mixer.init()
+        self.base_url = ELEVEN_LABS_BASE_URL
+        self.model_id = "eleven_monolingual_v1"
+        self.voice_settings = {
+            "stability": 0.5,
+            "similarity_boost": 0.5
+        }
+        self.timeout = (ELEVEN_LABS_CONNECT_TIMEOUT, ELEVEN_LABS_READ_TIMEOUT)
+        self.session = get_session()
 
-    def text_to_speech(self, text, voice_id):
-        url = f"{self.base_url}/text-to-speech/{voice_id}"
+    def _request(self, text, voice_id):
+        url = f"{self.base_url}/text-to-speech/{voice_id}/stream"
         headers = {
             "xi-api-key": self.api_key,
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Accept": "audio/mpeg"
         }
         data = {
             "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
+            "model_id": self.model_id,
+            "voice_settings": self.voice_settings
         }
+        return url, headers, data
+
+    def stream_speech(self, text, voice_id, chunk_size=8192) -> Iterator[bytes]:
+        """Yield MP3 bytes as they arrive from the streaming endpoint."""
+        url, headers, data = self._request(text, voice_id)
+        with self.session.post(url, json=data, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise ElevenLabsError(f"Error in text-to-speech: {response.text}")
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+
+    def text_to_speech(self, text, voice_id):
+        """Write the streamed audio to a temp file as it arrives and return its path."""
+        audio_file = artifact_store.new_path(".mp3")
+        try:
+            with open(audio_file, 'wb') as tmp:
+                for chunk in self.stream_speech(text, voice_id):
+                    tmp.write(chunk)
+        except Exception:
+            artifact_store.discard(audio_file)
+            raise
+        return audio_file
+
+    async def astream_speech(self, text, voice_id, chunk_size=8192) -> AsyncIterator[bytes]:
+        """Async counterpart of stream_speech, retrying the same statuses as the sync session."""
+        url, headers, data = self._request(text, voice_id)
+        client = get_async_client()
+        for attempt in range(ELEVEN_LABS_MAX_RETRIES + 1):
+            async with client.stream("POST", url, json=data, headers=headers) as response:
+                if response.status_code in RETRY_STATUSES and attempt < ELEVEN_LABS_MAX_RETRIES:
+                    retry_after = response.headers.get("Retry-After", "")
+                    delay = float(retry_after) if retry_after.isdigit() else ELEVEN_LABS_BACKOFF * (2 ** attempt)
+                else:
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        raise ElevenLabsError(f"Error in text-to-speech: {body.decode(errors='replace')}")
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        if chunk:
+                            yield chunk
+                    return
+            await asyncio.sleep(delay)
 
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 200:
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
-                tmp.write(response.content)
-                return tmp.name
-        else:
-            raise Exception(f"Error in text-to-speech: {response.text}")
+    async def atext_to_speech(self, text, voice_id):
+        """Async counterpart of text_to_speech."""
+        audio_file = artifact_store.new_path(".mp3")
+        try:
+            with open(audio_file, 'wb') as tmp:
+                async for chunk in self.astream_speech(text, voice_id):
+                    tmp.write(chunk)
+        except BaseException:
+            artifact_store.discard(audio_file)
+            raise
+        return audio_file
 
     def play_audio(self, audio_file):
-        pygame.mixer.music.load(audio_file)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+        from playback import get_player
+        get_player().play(audio_file)
@@ -1,14 +1,49 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY, GPT_MODEL, SYSTEM_PROMPT
+import time
+import asyncio
+import threading
+from history_manager import history_manager
+from metrics import metrics
+from openai_scheduler import openai_scheduler, estimate_tokens
+from config import (OPENAI_API_KEY, OPENAI_BASE_URL, GPT_MODEL, GPT_TEMPERATURE, SYSTEM_PROMPT,
+                    HISTORY_SUMMARY_MODEL, HISTORY_SUMMARY_MAX_TOKENS, SPECULATION_REVISION_MODEL)
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the process-wide OpenAI client so connections are reused."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        return _client
+
+def get_async_client():
+    """Return the process-wide AsyncOpenAI client used by the async server."""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            from openai import AsyncOpenAI
+            _async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        return _async_client
 
 class GPTHandler:
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.conversation_history = [{"role": "system", "content": SYSTEM_PROMPT}]
+    def __init__(self, conversation_history=None):
+        self.client = get_client()
+        # A caller-owned history list (e.g. a debate session) is updated in place
+        if conversation_history is None:
+            conversation_history = [{"role": "system", "content": SYSTEM_PROMPT}]
+        self.conversation_history = conversation_history
         self.position = None  # 'for' or 'against'
         self.motion = None
+        self.own_points = None  # Prepared summary of this side's points for the closing statement
+        self.last_completion_tokens = 0
+        # Scheduling class of this handler's API calls: 'interactive', 'prefetch' or 'batch'
+        self.priority = 'interactive'
 
-    def generate_response(self, user_input, round_number, position=None, motion=None, is_closing=False):
+    def _build_prompt(self, user_input, round_number, position=None, motion=None, is_closing=False):
         if position:
             self.position = position
         if motion:
@@ -17,29 +52,150 @@ class GPTHandler:
         # Handle opening arguments or rebuttals
         if user_input is None and round_number == 1:
             # Generate opening arguments
-            prompt = f"As the {self.position} side, present your opening arguments for the motion: '{self.motion}'"
+            return f"As the {self.position} side, present your opening arguments for the motion: '{self.motion}'"
         elif round_number >= 1:
             # Generate rebuttal
             if is_closing:
                 prompt = f"Provide a strong closing statement for the {self.position} side of the motion: '{self.motion}'. Summarize your main points and refute the opponent's arguments in around 800 words."
+                if self.own_points:
+                    prompt += f" Your main points so far were:\n{self.own_points}"
+                return prompt
             else:
-                prompt = f"Provide counter arguments to the following argument within 800 words: {user_input}"
+                return f"Provide counter arguments to the following argument within 800 words: {user_input}"
         else:
-            prompt = f"Continue the debate on the motion: '{self.motion}'"
+            return f"Continue the debate on the motion: '{self.motion}'"
 
+    def _add_prompt(self, prompt):
+        """Append a prompt, folding old rounds into a summary if the history is over budget."""
         self.conversation_history.append({"role": "user", "content": prompt})
+        return history_manager.fit(self.conversation_history, self._summarize)
+
+    def _reserve(self, prompt_tokens):
+        """Wait for the scheduler to admit an API call of about this many prompt tokens."""
+        return openai_scheduler.reserve(estimate_tokens(prompt_tokens), self.priority)
 
-        response = self.client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=self.conversation_history,
-            max_tokens=5000,
-            temperature=0.7
+    def _complete(self, **request):
+        """Make a non-streaming chat completion once the scheduler admits it."""
+        with self._reserve(history_manager.counter.count_messages(request['messages'])) as ticket:
+            response = self.client.chat.completions.create(**request)
+        openai_scheduler.settle(ticket, response.usage.total_tokens if response.usage else None)
+        return response
+
+    def _summarize(self, previous_summary, messages):
+        transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        if previous_summary:
+            transcript = f"Earlier summary:\n{previous_summary}\n\nLater rounds:\n{transcript}"
+        response = self._complete(
+            model=HISTORY_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": "You condense debate transcripts. Keep every distinct argument, "
+                                              "rebuttal, statistic and example each side used, attributed to "
+                                              "'assistant' or 'opponent'. Be terse."},
+                {"role": "user", "content": transcript}
+            ],
+            max_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+            temperature=0.2
         )
+        return response.choices[0].message.content
+
+    def _response_request(self, stream=False):
+        """Arguments of the chat completion for the next debate response."""
+        request = {
+            'model': GPT_MODEL,
+            'messages': self.conversation_history,
+            'max_tokens': 5000,
+            'temperature': GPT_TEMPERATURE
+        }
+        if stream:
+            request.update(stream=True, stream_options={"include_usage": True})
+        return request
 
+    def _finish_response(self, ticket, response, estimated_tokens):
+        """Settle a completed response with the scheduler and add it to the history."""
+        openai_scheduler.settle(ticket, response.usage.total_tokens if response.usage else None)
+        history_manager.record_call(response.usage.prompt_tokens if response.usage else estimated_tokens)
+        self.last_completion_tokens = response.usage.completion_tokens if response.usage else 0
         rebuttal = response.choices[0].message.content
         self.conversation_history.append({"role": "assistant", "content": rebuttal})
         return rebuttal
 
+    def generate_response(self, user_input, round_number, position=None, motion=None, is_closing=False):
+        prompt = self._build_prompt(user_input, round_number, position, motion, is_closing)
+        estimated_tokens = self._add_prompt(prompt)
+
+        with self._reserve(estimated_tokens) as ticket, metrics.timed('gpt_response'):
+            response = self.client.chat.completions.create(**self._response_request())
+        return self._finish_response(ticket, response, estimated_tokens)
+
+    def stream_response(self, user_input, round_number, position=None, motion=None, is_closing=False):
+        """Yield the response as token deltas while it is being generated.
+
+        The full text is appended to the conversation history once the
+        stream has been consumed to the end. If it is closed early or fails,
+        the history keeps whatever was generated so far.
+        """
+        prompt = self._build_prompt(user_input, round_number, position, motion, is_closing)
+        response = _StreamedResponse(self, self._add_prompt(prompt))
+        try:
+            with self._reserve(response.prompt_tokens) as ticket:
+                response.start()
+                for event in self.client.chat.completions.create(**self._response_request(stream=True)):
+                    delta = response.add(event)
+                    if delta:
+                        yield delta
+        except BaseException:
+            response.abandon()
+            raise
+        response.finish(ticket)
+
+    def record_exchange(self, user_input, round_number, response_text, is_closing=False):
+        """Add a turn whose response was produced elsewhere (e.g. a speculative draft) to the history."""
+        prompt = self._build_prompt(user_input, round_number, is_closing=is_closing)
+        self._add_prompt(prompt)
+        self.conversation_history.append({"role": "assistant", "content": response_text})
+
+    def revise_draft(self, user_input, round_number, draft, is_closing=False):
+        """Cheaply adapt a draft written against a partial transcript to the final one."""
+        prompt = self._build_prompt(user_input, round_number, is_closing=is_closing)
+        messages = self.conversation_history + [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": draft},
+            {"role": "user", "content": "That draft was written while the opponent was still speaking. "
+                                        "Revise it so it also answers anything in the full argument above "
+                                        "that it missed, changing as little as possible. Reply with the "
+                                        "complete revised text only."}
+        ]
+        with metrics.timed('gpt_revision'):
+            response = self._complete(
+                model=SPECULATION_REVISION_MODEL,
+                messages=messages,
+                max_tokens=5000,
+                temperature=0.4
+            )
+        self.last_completion_tokens = response.usage.completion_tokens if response.usage else 0
+        revised = response.choices[0].message.content
+        self.record_exchange(user_input, round_number, revised, is_closing)
+        return revised
+
+    def summarize_own_points(self):
+        """Summarize the arguments this side has made so far, for the closing statement."""
+        own_speeches = [message["content"] for message in self.conversation_history
+                        if message["role"] == "assistant"]
+        if not own_speeches:
+            return ""
+        response = self._complete(
+            model=HISTORY_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": "List the distinct arguments made in these debate speeches as "
+                                              "terse bullet points."},
+                {"role": "user", "content": "\n\n".join(own_speeches)}
+            ],
+            max_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+            temperature=0.2
+        )
+        self.last_completion_tokens = response.usage.completion_tokens if response.usage else 0
+        return response.choices[0].message.content
+
     def set_debate_context(self, position, motion):
         self.position = position
         self.motion = motion
@@ -48,3 +204,91 @@ class GPTHandler:
         self.conversation_history = [{"role": "system", "content": SYSTEM_PROMPT}]
         self.position = None
         self.motion = None
+
+class AsyncGPTHandler(GPTHandler):
+    """GPTHandler whose responses are awaited on the event loop instead of blocking a thread.
+
+    Only generate_response and stream_response are async; the occasional
+    history summarization still uses the sync client, on the default executor.
+    """
+
+    def __init__(self, conversation_history=None):
+        super().__init__(conversation_history)
+        self.async_client = get_async_client()
+
+    async def generate_response(self, user_input, round_number, position=None, motion=None, is_closing=False):
+        prompt = self._build_prompt(user_input, round_number, position, motion, is_closing)
+        estimated_tokens = await asyncio.to_thread(self._add_prompt, prompt)
+
+        async with openai_scheduler.reserve_async(estimate_tokens(estimated_tokens), self.priority) as ticket:
+            with metrics.timed('gpt_response'):
+                response = await self.async_client.chat.completions.create(**self._response_request())
+        return self._finish_response(ticket, response, estimated_tokens)
+
+    async def stream_response(self, user_input, round_number, position=None, motion=None, is_closing=False):
+        """Async counterpart of GPTHandler.stream_response."""
+        prompt = self._build_prompt(user_input, round_number, position, motion, is_closing)
+        response = _StreamedResponse(self, await asyncio.to_thread(self._add_prompt, prompt))
+        try:
+            async with openai_scheduler.reserve_async(estimate_tokens(response.prompt_tokens),
+                                                      self.priority) as ticket:
+                response.start()
+                stream = await self.async_client.chat.completions.create(**self._response_request(stream=True))
+                async for event in stream:
+                    delta = response.add(event)
+                    if delta:
+                        yield delta
+        except BaseException:
+            response.abandon()
+            raise
+        response.finish(ticket)
+
+class _StreamedResponse:
+    """A response being streamed into a handler's history; shared by the sync and async handlers."""
+
+    def __init__(self, handler, prompt_tokens):
+        self.handler = handler
+        self.prompt_tokens = prompt_tokens
+        self.usage_reported = False
+        self.parts = []
+        self.started = time.perf_counter()
+        # Never settle this stream with the previous call's count
+        handler.last_completion_tokens = 0
+
+    def start(self):
+        """Mark the moment the request is sent (after waiting for the scheduler)."""
+        self.started = time.perf_counter()
+
+    def add(self, event):
+        """Take one stream event and return its text delta, if any."""
+        if event.usage:
+            self.usage_reported = True
+            self.prompt_tokens = event.usage.prompt_tokens
+            self.handler.last_completion_tokens = event.usage.completion_tokens
+        if not event.choices:
+            return None
+        delta = event.choices[0].delta.content
+        if delta:
+            if not self.parts:
+                metrics.observe('gpt_first_token', time.perf_counter() - self.started)
+            self.parts.append(delta)
+        return delta
+
+    def finish(self, ticket):
+        """Settle the finished stream and add the full text to the history."""
+        text = "".join(self.parts)
+        if not self.usage_reported:
+            # Some OpenAI-compatible servers ignore include_usage
+            self.handler.last_completion_tokens = history_manager.counter.count_text(text)
+        openai_scheduler.settle(ticket, self.prompt_tokens + self.handler.last_completion_tokens)
+        metrics.observe('gpt_response', time.perf_counter() - self.started)
+        history_manager.record_call(self.prompt_tokens)
+        self.handler.conversation_history.append({"role": "assistant", "content": text})
+
+    def abandon(self):
+        """Keep the history well-formed after the stream stopped early: keep the partial reply or drop its prompt."""
+        history = self.handler.conversation_history
+        if self.parts:
+            history.append({"role": "assistant", "content": "".join(self.parts)})
+        elif history and history[-1]['role'] == 'user':
+            history.pop()
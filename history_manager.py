@@ -0,0 +1,103 @@
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+from config import GPT_MODEL, HISTORY_TOKEN_BUDGET, HISTORY_KEEP_RECENT_MESSAGES
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+SUMMARY_PREFIX = "Summary of the earlier rounds of this debate:"
+
+class TokenCounter:
+    """Count prompt tokens locally, with tiktoken when it is installed."""
+
+    def __init__(self, model: str = GPT_MODEL):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_text(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # Roughly four characters per token for English prose
+        return max(1, len(text) // 4)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        # Every message carries a few tokens of role/format overhead
+        return sum(self.count_text(message["content"]) + 4 for message in messages) + 3
+
+class HistoryManager:
+    """Keep conversation histories within a prompt token budget.
+
+    The system prompt and the most recent messages are kept verbatim; older
+    rounds are folded into a single running summary message right after the
+    system prompt. Histories stay plain message lists, so they can live in
+    a debate session unchanged.
+    """
+
+    def __init__(self, budget: int = HISTORY_TOKEN_BUDGET, keep_recent: int = HISTORY_KEEP_RECENT_MESSAGES,
+                 counter: Optional[TokenCounter] = None):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.counter = counter or TokenCounter()
+        self._lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'last_prompt_tokens': 0,
+            'max_prompt_tokens': 0,
+            'total_prompt_tokens': 0,
+            'summarizations': 0,
+            'messages_folded': 0
+        }
+
+    def fit(self, history: List[Dict[str, str]], summarize: Callable[[str, List[Dict[str, str]]], str]) -> int:
+        """Summarize older rounds in place while over budget; return the prompt's token count.
+
+        summarize(previous_summary, messages) returns the new summary text.
+        """
+        tokens = self.counter.count_messages(history)
+        if tokens <= self.budget:
+            return tokens
+
+        has_summary = len(history) > 1 and history[1]["content"].startswith(SUMMARY_PREFIX)
+        head = 2 if has_summary else 1
+        turns = history[head:]
+        folded = turns[:-self.keep_recent]
+        if not folded:
+            return tokens
+
+        previous_summary = history[1]["content"][len(SUMMARY_PREFIX):].strip() if has_summary else ""
+        try:
+            summary = summarize(previous_summary, folded)
+        except Exception as e:
+            # An oversized prompt is better than a failed turn
+            logging.warning(f"History summarization failed: {e}")
+            return tokens
+
+        history[1:] = [{"role": "system", "content": f"{SUMMARY_PREFIX}\n{summary}"}] + turns[-self.keep_recent:]
+        with self._lock:
+            self._stats['summarizations'] += 1
+            self._stats['messages_folded'] += len(folded)
+        return self.counter.count_messages(history)
+
+    def record_call(self, prompt_tokens: int) -> None:
+        """Record the prompt size of a completion call."""
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['last_prompt_tokens'] = prompt_tokens
+            self._stats['max_prompt_tokens'] = max(self._stats['max_prompt_tokens'], prompt_tokens)
+            self._stats['total_prompt_tokens'] += prompt_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_prompt_tokens'] = stats['total_prompt_tokens'] / stats['calls'] if stats['calls'] else 0.0
+        stats['budget'] = self.budget
+        return stats
+
+history_manager = HistoryManager()
@@ -1,17 +1,47 @@
 from audio_recorder import AudioRecorder
-import whisper
+from whisper_registry import whisper_registry
+from transcription import transcribe_audio, IncrementalTranscriber
+import os
 import time
+import threading
 from tts_handler import TTSHandler
 from gpt_handler import GPTHandler
-from config import SAMPLE_RATE, CHANNELS, ELEVEN_LABS_VOICE_ID
+from sentence_segmenter import segment_stream
+from metrics import metrics
+from speculation import speculator
+from opening_cache import opening_cache, OpeningAudio
+from config import (SAMPLE_RATE, CHANNELS, ELEVEN_LABS_VOICE_ID, STREAM_RESPONSES, SENTENCE_MIN_CHARS,
+                    STREAMING_TRANSCRIPTION, SPECULATIVE_REBUTTALS, OPENING_CACHE_ENABLED)
 import sys
 
 audio_recorder = AudioRecorder(SAMPLE_RATE, CHANNELS)
+# The CLI runs a single debate, so its drafts share one key
+SPECULATION_KEY = 'cli'
 
-def transcribe_audio(filename, model_name="base"):
-    model = whisper.load_model(model_name)
-    result = model.transcribe(filename)
-    return result["text"]
+def record_and_transcribe(on_partial=None):
+    """Record the user's speech and return its transcript.
+
+    With streaming transcription, on_partial receives the transcript so far
+    after each utterance.
+    """
+    if STREAMING_TRANSCRIPTION:
+        # Utterances are transcribed in the background while recording continues
+        transcriber = IncrementalTranscriber(SAMPLE_RATE, on_partial=on_partial)
+        try:
+            audio_recorder.streaming_recording(transcriber.add_segment)
+        except Exception:
+            transcriber.cancel()
+            raise
+        print("Finishing transcription...")
+        return transcriber.finish()
+
+    # Stream the speech to disk as it is recorded so memory stays bounded however long it runs
+    audio_file = audio_recorder.record_to_file()
+    try:
+        print("Transcribing audio...")
+        return transcribe_audio(audio_file)
+    finally:
+        os.remove(audio_file)
 
 def wait_for_user_confirmation():
     """Prompt user to continue and optionally add delay."""
@@ -27,9 +57,88 @@ def wait_for_user_confirmation():
         except ValueError:
             print("Please enter a valid number or press Enter to continue immediately.")
 
+def deliver_response(gpt, tts, label, user_input, round_number, is_closing=False, opening_audio=None):
+    """Generate a response and speak it; return whether it was delivered without interruption.
+
+    In streaming mode each sentence is queued for playback as soon as it has
+    been synthesized, while the rest of the response is still being generated.
+    A speculative draft for the turn is used instead of generating when it fits.
+    Ctrl+C stops the speech without ending the debate. opening_audio, if
+    given, keeps a copy of each piece of audio before it is played.
+    """
+    on_audio = opening_audio.add if opening_audio is not None else None
+    draft = None
+    if SPECULATIVE_REBUTTALS and user_input is not None:
+        if is_closing:
+            gpt.own_points = speculator.take_own_points(SPECULATION_KEY)
+        draft = speculator.resolve(SPECULATION_KEY, gpt, user_input, round_number, is_closing)
+
+    if not STREAM_RESPONSES:
+        text = draft or gpt.generate_response(user_input, round_number=round_number, is_closing=is_closing)
+        print(f"\n{label}:", text)
+        try:
+            tts.speak(text, ELEVEN_LABS_VOICE_ID, on_audio=on_audio)
+        except KeyboardInterrupt:
+            tts.stop_playback()
+            print("\nPlayback interrupted.")
+            return False
+        return True
+
+    print(f"\n{label}:")
+    if draft is not None:
+        deltas = [draft]
+    else:
+        deltas = gpt.stream_response(user_input, round_number=round_number, is_closing=is_closing)
+    try:
+        for sentence, audio_file in tts.stream_to_speech(segment_stream(deltas, SENTENCE_MIN_CHARS), ELEVEN_LABS_VOICE_ID):
+            print(sentence)
+            if on_audio is not None:
+                on_audio(audio_file)
+            tts.queue_audio(audio_file, cleanup=True)
+        tts.wait_for_playback()
+    except KeyboardInterrupt:
+        tts.stop_playback()
+        print("\nPlayback interrupted.")
+        return False
+    return True
+
+def deliver_opening(gpt, tts, motion, position):
+    """Speak the opening arguments, from the opening cache when it has them."""
+    cached = opening_cache.get(motion, position, ELEVEN_LABS_VOICE_ID) if OPENING_CACHE_ENABLED else None
+    if cached is None:
+        opening_audio = OpeningAudio()
+        try:
+            completed = deliver_response(gpt, tts, "Opening Arguments", None, 1, opening_audio=opening_audio)
+            # Only an opening that was delivered in full is worth replaying
+            if completed and OPENING_CACHE_ENABLED:
+                audio_file = opening_audio.join()
+                try:
+                    opening_cache.put(motion, position, gpt.conversation_history[-1]['content'], audio_file,
+                                      ELEVEN_LABS_VOICE_ID if audio_file else None)
+                finally:
+                    tts.cleanup_audio(audio_file)
+        finally:
+            opening_audio.discard()
+        return
+
+    gpt.record_exchange(None, 1, cached['text'])
+    print("\nOpening Arguments:", cached['text'])
+    audio_file = opening_cache.copy_audio(cached['audio_path']) if cached['audio_path'] else None
+    if audio_file is None:
+        audio_file = tts.text_to_speech(cached['text'], ELEVEN_LABS_VOICE_ID)
+    tts.play_audio(audio_file)
+    tts.cleanup_audio(audio_file)
+
+def print_turn_timings():
+    """Print how long each pipeline stage took during the turn that just ended."""
+    timings = metrics.end_turn()
+    if timings:
+        print("\n" + metrics.format_turn_summary(timings))
+
 def debate_loop():
     gpt = GPTHandler()
     tts = TTSHandler()
+    tts.warmup()
     round_count = 1
     
     # Get debate context
@@ -51,15 +160,12 @@ def debate_loop():
     # If position is 'for', automatically present opening arguments
     if position == 'for':
         print("\nPresenting opening arguments...")
-        opening_args = gpt.generate_response(
-            None,
-            round_number=round_count
-        )
-        print("\nOpening Arguments:", opening_args)
-        audio_file = tts.text_to_speech(opening_args, ELEVEN_LABS_VOICE_ID)
-        tts.play_audio(audio_file)
-        tts.cleanup_audio(audio_file)
+        metrics.start_turn()
+        deliver_opening(gpt, tts, motion, position)
+        print_turn_timings()
         round_count += 1
+        if SPECULATIVE_REBUTTALS and round_count == max_rounds:
+            speculator.prefetch_own_points(SPECULATION_KEY, gpt)
 
     while round_count <= max_rounds:
         try:
@@ -67,11 +173,14 @@ def debate_loop():
             if choice.lower() == "exit":
                 break
 
-            # Record and transcribe user input
-            wav_filename = audio_recorder.record_to_file()
-             
-            print("Transcribing audio...")
-            transcription = transcribe_audio(wav_filename)
+            metrics.start_turn()
+
+            on_partial = None
+            if SPECULATIVE_REBUTTALS:
+                # Draft the response from the speech so far while the user keeps talking
+                on_partial = lambda partial, round_number=round_count: speculator.speculate(
+                    SPECULATION_KEY, gpt, partial, round_number, is_closing=round_number == max_rounds)
+            transcription = record_and_transcribe(on_partial)
             print("\nYou said:", transcription)
 
             # Wait for user confirmation before rebuttal
@@ -80,32 +189,17 @@ def debate_loop():
             # Generate and speak response
             if round_count == max_rounds:
                 print("\nGenerating closing statement...")
-                closing_statement = gpt.generate_response(
-                    transcription,
-                    round_number=round_count,
-                    is_closing=True
-                )
-                print("\nClosing Statement:", closing_statement)
-                audio_file = tts.text_to_speech(closing_statement, ELEVEN_LABS_VOICE_ID)
-                tts.play_audio(audio_file)
-                tts.cleanup_audio(audio_file)
-                tts.cleanup_audio(wav_filename)
+                deliver_response(gpt, tts, "Closing Statement", transcription, round_count, is_closing=True)
                 break  # End the debate after the closing statement
             else:
-                rebuttal = gpt.generate_response(
-                    transcription,
-                    round_number=round_count
-                )
-                print(f"\nRound {round_count} Rebuttal:", rebuttal)
-                audio_file = tts.text_to_speech(rebuttal, ELEVEN_LABS_VOICE_ID)
-                tts.play_audio(audio_file)
-
-                # Cleanup
-                tts.cleanup_audio(wav_filename)
-                tts.cleanup_audio(audio_file)
+                deliver_response(gpt, tts, f"Round {round_count} Rebuttal", transcription, round_count)
                 round_count += 1
+                if SPECULATIVE_REBUTTALS and round_count == max_rounds:
+                    speculator.prefetch_own_points(SPECULATION_KEY, gpt)
         except Exception as e:
             print(f"Error: {e}")
+        finally:
+            print_turn_timings()
 
 if __name__ == "__main__":
     # Check audio devices at startup
@@ -118,4 +212,6 @@ if __name__ == "__main__":
         print(f"Error checking audio devices: {str(e)}")
         exit(1)
 
+    # Load Whisper while the user types the motion
+    threading.Thread(target=whisper_registry.warmup, daemon=True).start()
     debate_loop()
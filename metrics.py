@@ -0,0 +1,158 @@
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Bucket upper bounds in seconds, spanning fast cache hits to long GPT turns
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+    """Cumulative latency histogram plus a sample window for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1000):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                self.bucket_counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.samples.append(value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99)
+        }
+
+class MetricsRegistry:
+    """Per-stage latency histograms, exported in Prometheus text format.
+
+    Components with their own counters (caches, queues) register gauge
+    collectors that are read at export time.
+    """
+
+    def __init__(self, prefix: str = "debate_bot"):
+        self.prefix = prefix
+        self._histograms: Dict[str, Histogram] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+        self._turn: Optional[List[tuple]] = None
+
+    def histogram(self, stage: str) -> Histogram:
+        with self._lock:
+            if stage not in self._histograms:
+                self._histograms[stage] = Histogram()
+            return self._histograms[stage]
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.histogram(stage).observe(seconds)
+        turn = self._turn
+        if turn is not None:
+            turn.append((stage, seconds))
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Time the enclosed block as one observation of a stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def register_collector(self, name: str, collect: Callable[[], dict]) -> None:
+        """Export the numeric values of collect() as gauges named <prefix>_<name>_<key>."""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def start_turn(self) -> None:
+        """Start collecting stage timings for a per-turn summary (CLI only)."""
+        self._turn = []
+
+    def end_turn(self) -> Dict[str, float]:
+        """Stop collecting and return the total seconds spent in each stage this turn."""
+        turn, self._turn = self._turn or [], None
+        totals: Dict[str, float] = {}
+        for stage, seconds in turn:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.snapshot() for stage, histogram in histograms.items()}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        latency = f"{self.prefix}_stage_latency_seconds"
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            collectors = sorted(self._collectors.items())
+
+        if histograms:
+            lines.append(f"# HELP {latency} Latency of each pipeline stage.")
+            lines.append(f"# TYPE {latency} histogram")
+        for stage, histogram in histograms:
+            with histogram._lock:
+                bucket_counts = list(histogram.bucket_counts)
+                count, total = histogram.count, histogram.total
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{latency}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{latency}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{latency}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{latency}_count{{stage="{stage}"}} {count}')
+
+        quantiles = f"{self.prefix}_stage_latency_quantile_seconds"
+        if histograms:
+            lines.append(f"# HELP {quantiles} Recent latency percentiles of each pipeline stage.")
+            lines.append(f"# TYPE {quantiles} gauge")
+        for stage, histogram in histograms:
+            for fraction in (0.5, 0.95, 0.99):
+                value = histogram.percentile(fraction)
+                if value is not None:
+                    lines.append(f'{quantiles}{{stage="{stage}",quantile="{fraction}"}} {value}')
+
+        for name, collect in collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"{self.prefix}_{name}_{key}"
+                lines.append(f"# HELP {metric} {name} statistic {key}.")
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def format_turn_summary(self, totals: Dict[str, float]) -> str:
+        if not totals:
+            return "No stages were timed this turn."
+        width = max(len(stage) for stage in totals)
+        rows = [f"  {stage:<{width}}  {seconds:7.2f}s" for stage, seconds in totals.items()]
+        return "Turn timings:\n" + "\n".join(rows)
+
+metrics = MetricsRegistry()
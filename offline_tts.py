@@ -0,0 +1,116 @@
+"""Offline pyttsx3 synthesis on dedicated worker processes.
+
+A pyttsx3 engine is not thread-safe and runAndWait() blocks until the
+whole chunk is rendered, so a single in-process engine serializes every
+offline synthesis. Each worker process here owns one long-lived engine
+instead, and chunks are spread across the workers, so offline capacity
+grows with CPU cores. Workers write straight to the scratch path they are
+given, so only the path crosses the process boundary.
+"""
+import logging
+import importlib.util
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from config import PYTTSX3_WORKERS
+
+# The engine owned by this worker process
+_engine = None
+
+def _init_worker():
+    global _engine
+    import pyttsx3
+    _engine = pyttsx3.init()
+
+def _engine_settings() -> dict:
+    return {'voice': _engine.getProperty('voice'), 'rate': _engine.getProperty('rate')}
+
+def _synthesize(text: str, path: str) -> str:
+    _engine.save_to_file(text, path)
+    _engine.runAndWait()
+    return path
+
+class Pyttsx3Pool:
+    """Long-lived worker processes, each with its own pyttsx3 engine."""
+
+    def __init__(self, workers: int = PYTTSX3_WORKERS):
+        self.workers = workers
+        self.voice_settings: Optional[dict] = None  # Read from the engines once they are up
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {'jobs': 0, 'failures': 0, 'restarts': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Start every worker and wait until each has loaded its engine; raises if they cannot."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            # Fail here rather than spawning workers that all die in their initializer
+            if importlib.util.find_spec('pyttsx3') is None:
+                raise RuntimeError("pyttsx3 is not installed")
+            # Native speech drivers are not safe to inherit across fork() from a threaded parent
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker)
+            try:
+                # One job per worker so every process is spawned and its engine loaded now
+                settings = [executor.submit(_engine_settings) for _ in range(self.workers)]
+                self.voice_settings = settings[0].result()
+                for future in settings[1:]:
+                    future.result()
+            except Exception:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            self._executor = executor
+
+    def synthesize(self, text: str, path: str) -> str:
+        """Render text into the WAV file at path on the next free worker."""
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError("pyttsx3 worker pool is not running")
+        self._count('jobs')
+        try:
+            return executor.submit(_synthesize, text, path).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. a driver crash); replace the pool so retries get fresh engines
+            self._count('failures')
+            self._restart(executor)
+            raise
+        except Exception:
+            self._count('failures')
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers if self.running else 0
+        return stats
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return  # Another caller already replaced it
+            self._executor = None
+            self._stats['restarts'] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        try:
+            self.start()
+        except Exception as e:
+            logging.error(f"Restarting pyttsx3 workers failed: {e}")
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+pyttsx3_pool = Pyttsx3Pool()
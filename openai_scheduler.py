@@ -0,0 +1,238 @@
+"""Client-side rate limiting and prioritization of OpenAI calls.
+
+Every chat completion first takes a ticket from the process-wide scheduler.
+Tickets are granted strictly by priority (interactive turns, then prefetch
+work such as speculative drafts, then batch jobs such as tournaments) and
+only while the requests-per-minute and tokens-per-minute buckets have room,
+so bursts queue here instead of turning into 429s upstream. The queue is
+bounded: once it is full new calls fail fast with SchedulerBusy, which the
+web apps turn into 503 responses.
+
+Limits are enforced per process. Several processes sharing one account
+(gunicorn workers, tournament workers) must each be given a share of it,
+via OPENAI_PROCESSES or set_limits().
+"""
+import os
+import time
+import asyncio
+import heapq
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+from metrics import metrics
+from config import (OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE, OPENAI_MAX_QUEUE,
+                    OPENAI_QUEUE_TIMEOUT, OPENAI_COMPLETION_ESTIMATE, OPENAI_PROCESSES)
+
+PRIORITIES = {'interactive': 0, 'prefetch': 1, 'batch': 2}
+
+class SchedulerBusy(Exception):
+    """Raised when the OpenAI queue is full or a call waited too long for its turn"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Capacity refilled continuously at rate_per_minute; may go into debt when usage is settled."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.available = float(rate_per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or charge (negative) the difference between estimated and actual usage."""
+        self.available = min(self.capacity, self.available + amount)
+
+class Ticket:
+    """A queued call; granted once the scheduler admits it."""
+
+    def __init__(self, priority: str, tokens: int):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.cancelled = False
+        self._event = threading.Event()
+        self._future: Optional[asyncio.Future] = None
+
+    def _grant(self) -> None:
+        self.granted = True
+        self._event.set()
+        future = self._future
+        if future is not None:
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class OpenAIScheduler:
+    """Priority queue in front of the OpenAI API, drained by a dispatcher thread."""
+
+    def __init__(self, requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = OPENAI_TOKENS_PER_MINUTE, max_queue: int = OPENAI_MAX_QUEUE,
+                 queue_timeout: float = OPENAI_QUEUE_TIMEOUT):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queue = []  # Heap of (priority rank, sequence, ticket)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {'granted': 0, 'rejected': 0, 'timed_out': 0, 'tokens_settled': 0}
+        self._start_dispatcher()
+        # A forked child (e.g. a tournament or gunicorn worker) inherits the queue but not the dispatcher thread
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def set_limits(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        """Replace the rate limits, e.g. with this process's share of the account's."""
+        with self._condition:
+            self.requests = TokenBucket(requests_per_minute)
+            self.tokens = TokenBucket(tokens_per_minute)
+            self._condition.notify_all()
+
+    def ensure_capacity(self) -> None:
+        """Raise SchedulerBusy now if a new call would be rejected.
+
+        Lets a streamed response fail with a 503 before its headers are sent.
+        """
+        with self._condition:
+            self._check_capacity()
+
+    @contextmanager
+    def reserve(self, estimated_tokens: int, priority: str = 'interactive'):
+        """Wait for a turn to call the API; the body must call settle() on the yielded ticket."""
+        ticket = self._enqueue(estimated_tokens, priority)
+        timeout = self._timeout(priority)
+        if not ticket._event.wait(timeout):
+            self._abandon(ticket, timed_out=True)
+        yield ticket
+
+    @asynccontextmanager
+    async def reserve_async(self, estimated_tokens: int, priority: str = 'interactive'):
+        """Async counterpart of reserve(); waiting costs a coroutine, not a thread."""
+        future = asyncio.get_running_loop().create_future()
+        ticket = self._enqueue(estimated_tokens, priority, future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self._timeout(priority))
+        except asyncio.TimeoutError:
+            self._abandon(ticket, timed_out=True)
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+        yield ticket
+
+    def settle(self, ticket: Ticket, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the call's real usage is known."""
+        if actual_tokens is None:
+            return
+        with self._condition:
+            self.tokens.adjust(ticket.tokens - actual_tokens)
+            self._stats['tokens_settled'] += actual_tokens
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            queued = [ticket for _, _, ticket in self._queue if not ticket.cancelled]
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            stats['requests_available'] = self.requests.available
+            stats['tokens_available'] = self.tokens.available
+        stats['queued'] = len(queued)
+        for priority in PRIORITIES:
+            stats[f'queued_{priority}'] = sum(1 for ticket in queued if ticket.priority == priority)
+        return stats
+
+    def _timeout(self, priority: str) -> Optional[float]:
+        # Batch jobs have nobody waiting on them, so they queue for as long as it takes
+        return None if priority == 'batch' else self.queue_timeout
+
+    def _check_capacity(self) -> None:
+        if len(self._queue) >= self.max_queue:
+            self._stats['rejected'] += 1
+            raise SchedulerBusy("Too many OpenAI requests queued", self._retry_after())
+
+    def _retry_after(self) -> float:
+        # Roughly how long the queue ahead takes to drain at the request rate
+        return max(1.0, len(self._queue) / self.requests.rate)
+
+    def _enqueue(self, estimated_tokens: int, priority: str, future: Optional[asyncio.Future] = None) -> Ticket:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = Ticket(priority, estimated_tokens)
+        ticket._future = future
+        with self._condition:
+            self._check_capacity()
+            heapq.heappush(self._queue, (PRIORITIES[priority], next(self._sequence), ticket))
+            self._condition.notify_all()
+        return ticket
+
+    def _abandon(self, ticket: Ticket, timed_out: bool = False) -> None:
+        with self._condition:
+            if ticket.granted:
+                return
+            ticket.cancelled = True
+            self._queue = [entry for entry in self._queue if entry[2] is not ticket]
+            heapq.heapify(self._queue)
+            if timed_out:
+                self._stats['timed_out'] += 1
+            retry_after = self._retry_after()
+            self._condition.notify_all()
+        if timed_out:
+            raise SchedulerBusy("Timed out waiting for an OpenAI request slot", retry_after)
+
+    def _start_dispatcher(self) -> None:
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='openai-scheduler', daemon=True)
+        self._dispatcher.start()
+
+    def _after_fork(self) -> None:
+        # Queued tickets belong to the parent's threads, and the lock may have been held mid-fork
+        self._queue = []
+        self._condition = threading.Condition()
+        self._start_dispatcher()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                ticket = self._queue[0][2]
+                now = time.monotonic()
+                delay = max(self.requests.time_until(1, now), self.tokens.time_until(ticket.tokens, now))
+                if delay > 0:
+                    # Woken early if a higher-priority call arrives or usage is settled
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                self.requests.take(1)
+                self.tokens.take(ticket.tokens)
+                self._stats['granted'] += 1
+                ticket._grant()
+            metrics.observe(f'openai_queue_{ticket.priority}', time.perf_counter() - ticket.enqueued)
+
+def estimate_tokens(prompt_tokens: int) -> int:
+    """Tokens reserved for a call before its real usage is known."""
+    return prompt_tokens + OPENAI_COMPLETION_ESTIMATE
+
+openai_scheduler = OpenAIScheduler(OPENAI_REQUESTS_PER_MINUTE / OPENAI_PROCESSES,
+                                   OPENAI_TOKENS_PER_MINUTE / OPENAI_PROCESSES)
@@ -0,0 +1,372 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from artifact_store import artifact_store
+from audio_codec import OUTPUT_SUFFIXES, AudioDecodeError, concatenate_audio
+from config import (GPT_MODEL, GPT_TEMPERATURE, PROMPT_VERSION, OPENING_CACHE_DIR, OPENING_CACHE_MAX_MB,
+                    OPENING_CACHE_MAX_AGE_DAYS, OPENING_CACHE_VARIANTS, OPENING_CACHE_ENABLED,
+                    TTS_OUTPUT_BITRATE)
+
+class CachedOpening:
+    """One stored variant of an opening argument, with its audio if it was synthesized."""
+
+    def __init__(self, variant_id: str, directory: str, created: float, size: int,
+                 audio_name: Optional[str] = None, voice_id: Optional[str] = None):
+        self.variant_id = variant_id
+        self.directory = directory
+        self.created = created
+        self.size = size
+        self.audio_name = audio_name
+        self.voice_id = voice_id
+
+    @property
+    def text_path(self) -> str:
+        return os.path.join(self.directory, self.variant_id + ".json")
+
+    @property
+    def audio_path(self) -> Optional[str]:
+        return os.path.join(self.directory, self.audio_name) if self.audio_name else None
+
+    def read_text(self) -> str:
+        with open(self.text_path, encoding='utf-8') as f:
+            return json.load(f)['text']
+
+class OpeningCache:
+    """Persistent cache of generated opening arguments and their audio.
+
+    Openings are keyed by the normalized motion, position, model, prompt
+    version and temperature bucket. Each key keeps up to `variants` distinct
+    speeches: lookups miss until that many exist, so repeated motions are
+    not answered with the same speech every time, and are then served in
+    rotation. Keys are evicted least-recently-used once the byte budget is
+    exceeded, and variants older than max_age_days are dropped.
+
+    Each key is a directory holding one JSON file per variant plus its audio.
+    A lookup that misses re-reads the key's directory, so openings written by
+    another process (e.g. prewarm_openings.py) are picked up without a restart.
+    """
+
+    def __init__(self, directory: str = OPENING_CACHE_DIR, max_bytes: int = OPENING_CACHE_MAX_MB * 1024 * 1024,
+                 max_age_days: float = OPENING_CACHE_MAX_AGE_DAYS, variants: int = OPENING_CACHE_VARIANTS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.variants = max(1, variants)
+        self._entries: "OrderedDict[str, List[CachedOpening]]" = OrderedDict()
+        self._rotation: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def normalize_motion(motion: str) -> str:
+        """Ignore case, punctuation and spacing differences between spellings of a motion."""
+        motion = unicodedata.normalize('NFKC', motion).casefold()
+        return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', motion)).strip()
+
+    def make_key(self, motion: str, position: str, model: str = GPT_MODEL,
+                 prompt_version: int = PROMPT_VERSION, temperature: float = GPT_TEMPERATURE) -> str:
+        payload = json.dumps({
+            'motion': self.normalize_motion(motion),
+            'position': position.lower(),
+            'model': model,
+            'prompt_version': prompt_version,
+            'temperature': f"{temperature:.1f}"
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, motion: str, position: str, voice_id: Optional[str] = None, retry: bool = True) -> Optional[dict]:
+        """Return {'text', 'audio_path'} for a cached opening, or None if another variant is wanted.
+
+        audio_path is None when the stored audio was made with a different voice.
+        """
+        key = self.make_key(motion, position)
+        with self._lock:
+            self._expire(key)
+            known = len(self._entries.get(key, []))
+        if known < self.variants:
+            self._refresh(key)
+        with self._lock:
+            stored = self._entries.get(key, [])
+            if len(stored) < self.variants:
+                self.misses += 1
+                return None
+            index = self._rotation.get(key, 0)
+            self._rotation[key] = index + 1
+            opening = stored[index % len(stored)]
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            text = opening.read_text()
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.hits -= 1
+            if not retry:
+                with self._lock:
+                    self._drop(key, opening)
+                    self.misses += 1
+                return None
+            # Probably replaced by another process; look at the directory again
+            self._refresh(key)
+            return self.get(motion, position, voice_id, retry=False)
+        audio_path = opening.audio_path if opening.voice_id == voice_id else None
+        return {'text': text, 'audio_path': audio_path}
+
+    def missing_variants(self, motion: str, position: str) -> int:
+        """How many more variants the key wants before lookups hit."""
+        key = self.make_key(motion, position)
+        self._refresh(key)
+        with self._lock:
+            self._expire(key)
+            return max(0, self.variants - len(self._entries.get(key, [])))
+
+    def put(self, motion: str, position: str, text: str, audio_file: Optional[str] = None,
+            voice_id: Optional[str] = None) -> None:
+        """Store a generated opening (and a copy of its audio) as a new variant."""
+        key = self.make_key(motion, position)
+        directory = os.path.join(self.directory, key)
+        variant_id = uuid.uuid4().hex
+        audio_name = variant_id + os.path.splitext(audio_file)[1] if audio_file else None
+        record = {
+            'text': text,
+            'motion': motion,
+            'position': position,
+            'created': time.time(),
+            'audio': audio_name,
+            'voice_id': voice_id
+        }
+        try:
+            os.makedirs(directory, exist_ok=True)
+            size = 0
+            if audio_file:
+                self._write_atomically(directory, audio_name, lambda path: shutil.copyfile(audio_file, path))
+                size += os.path.getsize(os.path.join(directory, audio_name))
+            self._write_atomically(directory, variant_id + ".json",
+                                   lambda path: self._dump_json(record, path))
+            size += os.path.getsize(os.path.join(directory, variant_id + ".json"))
+        except OSError as e:
+            logging.warning(f"Failed to cache opening argument: {e}")
+            return
+
+        opening = CachedOpening(variant_id, directory, record['created'], size, audio_name, voice_id)
+        with self._lock:
+            stored = self._entries.setdefault(key, [])
+            stored.append(opening)
+            self._total_bytes += size
+            # Replace the oldest variant once the key is full
+            while len(stored) > self.variants:
+                self._drop(key, stored[0])
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def copy_audio(self, audio_path: str) -> Optional[str]:
+        """Copy cached audio to a scratch file the caller owns, or None if it was evicted."""
+        audio_file = artifact_store.new_path(os.path.splitext(audio_path)[1])
+        try:
+            shutil.copyfile(audio_path, audio_file)
+        except OSError:
+            artifact_store.discard(audio_file)
+            return None
+        return audio_file
+
+    def sweep(self) -> None:
+        """Drop variants older than the maximum age."""
+        with self._lock:
+            for key in list(self._entries):
+                self._expire(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'keys': len(self._entries),
+                'variants': sum(len(stored) for stored in self._entries.values()),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    @staticmethod
+    def _dump_json(record: dict, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+
+    @staticmethod
+    def _write_atomically(directory: str, name: str, write) -> None:
+        # Write to a temporary name first so readers never see partial files
+        fd, staging = tempfile.mkstemp(dir=directory, suffix='.part')
+        os.close(fd)
+        try:
+            write(staging)
+            os.replace(staging, os.path.join(directory, name))
+        except OSError:
+            try:
+                os.remove(staging)
+            except OSError:
+                pass
+            raise
+
+    def _load_index(self) -> None:
+        """Rebuild the index from the cache directory, least recently used key first."""
+        keys = []
+        for key in os.listdir(self.directory):
+            directory = os.path.join(self.directory, key)
+            if not os.path.isdir(directory):
+                continue
+            stored = self._scan_key(directory)
+            if stored:
+                keys.append((os.path.getmtime(directory), key, stored))
+
+        with self._lock:
+            for _, key, stored in sorted(keys):
+                self._entries[key] = stored
+                self._total_bytes += sum(opening.size for opening in stored)
+            for key in list(self._entries):
+                self._expire(key)
+            self._evict()
+
+    def _refresh(self, key: str) -> None:
+        """Replace a key's index entry with what is currently on disk."""
+        directory = os.path.join(self.directory, key)
+        try:
+            stored = self._scan_key(directory)
+        except OSError:
+            stored = []
+        with self._lock:
+            previous = self._entries.get(key, [])
+            # Keep the existing objects for variants this process already knows
+            known = {opening.variant_id: opening for opening in previous}
+            stored = [known.get(opening.variant_id, opening) for opening in stored]
+            self._total_bytes += sum(opening.size for opening in stored) - sum(opening.size for opening in previous)
+            if stored:
+                self._entries[key] = stored
+            else:
+                self._entries.pop(key, None)
+            self._expire(key)
+            self._evict()
+
+    def _scan_key(self, directory: str) -> List[CachedOpening]:
+        """Read the variants stored in one key's directory, oldest first."""
+        if not os.path.isdir(directory):
+            return []
+        stored = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.part'):
+                # Leftover from an interrupted write; recent ones may belong to another worker
+                try:
+                    if time.time() - os.path.getmtime(path) > 3600:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    record = json.load(f)
+                size = os.path.getsize(path)
+                if record.get('audio'):
+                    size += os.path.getsize(os.path.join(directory, record['audio']))
+            except (OSError, ValueError):
+                continue
+            stored.append(CachedOpening(name[:-len('.json')], directory, record.get('created', 0.0), size,
+                                        record.get('audio'), record.get('voice_id')))
+        stored.sort(key=lambda opening: opening.created)
+        return stored
+
+    def _expire(self, key: str) -> None:
+        cutoff = time.time() - self.max_age
+        for opening in list(self._entries.get(key, [])):
+            if opening.created < cutoff:
+                self._drop(key, opening)
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            for opening in list(self._entries[key]):
+                self._drop(key, opening)
+            self.evictions += 1
+
+    def _drop(self, key: str, opening: CachedOpening) -> None:
+        stored = self._entries.get(key, [])
+        if opening in stored:
+            stored.remove(opening)
+            self._total_bytes -= opening.size
+        for path in (opening.text_path, opening.audio_path):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if not stored:
+            self._entries.pop(key, None)
+            self._rotation.pop(key, None)
+            try:
+                os.rmdir(opening.directory)
+            except OSError:
+                pass
+
+class OpeningAudio:
+    """Copies of an opening's audio pieces, joined into one file to cache it.
+
+    A spoken or streamed opening hands its pieces over (to playback or
+    publishing) one by one, so each is copied first. discard() must be
+    called once the turn is over.
+    """
+
+    def __init__(self, enabled: bool = OPENING_CACHE_ENABLED):
+        self.files: List[str] = []
+        self.complete = enabled
+
+    def add(self, audio_file: str) -> None:
+        if not self.complete:
+            return
+        copy = artifact_store.new_path(os.path.splitext(audio_file)[1])
+        try:
+            shutil.copyfile(audio_file, copy)
+        except OSError as e:
+            artifact_store.discard(copy)
+            logging.warning(f"Failed to keep opening audio for the cache: {e}")
+            self.complete = False
+            return
+        self.files.append(copy)
+
+    def join(self) -> Optional[str]:
+        """Return a scratch file with every piece in order (the caller discards it), or None if any is missing."""
+        if not (self.complete and self.files):
+            return None
+        suffix = os.path.splitext(self.files[0])[1]
+        output_format = next((name for name, known in OUTPUT_SUFFIXES.items() if known == suffix), 'wav')
+        joined = artifact_store.new_path(OUTPUT_SUFFIXES[output_format])
+        try:
+            concatenate_audio(self.files, joined, output_format, TTS_OUTPUT_BITRATE)
+        except (AudioDecodeError, OSError) as e:
+            logging.warning(f"Failed to join opening audio for the cache: {e}")
+            artifact_store.discard(joined)
+            return None
+        return joined
+
+    def discard(self) -> None:
+        for audio_file in self.files:
+            artifact_store.discard(audio_file)
+        self.files = []
+
+opening_cache = OpeningCache()
@@ -0,0 +1,322 @@
+"""Callback-driven audio playback.
+
+Clips are decoded to PCM on a background thread into a bounded buffer that
+the audio device's callback drains, so queued clips play back to back with
+no gap and a clip starts as soon as its first block is decoded. The sink is
+pluggable: SoundDeviceSink plays through PortAudio, NullSink consumes audio
+at (or faster than) real time without any sound hardware.
+"""
+import queue
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+import numpy as numpy
+from audio_codec import iter_pcm_blocks
+from config import PLAYBACK_SAMPLE_RATE, PLAYBACK_BLOCK_FRAMES, PLAYBACK_BUFFER_SECONDS, PLAYBACK_SINK
+
+class PlaybackItem:
+    """A queued clip; wait() blocks until it has played, failed or been interrupted."""
+
+    def __init__(self, path: str, label: Optional[str] = None,
+                 after_decode: Optional[Callable[[str], None]] = None):
+        self.path = path
+        self.label = label
+        self.after_decode = after_decode
+        self.frames_played = 0
+        self.total_frames: Optional[int] = None  # Known once the clip is fully decoded
+        self.interrupted = False
+        self.error: Optional[Exception] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+class NullSink:
+    """Discards audio, pulling blocks from the engine on a timer thread.
+
+    With realtime=False blocks are pulled as fast as they are produced.
+    capture=True keeps every rendered block for inspection in tests.
+    """
+
+    def __init__(self, realtime: bool = True, capture: bool = False):
+        self.realtime = realtime
+        self.capture = capture
+        self.captured: List[numpy.ndarray] = []
+        self.frames_rendered = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, callback, sample_rate: int, channels: int, block_frames: int) -> None:
+        def run():
+            block = numpy.zeros((block_frames, channels), dtype=numpy.int16)
+            period = block_frames / sample_rate
+            next_tick = time.perf_counter()
+            while not self._stop.is_set():
+                callback(block)
+                self.frames_rendered += block_frames
+                if self.capture:
+                    self.captured.append(block.copy())
+                if self.realtime:
+                    next_tick += period
+                    delay = next_tick - time.perf_counter()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                else:
+                    # Yield so the decoder can keep up
+                    time.sleep(0)
+
+        self._thread = threading.Thread(target=run, name='null-sink', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+class SoundDeviceSink:
+    """Plays audio through a sounddevice OutputStream."""
+
+    def __init__(self, device=None, latency='low'):
+        self.device = device
+        self.latency = latency
+        self._stream = None
+
+    def start(self, callback, sample_rate: int, channels: int, block_frames: int) -> None:
+        import sounddevice
+
+        def on_audio(outdata, frames, time_info, status):
+            if status:
+                logging.debug(f"Playback stream status: {status}")
+            callback(outdata)
+
+        self._stream = sounddevice.OutputStream(samplerate=sample_rate, channels=channels, dtype='int16',
+                                                blocksize=block_frames, device=self.device,
+                                                latency=self.latency, callback=on_audio)
+        self._stream.start()
+
+    def stop(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+def create_sink(name: str = PLAYBACK_SINK):
+    if name == 'null':
+        return NullSink()
+    if name == 'sounddevice':
+        return SoundDeviceSink()
+    raise ValueError(f"Unknown playback sink: {name}")
+
+class PlaybackEngine:
+    """Queue of clips played gaplessly through a callback-driven sink.
+
+    on_progress(item, frames_played) is called for every block rendered and
+    on_finished(item) once a clip ends; both run on a notifier thread, never
+    on the audio callback itself.
+    """
+
+    def __init__(self, sink=None, sample_rate: int = PLAYBACK_SAMPLE_RATE, channels: int = 1,
+                 block_frames: int = PLAYBACK_BLOCK_FRAMES, buffer_seconds: float = PLAYBACK_BUFFER_SECONDS,
+                 on_progress: Optional[Callable[[PlaybackItem, int], None]] = None,
+                 on_finished: Optional[Callable[[PlaybackItem], None]] = None):
+        self.sink = sink if sink is not None else create_sink()
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.buffer_frames = int(buffer_seconds * sample_rate)
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+
+        self._pending: "queue.Queue[Optional[PlaybackItem]]" = queue.Queue()
+        self._items: Deque[PlaybackItem] = deque()  # Queued and playing, in order
+        # Decoded PCM as (item, frames, offset); frames=None marks the end of an item
+        self._buffer: Deque[Tuple[PlaybackItem, Optional[numpy.ndarray], int]] = deque()
+        self._buffered_frames = 0
+        self._generation = 0  # Bumped by interrupt() so in-flight decodes are dropped
+        self._condition = threading.Condition()
+        self._events: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._closed = False
+
+        self._decoder = threading.Thread(target=self._decode_loop, name='playback-decoder', daemon=True)
+        self._notifier = threading.Thread(target=self._notify_loop, name='playback-notifier', daemon=True)
+        self._decoder.start()
+        self._notifier.start()
+        self.sink.start(self._render, sample_rate, channels, block_frames)
+
+    def enqueue(self, path: str, label: Optional[str] = None,
+                after_decode: Optional[Callable[[str], None]] = None) -> PlaybackItem:
+        """Queue a clip behind whatever is already playing.
+
+        after_decode(path) is called once the file has been fully read (e.g.
+        to delete it), whether or not it finished playing.
+        """
+        item = PlaybackItem(path, label, after_decode)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Playback engine is closed")
+            self._items.append(item)
+        self._pending.put(item)
+        return item
+
+    def play(self, path: str, label: Optional[str] = None,
+             after_decode: Optional[Callable[[str], None]] = None) -> PlaybackItem:
+        """Queue a clip and block until it has played."""
+        item = self.enqueue(path, label, after_decode)
+        item.wait()
+        if item.error is not None:
+            raise item.error
+        return item
+
+    def interrupt(self) -> None:
+        """Stop the current clip and drop everything queued."""
+        with self._condition:
+            self._generation += 1
+            stopped = list(self._items)
+            self._items.clear()
+            self._buffer.clear()
+            self._buffered_frames = 0
+            # Marked under the lock so the decoder cannot start a clip that was just dropped
+            for item in stopped:
+                item.interrupted = True
+            self._condition.notify_all()
+        for item in stopped:
+            self._finish(item)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued clip has finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._items:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    @property
+    def busy(self) -> bool:
+        with self._condition:
+            return bool(self._items)
+
+    def close(self) -> None:
+        self.interrupt()
+        with self._condition:
+            self._closed = True
+        self._pending.put(None)
+        self._events.put(None)
+        self.sink.stop()
+
+    def _decode_loop(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            with self._condition:
+                generation = self._generation
+                skipped = item.interrupted
+            total = 0
+            try:
+                if skipped:
+                    continue  # Still runs after_decode below so the file is cleaned up
+                for block in iter_pcm_blocks(item.path, self.sample_rate, self.channels, self.block_frames * 4):
+                    frames = numpy.frombuffer(block, dtype=numpy.int16).reshape(-1, self.channels)
+                    if not self._push(item, frames, generation):
+                        break
+                    total += len(frames)
+                else:
+                    item.total_frames = total
+                    self._push(item, None, generation)
+            except Exception as e:
+                # Any failure ends just this clip; the decoder must survive or every wait() hangs
+                logging.error(f"Playback failed for {item.path}: {e}")
+                item.error = e
+                self._push(item, None, generation)
+            finally:
+                if item.after_decode is not None:
+                    try:
+                        item.after_decode(item.path)
+                    except Exception as e:
+                        logging.warning(f"Playback cleanup failed for {item.path}: {e}")
+
+    def _push(self, item: PlaybackItem, frames: Optional[numpy.ndarray], generation: int) -> bool:
+        """Append decoded PCM, waiting while the buffer is full; False if interrupted."""
+        with self._condition:
+            while (frames is not None and self._buffered_frames >= self.buffer_frames
+                   and self._generation == generation):
+                self._condition.wait()
+            if self._generation != generation:
+                return False
+            self._buffer.append((item, frames, 0))
+            if frames is not None:
+                self._buffered_frames += len(frames)
+            return True
+
+    def _render(self, outdata: numpy.ndarray) -> None:
+        """Fill one device block from the buffer; runs on the audio callback."""
+        needed = len(outdata)
+        written = 0
+        progress = []
+        finished = []
+        with self._condition:
+            while written < needed and self._buffer:
+                item, frames, offset = self._buffer[0]
+                if frames is None:
+                    self._buffer.popleft()
+                    if self._items and self._items[0] is item:
+                        self._items.popleft()
+                    finished.append(item)
+                    continue
+                count = min(needed - written, len(frames) - offset)
+                outdata[written:written + count] = frames[offset:offset + count]
+                written += count
+                item.frames_played += count
+                self._buffered_frames -= count
+                if offset + count == len(frames):
+                    self._buffer.popleft()
+                else:
+                    self._buffer[0] = (item, frames, offset + count)
+                if not progress or progress[-1] is not item:
+                    progress.append(item)
+            if progress or finished:
+                self._condition.notify_all()
+        # Underruns (and idle time) play silence
+        outdata[written:] = 0
+        for item in progress:
+            self._events.put(('progress', item))
+        for item in finished:
+            self._finish(item)
+
+    def _finish(self, item: PlaybackItem) -> None:
+        item._done.set()
+        self._events.put(('finished', item))
+
+    def _notify_loop(self) -> None:
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            kind, item = event
+            try:
+                if kind == 'progress' and self.on_progress is not None:
+                    self.on_progress(item, item.frames_played)
+                elif kind == 'finished' and self.on_finished is not None:
+                    self.on_finished(item)
+            except Exception as e:
+                logging.warning(f"Playback callback failed: {e}")
+
+_player = None
+_player_lock = threading.Lock()
+
+def get_player() -> PlaybackEngine:
+    """Return the process-wide playback engine, opening the output device on first use."""
+    global _player
+    with _player_lock:
+        if _player is None:
+            _player = PlaybackEngine()
+        return _player
@@ -0,0 +1,66 @@
+"""Fill the opening argument cache ahead of a tournament.
+
+Reads one motion per line (blank lines and lines starting with # are
+skipped) and generates openings until every motion has the configured
+number of variants.
+
+    python prewarm_openings.py motions.txt --workers 4
+"""
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gpt_handler import GPTHandler
+from tts_handler import TTSHandler
+from opening_cache import opening_cache
+from config import ELEVEN_LABS_VOICE_ID
+
+def read_motions(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def generate_opening(motion, position, tts):
+    gpt = GPTHandler()
+    gpt.set_debate_context(position, motion)
+    gpt.priority = 'batch'
+    text = gpt.generate_response(None, round_number=1)
+    if tts is None:
+        opening_cache.put(motion, position, text)
+        return
+    audio_file = tts.text_to_speech(text, ELEVEN_LABS_VOICE_ID)
+    try:
+        opening_cache.put(motion, position, text, audio_file, ELEVEN_LABS_VOICE_ID)
+    finally:
+        tts.cleanup_audio(audio_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate cached opening arguments")
+    parser.add_argument('motions', help="Text file with one motion per line")
+    parser.add_argument('--position', default='for', choices=['for', 'against'])
+    parser.add_argument('--workers', type=int, default=2, help="Openings generated concurrently")
+    parser.add_argument('--no-audio', action='store_true', help="Cache the text only")
+    args = parser.parse_args()
+
+    tts = None if args.no_audio else TTSHandler(playback=False)
+    if tts is not None:
+        tts.warmup()
+
+    jobs = []
+    for motion in read_motions(args.motions):
+        jobs.extend([motion] * opening_cache.missing_variants(motion, args.position))
+    print(f"Generating {len(jobs)} openings (cache holds {opening_cache.variants} per motion)")
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(generate_opening, motion, args.position, tts): motion for motion in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                future.result()
+                print(f"[{done}/{len(jobs)}] {futures[future]}")
+            except Exception as e:
+                failures += 1
+                logging.error(f"Failed to generate opening for '{futures[future]}': {e}")
+
+    print(f"Done with {failures} failures. Cache: {opening_cache.stats()}")
+
+if __name__ == '__main__':
+    main()
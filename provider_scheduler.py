@@ -0,0 +1,249 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from config import (TTS_HEDGE_PERCENTILE, TTS_HEDGE_DEFAULT_DEADLINE, TTS_HEDGE_MIN_DEADLINE,
+                    TTS_CIRCUIT_FAILURES, TTS_CIRCUIT_COOLDOWN)
+
+class AllProvidersFailed(Exception):
+    """Raised when every provider failed or none was available"""
+    pass
+
+class ProviderHealth:
+    """Latency and error history of one provider, with a circuit breaker.
+
+    Latencies are stored per unit of work (e.g. per 500 characters) so
+    deadlines scale with the size of the request.
+    """
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    def allow(self, now: float) -> bool:
+        """Closed circuits always pass; an open one lets a single trial through after its cooldown."""
+        if self.consecutive_failures < TTS_CIRCUIT_FAILURES:
+            return True
+        if now >= self.open_until and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self, latency_per_unit: float) -> None:
+        self.latencies.append(latency_per_unit)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.consecutive_failures >= TTS_CIRCUIT_FAILURES:
+            self.open_until = now + TTS_CIRCUIT_COOLDOWN
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def deadline(self, units: float) -> float:
+        """Seconds to wait for this provider before hedging to the next one."""
+        if len(self.latencies) < 5:
+            # Scale the cold-start guess too, or every long request would hedge
+            return TTS_HEDGE_DEFAULT_DEADLINE * units
+        return max(TTS_HEDGE_MIN_DEADLINE, self.percentile(TTS_HEDGE_PERCENTILE) * units)
+
+class _HedgedRace:
+    """Bookkeeping of one hedged request, shared by the thread and asyncio drivers.
+
+    Attempts are concurrent.futures futures or asyncio tasks; both are read
+    with result() and add_done_callback().
+    """
+
+    def __init__(self, scheduler: "HedgedScheduler", providers: List[str],
+                 discard: Callable[[object], None], units: float):
+        self.scheduler = scheduler
+        self.candidates = scheduler._candidates(providers)
+        self.discard = discard
+        self.units = units
+        self.pending = {}
+        self.errors = []
+        self.launched = 0
+        self.hedge_at = 0.0
+
+    def next_provider(self) -> Optional[str]:
+        """The provider to start now: the first one, or the next after a failure or a missed deadline."""
+        if self.launched == len(self.candidates):
+            return None
+        if self.pending and time.monotonic() < self.hedge_at:
+            return None
+        provider = self.candidates[self.launched]
+        if self.pending:
+            logging.info(f"Hedging TTS request to {provider}")
+        self.launched += 1
+        return provider
+
+    def started(self, attempt, provider: str) -> None:
+        self.pending[attempt] = provider
+        with self.scheduler._lock:
+            self.hedge_at = time.monotonic() + self.scheduler._health(provider).deadline(self.units)
+
+    def timeout(self) -> Optional[float]:
+        """How long to wait for an attempt before hedging (None once every provider has started)."""
+        if self.launched == len(self.candidates):
+            return None
+        return max(0.0, self.hedge_at - time.monotonic())
+
+    def collect(self, done) -> Tuple[bool, object]:
+        """Record finished attempts; return (True, result) for the first that succeeded."""
+        for attempt in done:
+            provider = self.pending.pop(attempt)
+            try:
+                result, elapsed = attempt.result()
+            except Exception as e:
+                self.scheduler._record(provider, None, self.units)
+                self.errors.append(f"{provider}: {e}")
+                self.hedge_at = 0.0  # Start the next provider right away
+                continue
+            self.scheduler._record(provider, elapsed, self.units)
+            return True, result
+        return False, None
+
+    def close(self) -> None:
+        # Attempts still running (losers, or all of them if the caller gave up) clean up after themselves
+        for attempt, provider in self.pending.items():
+            attempt.add_done_callback(self.scheduler._settle_loser(provider, self.discard, self.units))
+        self.pending.clear()
+        self.scheduler._release(self.candidates[self.launched:])
+
+    def failure(self) -> "AllProvidersFailed":
+        return AllProvidersFailed("All TTS services failed: " + "; ".join(self.errors))
+
+class HedgedScheduler:
+    """Run a request against providers in preference order, hedging on slowness.
+
+    The preferred provider starts first. If it has not answered within its
+    percentile-based deadline, or it fails, the next provider starts too,
+    and the first good result wins. Results that lose the race are passed
+    to discard(). Providers that keep failing are circuit-broken for a
+    cooldown period.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts-provider')
+        self.health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def run(self, providers: List[str], call: Callable[[str], object],
+            discard: Callable[[object], None], units: float = 1.0):
+        race = _HedgedRace(self, providers, discard, units)
+        try:
+            while True:
+                provider = race.next_provider()
+                if provider is not None:
+                    race.started(self.executor.submit(self._timed_call, call, provider), provider)
+                elif not race.pending:
+                    break
+                done, _ = wait(race.pending, timeout=race.timeout(), return_when=FIRST_COMPLETED)
+                won, result = race.collect(done)
+                if won:
+                    return result
+        finally:
+            race.close()
+        raise race.failure()
+
+    async def run_async(self, providers: List[str], call: Callable[[str], Awaitable],
+                        discard: Callable[[object], None], units: float = 1.0):
+        """Async counterpart of run(): call(provider) returns an awaitable and providers race as tasks."""
+        race = _HedgedRace(self, providers, discard, units)
+        try:
+            while True:
+                provider = race.next_provider()
+                if provider is not None:
+                    race.started(asyncio.ensure_future(self._timed_call_async(call, provider)), provider)
+                elif not race.pending:
+                    break
+                done, _ = await asyncio.wait(race.pending, timeout=race.timeout(),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                won, result = race.collect(done)
+                if won:
+                    return result
+        finally:
+            race.close()
+        raise race.failure()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                provider: {
+                    'successes': health.successes,
+                    'failures': health.failures,
+                    'error_rate': health.failures / max(1, health.successes + health.failures),
+                    'p50_seconds_per_unit': health.percentile(0.5),
+                    'p95_seconds_per_unit': health.percentile(0.95),
+                    'circuit_open': health.consecutive_failures >= TTS_CIRCUIT_FAILURES
+                }
+                for provider, health in self.health.items()
+            }
+
+    def _candidates(self, providers: List[str]) -> List[str]:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [p for p in providers if self._health(p).allow(now)]
+        if not candidates:
+            raise AllProvidersFailed("All TTS services are circuit-broken")
+        return candidates
+
+    def _release(self, unlaunched: List[str]) -> None:
+        # Half-open providers that never got their trial may be tried next time
+        with self._lock:
+            for provider in unlaunched:
+                self._health(provider).trial_in_flight = False
+
+    def _health(self, provider: str) -> ProviderHealth:
+        if provider not in self.health:
+            self.health[provider] = ProviderHealth()
+        return self.health[provider]
+
+    @staticmethod
+    def _timed_call(call, provider):
+        started = time.perf_counter()
+        result = call(provider)
+        return result, time.perf_counter() - started
+
+    @staticmethod
+    async def _timed_call_async(call, provider):
+        started = time.perf_counter()
+        result = await call(provider)
+        return result, time.perf_counter() - started
+
+    def _record(self, provider: str, elapsed: Optional[float], units: float) -> None:
+        with self._lock:
+            if elapsed is None:
+                self._health(provider).record_failure(time.monotonic())
+            else:
+                self._health(provider).record_success(elapsed / units)
+
+    def _settle_loser(self, provider, discard, units):
+        """Record the outcome of a request that lost the race and drop its result."""
+        def settle(future):
+            if future.cancelled():
+                self._release([provider])
+                return
+            try:
+                result, elapsed = future.result()
+            except Exception:
+                self._record(provider, None, units)
+                return
+            self._record(provider, elapsed, units)
+            discard(result)
+        return settle
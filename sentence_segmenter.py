@@ -0,0 +1,90 @@
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc',
+    'e.g', 'i.e', 'u.s', 'u.k', 'fig', 'approx', 'inc', 'ltd'
+}
+
+_BOUNDARY = re.compile(r'([.!?]["\')\]]*)\s+|\n\s*\n')
+
+class SentenceSegmenter:
+    """Cut a stream of token deltas into speakable sentences.
+
+    Very short sentences are merged with the next one so TTS does not get
+    fed fragments like "No." on their own.
+    """
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a delta and return any sentences it completed."""
+        self._buffer += delta
+        sentences = []
+        search_from = 0
+        while True:
+            match = _BOUNDARY.search(self._buffer, search_from)
+            if match is None:
+                break
+            end = match.end(1) if match.group(1) else match.start()
+            candidate = self._buffer[:end]
+            if match.group(1) and self._is_abbreviation(candidate):
+                search_from = match.end()
+                continue
+            self._buffer = self._buffer[match.end():]
+            search_from = 0
+            sentence = self._merge(candidate.strip())
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left once the stream has ended."""
+        remainder = " ".join(part for part in (self._pending, self._buffer.strip()) if part)
+        self._buffer = ""
+        self._pending = ""
+        return [remainder] if remainder else []
+
+    def _merge(self, sentence: str) -> str:
+        if not sentence:
+            return ""
+        if self._pending:
+            sentence = f"{self._pending} {sentence}"
+            self._pending = ""
+        if len(sentence) < self.min_chars:
+            self._pending = sentence
+            return ""
+        return sentence
+
+    @staticmethod
+    def _is_abbreviation(candidate: str) -> bool:
+        if not candidate.endswith('.'):
+            return False
+        words = candidate[:-1].split()
+        if not words:
+            return False
+        last_word = words[-1].lower().lstrip('("\'')
+        # Single letters cover initials such as "J. S. Mill"
+        return last_word in ABBREVIATIONS or (len(last_word) == 1 and last_word.isalpha())
+
+def segment_stream(deltas: Iterable[str], min_chars: int = 40) -> Iterator[str]:
+    """Yield complete sentences from an iterable of token deltas."""
+    segmenter = SentenceSegmenter(min_chars)
+    for delta in deltas:
+        for sentence in segmenter.feed(delta):
+            yield sentence
+    for sentence in segmenter.flush():
+        yield sentence
+
+async def segment_async_stream(deltas: AsyncIterable[str], min_chars: int = 40) -> AsyncIterator[str]:
+    """Async counterpart of segment_stream."""
+    segmenter = SentenceSegmenter(min_chars)
+    async for delta in deltas:
+        for sentence in segmenter.feed(delta):
+            yield sentence
+    for sentence in segmenter.flush():
+        yield sentence
@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from config import (SYSTEM_PROMPT, SESSION_BACKEND, SESSION_TTL_SECONDS,
+                    SESSION_MAX_ENTRIES, SESSION_DB_PATH)
+
+class DebateSession:
+    """State of a single debate: context, round counter and GPT history."""
+
+    def __init__(self, session_id: str, motion: Optional[str] = None, position: Optional[str] = None,
+                 round_count: int = 1, conversation_history: Optional[List[Dict[str, str]]] = None):
+        self.session_id = session_id
+        self.motion = motion
+        self.position = position
+        self.round_count = round_count
+        self.conversation_history = conversation_history or [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    def reset(self, motion: str, position: str) -> None:
+        """Start a fresh debate in this session."""
+        self.motion = motion
+        self.position = position
+        self.round_count = 1
+        self.conversation_history = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    def to_dict(self) -> dict:
+        return {
+            'motion': self.motion,
+            'position': self.position,
+            'round_count': self.round_count,
+            'conversation_history': self.conversation_history
+        }
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: dict) -> 'DebateSession':
+        return cls(session_id,
+                   motion=data.get('motion'),
+                   position=data.get('position'),
+                   round_count=data.get('round_count', 1),
+                   conversation_history=data.get('conversation_history'))
+
+class MemorySessionBackend:
+    """In-process LRU store; idle sessions expire after the TTL."""
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl: float = SESSION_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            last_access, data = entry
+            if now - last_access > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions[session_id] = (now, data)
+            self._sessions.move_to_end(session_id)
+            return json.loads(data)
+
+    def put(self, session_id: str, data: dict) -> None:
+        now = time.time()
+        with self._lock:
+            # Store a serialized copy so callers never share mutable state
+            self._sessions[session_id] = (now, json.dumps(data))
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired sessions from the cold end, then enforce the size cap."""
+        while self._sessions:
+            oldest_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl and len(self._sessions) <= self.max_entries:
+                break
+            del self._sessions[oldest_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+class SQLiteSessionBackend:
+    """SQLite-backed store shared by every worker process on the host."""
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL_SECONDS,
+                 purge_interval: float = 60.0):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not shareable."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated >= ?",
+                (session_id, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    def put(self, session_id: str, data: dict) -> None:
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data), now)
+            )
+            if now - self._last_purge > self.purge_interval:
+                conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+                self._last_purge = now
+
+    def delete(self, session_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+class SessionStore:
+    """Creates, loads and persists debate sessions on a pluggable backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self) -> DebateSession:
+        return DebateSession(uuid.uuid4().hex)
+
+    def load(self, session_id: Optional[str]) -> Optional[DebateSession]:
+        if not session_id:
+            return None
+        data = self.backend.get(session_id)
+        if data is None:
+            return None
+        return DebateSession.from_dict(session_id, data)
+
+    def save(self, session: DebateSession) -> None:
+        self.backend.put(session.session_id, session.to_dict())
+
+    def delete(self, session_id: str) -> None:
+        self.backend.delete(session_id)
+
+def create_session_store(backend_name: str = SESSION_BACKEND) -> SessionStore:
+    """Build a session store for the configured backend."""
+    if backend_name == 'memory':
+        return SessionStore(MemorySessionBackend())
+    if backend_name == 'sqlite':
+        return SessionStore(SQLiteSessionBackend())
+    raise ValueError(f"Unknown session backend: {backend_name}")
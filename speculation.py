@@ -0,0 +1,196 @@
+"""Speculative rebuttals drafted from partial transcripts.
+
+While the opponent is still speaking, a draft rebuttal is generated from
+what has been transcribed so far on a shadow copy of the conversation. When
+the final transcript arrives the draft is reused as-is if the transcript
+barely changed, revised by a cheaper model if it changed moderately, or
+thrown away. The closing statement's summary of the bot's own points is
+prepared the same way during the round before it.
+
+Drafts live in this process, so a multi-process web deployment needs
+sticky sessions for speculation to hit.
+"""
+import copy
+import difflib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Dict, Optional
+from metrics import metrics
+from config import (SPECULATION_MIN_WORDS, SPECULATION_REGROW_RATIO, SPECULATION_REUSE_SIMILARITY,
+                    SPECULATION_REVISE_SIMILARITY, SPECULATION_WAIT_SECONDS)
+
+class Draft:
+    """A rebuttal being generated from a partial transcript."""
+
+    def __init__(self, transcript: str, round_number: int, is_closing: bool, future: Future):
+        self.transcript = transcript
+        self.round_number = round_number
+        self.is_closing = is_closing
+        self.future = future
+
+    def tokens(self) -> int:
+        if not self.future.done() or self.future.cancelled() or self.future.exception() is not None:
+            return 0
+        return self.future.result()[1]
+
+def transcript_similarity(partial: str, final: str) -> float:
+    """Word-level similarity between the transcript a draft answered and the final one."""
+    return difflib.SequenceMatcher(None, partial.lower().split(), final.lower().split()).ratio()
+
+class Speculator:
+    """Draft rebuttals ahead of time and decide whether they can be used.
+
+    Drafts are keyed by debate (a session id on the web, a fixed key in the
+    CLI); a newer partial transcript replaces the older draft for the same key.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speculation')
+        self._drafts: Dict[str, Draft] = {}
+        self._own_points: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'speculations': 0,
+            'hits': 0,
+            'revisions': 0,
+            'misses': 0,
+            'wasted_tokens': 0,
+            'own_points_prefetched': 0,
+            'own_points_used': 0
+        }
+
+    def speculate(self, key: str, gpt, partial_transcript: str, round_number: int, is_closing: bool = False) -> bool:
+        """Start drafting a response to a partial transcript; return whether a draft was started."""
+        words = len(partial_transcript.split())
+        if words < SPECULATION_MIN_WORDS:
+            return False
+        with self._lock:
+            previous = self._drafts.get(key)
+            if (previous is not None and previous.round_number == round_number
+                    and words < len(previous.transcript.split()) * SPECULATION_REGROW_RATIO):
+                return False
+            shadow = self._shadow(gpt)
+            if is_closing:
+                shadow.own_points = gpt.own_points or self._ready_own_points(key)
+            future = self._executor.submit(self._draft, shadow, partial_transcript, round_number, is_closing)
+            self._drafts[key] = Draft(partial_transcript, round_number, is_closing, future)
+            self._stats['speculations'] += 1
+        if previous is not None:
+            self._waste(previous)
+        return True
+
+    def resolve(self, key: str, gpt, final_transcript: str, round_number: int, is_closing: bool = False) -> Optional[str]:
+        """Return a usable response for the final transcript, or None to generate from scratch.
+
+        A used draft is recorded in gpt's conversation history exactly as if
+        gpt had generated it.
+        """
+        with self._lock:
+            draft = self._drafts.pop(key, None)
+        if draft is None:
+            return None
+        if draft.round_number != round_number or draft.is_closing != is_closing:
+            self._miss(draft)
+            return None
+
+        similarity = transcript_similarity(draft.transcript, final_transcript)
+        if similarity < SPECULATION_REVISE_SIMILARITY:
+            self._miss(draft)
+            return None
+        try:
+            text, _ = draft.future.result(timeout=SPECULATION_WAIT_SECONDS)
+        except TimeoutError:
+            self._miss(draft)
+            return None
+        except Exception as e:
+            logging.warning(f"Speculative draft failed: {e}")
+            self._count('misses')
+            return None
+
+        if similarity >= SPECULATION_REUSE_SIMILARITY:
+            gpt.record_exchange(final_transcript, round_number, text, is_closing)
+            self._count('hits')
+            return text
+        try:
+            revised = gpt.revise_draft(final_transcript, round_number, text, is_closing)
+        except Exception as e:
+            logging.warning(f"Revising speculative draft failed: {e}")
+            self._miss(draft)
+            return None
+        self._count('revisions')
+        return revised
+
+    def discard(self, key: str) -> None:
+        """Drop any draft and prepared points for a debate (e.g. when it restarts)."""
+        with self._lock:
+            draft = self._drafts.pop(key, None)
+            own_points = self._own_points.pop(key, None)
+        if draft is not None:
+            self._waste(draft)
+        if own_points is not None:
+            own_points.cancel()
+
+    def prefetch_own_points(self, key: str, gpt) -> None:
+        """Start summarizing the bot's own points for the closing statement."""
+        shadow = self._shadow(gpt)
+        with self._lock:
+            self._own_points[key] = self._executor.submit(shadow.summarize_own_points)
+            self._stats['own_points_prefetched'] += 1
+
+    def take_own_points(self, key: str, timeout: float = SPECULATION_WAIT_SECONDS) -> Optional[str]:
+        """Return the prepared summary of own points, waiting for it if it is still running."""
+        with self._lock:
+            future = self._own_points.pop(key, None)
+        if future is None:
+            return None
+        try:
+            points = future.result(timeout=timeout)
+        except Exception as e:
+            logging.warning(f"Preparing closing points failed: {e}")
+            return None
+        self._count('own_points_used')
+        return points or None
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._drafts)
+        resolved = stats['hits'] + stats['revisions'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['revisions']) / resolved if resolved else 0.0
+        return stats
+
+    def _shadow(self, gpt):
+        from gpt_handler import GPTHandler
+        shadow = GPTHandler(conversation_history=copy.deepcopy(gpt.conversation_history))
+        shadow.set_debate_context(gpt.position, gpt.motion)
+        # Drafts must never hold up a live turn's API calls
+        shadow.priority = 'prefetch'
+        return shadow
+
+    def _ready_own_points(self, key: str) -> Optional[str]:
+        future = self._own_points.get(key)
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def _draft(self, shadow, transcript: str, round_number: int, is_closing: bool):
+        with metrics.timed('speculation'):
+            text = shadow.generate_response(transcript, round_number=round_number, is_closing=is_closing)
+        return text, shadow.last_completion_tokens
+
+    def _miss(self, draft: Draft) -> None:
+        self._count('misses')
+        self._waste(draft)
+
+    def _waste(self, draft: Draft) -> None:
+        """Count a discarded draft's tokens, once it has finished generating."""
+        if draft.future.cancel():
+            return
+        draft.future.add_done_callback(lambda _: self._count('wasted_tokens', draft.tokens()))
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[stat] += amount
+
+speculator = Speculator()
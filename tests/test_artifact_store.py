@@ -0,0 +1,140 @@
+"""Publishing, lookup, eviction and expiry of generated audio."""
+import os
+import time
+import pytest
+import artifact_store as artifact_module
+from artifact_store import ArtifactStore
+
+@pytest.fixture
+def make_store(tmp_path):
+    stores = []
+
+    def make(**options):
+        options.setdefault('backend', 'disk')
+        options.setdefault('shared_directory', None)
+        store = ArtifactStore(**options)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.cleanup_all()
+
+def audio_file(store, content=b'RIFF....WAVE', suffix='.wav'):
+    path = store.new_path(suffix)
+    with open(path, 'wb') as audio:
+        audio.write(content)
+    return path
+
+@pytest.mark.parametrize('backend', ['disk', 'memory'])
+def test_published_audio_can_be_read_back(make_store, backend):
+    store = make_store(backend=backend)
+    artifact_id = store.publish(audio_file(store, b'audio bytes'))
+    artifact = store.get(artifact_id)
+    assert artifact.mimetype == 'audio/wav'
+    assert artifact.size == len(b'audio bytes')
+    with artifact.open() as audio:
+        assert audio.read() == b'audio bytes'
+    assert store.stats()['scratch_files'] == 0
+
+def test_memory_backend_keeps_no_file(make_store):
+    store = make_store(backend='memory')
+    path = audio_file(store)
+    artifact = store.get(store.publish(path))
+    assert artifact.path is None and not os.path.exists(path)
+
+def test_least_recently_used_artifacts_are_evicted(make_store):
+    store = make_store(max_count=2)
+    first = store.publish(audio_file(store))
+    second = store.publish(audio_file(store))
+    store.get(first)
+    third = store.publish(audio_file(store))
+    assert store.get(second) is None
+    assert store.get(first) is not None and store.get(third) is not None
+    assert store.stats()['evictions'] == 1
+
+def test_byte_budget_is_enforced(make_store):
+    store = make_store(max_bytes=25)
+    store.publish(audio_file(store, b'x' * 10))
+    store.publish(audio_file(store, b'x' * 10))
+    store.publish(audio_file(store, b'x' * 10))
+    assert store.stats()['artifacts'] == 2
+    assert store.stats()['bytes'] == 20
+
+def test_sweep_expires_unused_artifacts_and_scratch_files(make_store, monkeypatch):
+    store = make_store(ttl=60)
+    scratch = audio_file(store)
+    artifact_id = store.publish(audio_file(store))
+    path = store.get(artifact_id).path
+
+    now = time.time()
+    monkeypatch.setattr(artifact_module.time, 'time', lambda: now + 61)
+    store.sweep()
+    assert store.get(artifact_id) is None
+    assert not os.path.exists(path) and not os.path.exists(scratch)
+    assert store.stats()['expirations'] == 2
+
+def test_recently_used_artifacts_survive_the_sweep(make_store, monkeypatch):
+    store = make_store(ttl=60)
+    artifact_id = store.publish(audio_file(store))
+    now = time.time()
+    monkeypatch.setattr(artifact_module.time, 'time', lambda: now + 50)
+    store.get(artifact_id)
+    monkeypatch.setattr(artifact_module.time, 'time', lambda: now + 100)
+    store.sweep()
+    assert store.get(artifact_id) is not None
+
+def test_shared_directory_serves_other_workers_artifacts(make_store, tmp_path):
+    publisher = make_store(shared_directory=str(tmp_path / 'shared'))
+    server = make_store(shared_directory=str(tmp_path / 'shared'))
+    artifact_id = publisher.publish(audio_file(publisher, b'shared audio', '.mp3'))
+    artifact = server.get(artifact_id)
+    assert artifact.mimetype == 'audio/mpeg'
+    with artifact.open() as audio:
+        assert audio.read() == b'shared audio'
+
+@pytest.mark.parametrize('artifact_id', ['../../etc/passwd', 'A' * 32, '0' * 31, '', '0' * 32 + '.wav'])
+def test_shared_lookup_rejects_malformed_ids(make_store, tmp_path, artifact_id):
+    store = make_store(shared_directory=str(tmp_path / 'shared'))
+    assert store.get(artifact_id) is None
+
+def test_shared_directory_cannot_use_memory_backend(tmp_path):
+    with pytest.raises(ValueError):
+        ArtifactStore(backend='memory', shared_directory=str(tmp_path))
+
+def test_sweep_removes_files_left_by_dead_workers(make_store, tmp_path):
+    directory = tmp_path / 'shared'
+    store = make_store(shared_directory=str(directory), ttl=60)
+    orphan = directory / ('0' * 32 + '.wav')
+    orphan.write_bytes(b'left behind')
+    stale = time.time() - 120
+    os.utime(orphan, (stale, stale))
+    fresh = directory / ('1' * 32 + '.wav')
+    fresh.write_bytes(b'still in use')
+    own = store.publish(audio_file(store))
+
+    store.sweep()
+    assert not orphan.exists()
+    assert fresh.exists()
+    assert store.get(own) is not None
+
+def test_serving_a_shared_file_keeps_it_from_expiring(make_store, tmp_path):
+    directory = tmp_path / 'shared'
+    store = make_store(shared_directory=str(directory), ttl=60)
+    served = directory / ('2' * 32 + '.wav')
+    served.write_bytes(b'audio')
+    stale = time.time() - 120
+    os.utime(served, (stale, stale))
+    assert store.get('2' * 32) is not None
+    store.sweep()
+    assert served.exists()
+
+def test_forked_child_starts_its_own_sweeper(make_store):
+    store = make_store()
+    store.publish(audio_file(store))
+    assert store._sweeper is not None
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if store._sweeper is None else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
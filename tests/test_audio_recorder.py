@@ -0,0 +1,93 @@
+"""RingBuffer wraparound and overruns, and RingRecording's file and frame consumers."""
+import os
+import sys
+import types
+from types import SimpleNamespace
+import numpy as numpy
+import pytest
+import soundfile as soundfile
+
+try:
+    import sounddevice  # noqa: F401
+except OSError:
+    # Nothing here opens a device; hosts without PortAudio (e.g. CI) can still run these tests
+    sys.modules['sounddevice'] = types.ModuleType('sounddevice')
+
+import audio_recorder
+from audio_recorder import AudioRecorder, RingBuffer, RingRecording
+
+def ramp(start, count, channels=1):
+    """Frames whose values count up, so every frame can be traced back to where it was written."""
+    return numpy.arange(start, start + count, dtype=numpy.float32).repeat(channels).reshape(count, channels)
+
+def test_reads_wrap_around_the_end_of_the_buffer():
+    ring = RingBuffer(8, 1)
+    reader = ring.reader()
+    ring.write(ramp(0, 5))
+    assert numpy.array_equal(reader.read(5), ramp(0, 5))
+    # Frames 5..10 land at positions 5, 6, 7, 0, 1, 2
+    ring.write(ramp(5, 6))
+    assert numpy.array_equal(reader.read(6), ramp(5, 6))
+    assert reader.dropped == 0
+
+def test_a_block_larger_than_the_buffer_keeps_its_end():
+    ring = RingBuffer(4, 2)
+    reader = ring.reader()
+    ring.write(ramp(0, 10, channels=2))
+    assert numpy.array_equal(reader.read(10), ramp(6, 4, channels=2))
+    assert ring.frames_written == 10
+    assert reader.dropped == 6
+
+def test_a_reader_that_falls_behind_skips_ahead_and_counts_dropped_frames():
+    ring = RingBuffer(8, 1)
+    reader = ring.reader()
+    for start in range(0, 20, 4):
+        ring.write(ramp(start, 4))
+    assert numpy.array_equal(reader.read(20), ramp(12, 8))
+    assert reader.dropped == 12
+
+def test_a_new_reader_starts_at_the_oldest_frame_held():
+    ring = RingBuffer(8, 1)
+    ring.write(ramp(0, 12))
+    assert numpy.array_equal(ring.reader().read(8), ramp(4, 8))
+
+def test_read_exactly_returns_a_short_final_frame_after_close():
+    ring = RingBuffer(16, 1)
+    reader = ring.reader()
+    ring.write(ramp(0, 10))
+    ring.close()
+    assert numpy.array_equal(reader.read_exactly(4), ramp(0, 4))
+    assert numpy.array_equal(reader.read_exactly(4), ramp(4, 4))
+    assert numpy.array_equal(reader.read_exactly(4), ramp(8, 2))
+    assert reader.read_exactly(4) is None
+
+def test_recording_streams_to_file_and_frames(tmp_path):
+    path = str(tmp_path / "speech.wav")
+    recording = RingRecording(16000, 1, path, 'WAV', buffer_seconds=1.0, frame_size=480)
+    audio = (numpy.sin(numpy.arange(4000) / 10.0) * 0.5).astype(numpy.float32).reshape(-1, 1)
+    for start in range(0, len(audio), 1000):
+        recording.write(audio[start:start + 1000])
+    recording.close()
+
+    frames = list(recording.frames())
+    assert [len(frame) for frame in frames] == [480] * 8 + [160]
+    assert numpy.array_equal(numpy.concatenate(frames), audio)
+    assert recording.wait() == path
+    written, sample_rate = soundfile.read(path, dtype='float32', always_2d=True)
+    assert sample_rate == 16000
+    assert numpy.allclose(written, audio, atol=1 / 32768)
+    assert recording.duration == 0.25
+
+def failing_input_stream(**options):
+    raise OSError("PortAudio library not found")
+
+def test_a_microphone_that_cannot_be_opened_fails_the_recording(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_recorder, 'sounddevice', SimpleNamespace(InputStream=failing_input_stream))
+    recorder = AudioRecorder(16000, 1)
+
+    with pytest.raises(RuntimeError, match="PortAudio"):
+        recorder.ring_recording(str(tmp_path / "speech.wav")).wait()
+    with pytest.raises(RuntimeError, match="PortAudio"):
+        recorder.streaming_recording(lambda segment: None)
+    with pytest.raises(RuntimeError, match="PortAudio"):
+        recorder.record_to_file()
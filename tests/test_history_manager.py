@@ -0,0 +1,90 @@
+"""Token budgeting of conversation histories, with a word-counting tokenizer."""
+from history_manager import SUMMARY_PREFIX, HistoryManager, TokenCounter
+
+class WordCounter(TokenCounter):
+    def __init__(self):
+        self._encoding = None
+
+    def count_text(self, text):
+        return len(text.split())
+
+def history(turns, words=10):
+    messages = [{'role': 'system', 'content': 'You are a debater.'}]
+    for index in range(turns):
+        role = 'user' if index % 2 == 0 else 'assistant'
+        messages.append({'role': role, 'content': ' '.join([f'turn{index}'] * words)})
+    return messages
+
+class Summarizer:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, previous, messages):
+        self.calls.append((previous, [message['content'].split()[0] for message in messages]))
+        if self.fail:
+            raise RuntimeError("summary model unavailable")
+        return f"summary of {len(messages)}"
+
+def test_history_within_budget_is_untouched():
+    manager = HistoryManager(budget=1000, keep_recent=2, counter=WordCounter())
+    messages = history(4)
+    original = [dict(message) for message in messages]
+    summarize = Summarizer()
+    tokens = manager.fit(messages, summarize)
+    assert messages == original
+    assert summarize.calls == []
+    assert tokens == WordCounter().count_messages(messages)
+
+def test_older_turns_fold_into_a_summary_after_the_system_prompt():
+    manager = HistoryManager(budget=60, keep_recent=2, counter=WordCounter())
+    messages = history(6)
+    summarize = Summarizer()
+    tokens = manager.fit(messages, summarize)
+
+    assert summarize.calls == [('', ['turn0', 'turn1', 'turn2', 'turn3'])]
+    assert messages[0]['content'] == 'You are a debater.'
+    assert messages[1] == {'role': 'system', 'content': f"{SUMMARY_PREFIX}\nsummary of 4"}
+    assert [message['content'].split()[0] for message in messages[2:]] == ['turn4', 'turn5']
+    assert tokens == WordCounter().count_messages(messages) <= 60
+    assert manager.stats()['summarizations'] == 1
+    assert manager.stats()['messages_folded'] == 4
+
+def test_existing_summary_is_extended_not_folded_again():
+    manager = HistoryManager(budget=60, keep_recent=2, counter=WordCounter())
+    messages = history(6)
+    manager.fit(messages, Summarizer())
+    messages.extend(history(4)[1:])
+    summarize = Summarizer()
+    manager.fit(messages, summarize)
+
+    previous, folded = summarize.calls[0]
+    assert previous == 'summary of 4'
+    assert folded == ['turn4', 'turn5', 'turn0', 'turn1']
+    assert sum(message['content'].startswith(SUMMARY_PREFIX) for message in messages) == 1
+
+def test_recent_messages_are_never_folded():
+    manager = HistoryManager(budget=10, keep_recent=4, counter=WordCounter())
+    messages = history(3, words=50)
+    summarize = Summarizer()
+    manager.fit(messages, summarize)
+    assert summarize.calls == []
+    assert len(messages) == 4
+
+def test_failed_summary_keeps_the_full_history():
+    manager = HistoryManager(budget=60, keep_recent=2, counter=WordCounter())
+    messages = history(6)
+    original = [dict(message) for message in messages]
+    tokens = manager.fit(messages, Summarizer(fail=True))
+    assert messages == original
+    assert tokens > 60
+
+def test_call_stats():
+    manager = HistoryManager(counter=WordCounter())
+    manager.record_call(100)
+    manager.record_call(300)
+    stats = manager.stats()
+    assert stats['calls'] == 2
+    assert stats['last_prompt_tokens'] == 300
+    assert stats['max_prompt_tokens'] == 300
+    assert stats['avg_prompt_tokens'] == 200
@@ -0,0 +1,54 @@
+"""Prometheus export of stage histograms and collector gauges."""
+from metrics import MetricsRegistry
+
+def typed_metrics(text):
+    return {line.split()[2]: line.split()[3] for line in text.splitlines() if line.startswith('# TYPE')}
+
+def samples(text):
+    return [line for line in text.splitlines() if line and not line.startswith('#')]
+
+def test_histograms_are_cumulative():
+    registry = MetricsRegistry(prefix='test')
+    for seconds in (0.02, 0.2, 3.0):
+        registry.observe('tts', seconds)
+    text = registry.render_prometheus()
+    assert 'test_stage_latency_seconds_bucket{stage="tts",le="0.025"} 1' in text
+    assert 'test_stage_latency_seconds_bucket{stage="tts",le="0.25"} 2' in text
+    assert 'test_stage_latency_seconds_bucket{stage="tts",le="+Inf"} 3' in text
+    assert 'test_stage_latency_seconds_count{stage="tts"} 3' in text
+
+def test_every_sample_has_a_type():
+    registry = MetricsRegistry(prefix='test')
+    registry.observe('gpt', 0.5)
+    registry.register_collector('cache', lambda: {'hits': 3, 'hit_rate': 0.75, 'enabled': True, 'path': '/tmp'})
+    text = registry.render_prometheus()
+    types = typed_metrics(text)
+    assert types['test_cache_hits'] == 'gauge'
+    assert types['test_cache_hit_rate'] == 'gauge'
+    assert types['test_stage_latency_seconds'] == 'histogram'
+    for sample in samples(text):
+        name = sample.split('{')[0].split()[0]
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in types:
+                family = name[:-len(suffix)]
+        assert family in types, sample
+
+def test_non_numeric_and_failing_collectors_are_skipped():
+    registry = MetricsRegistry(prefix='test')
+
+    def broken():
+        raise RuntimeError("collector failed")
+
+    registry.register_collector('broken', broken)
+    registry.register_collector('cache', lambda: {'enabled': True, 'path': '/tmp', 'entries': 2})
+    assert samples(registry.render_prometheus()) == ['test_cache_entries 2']
+
+def test_turn_summary_totals_each_stage():
+    registry = MetricsRegistry(prefix='test')
+    registry.start_turn()
+    registry.observe('tts', 1.0)
+    registry.observe('tts', 0.5)
+    registry.observe('gpt', 2.0)
+    assert registry.end_turn() == {'tts': 1.5, 'gpt': 2.0}
+    assert registry.end_turn() == {}
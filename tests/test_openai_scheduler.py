@@ -0,0 +1,86 @@
+"""Priority order, back-pressure and token accounting of the OpenAI scheduler."""
+import time
+import threading
+import pytest
+from openai_scheduler import OpenAIScheduler, SchedulerBusy
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def exhausted_scheduler(requests_per_minute=240, **options):
+    """A scheduler whose request bucket is empty, so calls queue until it refills."""
+    scheduler = OpenAIScheduler(requests_per_minute=requests_per_minute, tokens_per_minute=100000, **options)
+    with scheduler._condition:
+        scheduler.requests.take(requests_per_minute)
+    return scheduler
+
+def queue_calls(scheduler, priorities, admitted):
+    """Start one call per priority, in order, each waiting until the previous one is queued."""
+    def call(priority):
+        with scheduler.reserve(10, priority):
+            admitted.append(priority)
+
+    threads = []
+    for priority in priorities:
+        thread = threading.Thread(target=call, args=(priority,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        assert wait_for(lambda: scheduler.stats()['queued'] + len(admitted) == len(threads))
+    return threads
+
+def test_calls_are_admitted_by_priority_then_arrival():
+    scheduler = exhausted_scheduler()
+    admitted = []
+    threads = queue_calls(scheduler, ['batch', 'prefetch', 'batch', 'interactive', 'prefetch'], admitted)
+    for thread in threads:
+        thread.join(10)
+    assert admitted == ['interactive', 'prefetch', 'prefetch', 'batch', 'batch']
+    assert scheduler.stats()['granted'] == 5
+
+def test_a_full_queue_rejects_calls_with_a_retry_hint():
+    scheduler = exhausted_scheduler(max_queue=2)
+    admitted = []
+    threads = queue_calls(scheduler, ['interactive', 'interactive'], admitted)
+
+    with pytest.raises(SchedulerBusy) as busy:
+        with scheduler.reserve(10):
+            pass
+    assert busy.value.retry_after >= 1.0
+    with pytest.raises(SchedulerBusy):
+        scheduler.ensure_capacity()
+    assert scheduler.stats()['rejected'] == 2
+
+    for thread in threads:
+        thread.join(10)
+    scheduler.ensure_capacity()
+
+def test_interactive_calls_give_up_after_the_queue_timeout():
+    scheduler = exhausted_scheduler(requests_per_minute=6, queue_timeout=0.1)
+    with pytest.raises(SchedulerBusy, match="Timed out") as busy:
+        with scheduler.reserve(10):
+            pass
+    assert busy.value.retry_after >= 1.0
+    stats = scheduler.stats()
+    assert stats['timed_out'] == 1
+    assert stats['queued'] == 0
+
+def test_settle_returns_unused_tokens():
+    scheduler = OpenAIScheduler(requests_per_minute=600, tokens_per_minute=1000)
+    with scheduler.reserve(300) as ticket:
+        assert scheduler.stats()['tokens_available'] == pytest.approx(700, abs=5)
+    scheduler.settle(ticket, 100)
+    assert scheduler.stats()['tokens_available'] == pytest.approx(900, abs=5)
+    # Usage the API did not report leaves the estimate in place
+    scheduler.settle(ticket, None)
+    assert scheduler.stats()['tokens_settled'] == 100
+
+def test_unknown_priorities_are_rejected():
+    scheduler = OpenAIScheduler()
+    with pytest.raises(ValueError):
+        with scheduler.reserve(10, 'urgent'):
+            pass
@@ -0,0 +1,175 @@
+"""Variants, rotation and expiry of cached openings, and how an opening's audio is kept for the cache."""
+import os
+import wave
+from types import SimpleNamespace
+import pytest
+import opening_cache as opening_module
+import gpt_handler
+from opening_cache import OpeningCache, OpeningAudio
+from artifact_store import artifact_store
+
+MOTION = "This house would ban homework"
+
+def write_wav(path, frames=160, value=1000):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(value.to_bytes(2, 'little', signed=True) * frames)
+    return path
+
+def wav_frames(path):
+    with wave.open(path, 'rb') as wav:
+        return wav.getnframes()
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(**options):
+        options.setdefault('variants', 1)
+        return OpeningCache(directory=str(tmp_path / "openings"), **options)
+    return make
+
+def test_spellings_of_a_motion_share_a_key(make_cache):
+    cache = make_cache()
+    assert cache.make_key(MOTION, 'for') == cache.make_key("  this HOUSE would ban, homework! ", 'FOR')
+    assert cache.make_key(MOTION, 'for') != cache.make_key(MOTION, 'against')
+
+def test_lookups_miss_until_every_variant_exists(make_cache):
+    cache = make_cache(variants=2)
+    cache.put(MOTION, 'for', "first")
+    assert cache.get(MOTION, 'for') is None
+    assert cache.missing_variants(MOTION, 'for') == 1
+    cache.put(MOTION, 'for', "second")
+    assert cache.get(MOTION, 'for') is not None
+    assert cache.stats()['misses'] == 1
+
+def test_variants_are_served_in_rotation(make_cache, monkeypatch):
+    cache = make_cache(variants=3)
+    clock = [1000.0]
+    monkeypatch.setattr(opening_module.time, 'time', lambda: clock[0])
+    for text in ("first", "second", "third"):
+        cache.put(MOTION, 'for', text)
+        clock[0] += 1
+    served = [cache.get(MOTION, 'for')['text'] for _ in range(4)]
+    assert served == ["first", "second", "third", "first"]
+
+def test_a_full_key_replaces_its_oldest_variant(make_cache, monkeypatch):
+    cache = make_cache(variants=2)
+    clock = [1000.0]
+    monkeypatch.setattr(opening_module.time, 'time', lambda: clock[0])
+    for text in ("first", "second", "third"):
+        cache.put(MOTION, 'for', text)
+        clock[0] += 1
+    assert {cache.get(MOTION, 'for')['text'] for _ in range(2)} == {"second", "third"}
+    assert cache.stats()['variants'] == 2
+
+def test_old_variants_expire(make_cache, monkeypatch):
+    cache = make_cache(max_age_days=1)
+    clock = [1000.0]
+    monkeypatch.setattr(opening_module.time, 'time', lambda: clock[0])
+    cache.put(MOTION, 'for', "stale")
+    clock[0] += 2 * 86400
+    assert cache.get(MOTION, 'for') is None
+    assert cache.stats()['variants'] == 0
+
+def test_audio_is_only_returned_for_the_same_voice(make_cache, tmp_path):
+    cache = make_cache()
+    cache.put(MOTION, 'for', "spoken", write_wav(str(tmp_path / "opening.wav")), 'voice-a')
+    assert cache.get(MOTION, 'for', 'voice-b')['audio_path'] is None
+    audio_path = cache.get(MOTION, 'for', 'voice-a')['audio_path']
+    assert wav_frames(audio_path) == 160
+
+def test_another_process_openings_are_picked_up(make_cache):
+    reader = make_cache()
+    assert reader.get(MOTION, 'for') is None
+    make_cache().put(MOTION, 'for', "prewarmed")
+    assert reader.get(MOTION, 'for')['text'] == "prewarmed"
+
+def test_least_recently_used_key_is_evicted(make_cache):
+    cache = make_cache()
+    cache.put(MOTION, 'for', "a" * 200)
+    # Room for two openings of this size, but not three
+    cache.max_bytes = cache.stats()['bytes'] * 5 // 2
+    cache.put("Another motion", 'for', "b" * 200)
+    cache.get(MOTION, 'for')
+    cache.put("A third motion", 'for', "c" * 200)
+    assert cache.get("Another motion", 'for') is None
+    assert cache.get(MOTION, 'for') is not None
+    assert cache.stats()['evictions'] == 1
+
+def test_opening_audio_joins_its_pieces_in_order(tmp_path):
+    opening_audio = OpeningAudio(enabled=True)
+    for frames in (100, 200):
+        piece = write_wav(str(tmp_path / f"piece{frames}.wav"), frames)
+        opening_audio.add(piece)
+        # Playback deletes each piece once it has been played
+        os.remove(piece)
+    joined = opening_audio.join()
+    try:
+        assert joined.endswith('.wav')
+        assert wav_frames(joined) == 300
+    finally:
+        artifact_store.discard(joined)
+        opening_audio.discard()
+    assert opening_audio.files == []
+
+def test_opening_audio_with_a_lost_piece_is_not_joined(tmp_path):
+    opening_audio = OpeningAudio(enabled=True)
+    opening_audio.add(write_wav(str(tmp_path / "piece.wav")))
+    opening_audio.add(str(tmp_path / "missing.wav"))
+    assert opening_audio.join() is None
+    opening_audio.discard()
+
+def test_disabled_opening_audio_keeps_nothing(tmp_path):
+    opening_audio = OpeningAudio(enabled=False)
+    opening_audio.add(write_wav(str(tmp_path / "piece.wav")))
+    assert opening_audio.files == []
+    assert opening_audio.join() is None
+
+class FakeCompletions:
+    def __init__(self, deltas):
+        self.deltas = deltas
+
+    def create(self, **request):
+        if isinstance(self.deltas, Exception):
+            raise self.deltas
+        return self.events()
+
+    def events(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+@pytest.fixture
+def make_gpt(monkeypatch):
+    def make(deltas):
+        client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(deltas)))
+        monkeypatch.setattr(gpt_handler, 'get_client', lambda: client)
+        gpt = gpt_handler.GPTHandler()
+        gpt.set_debate_context('for', MOTION)
+        return gpt
+    return make
+
+def test_a_finished_stream_records_the_whole_opening(make_gpt):
+    gpt = make_gpt(["Homework ", "should go.\n\n", "It wastes time."])
+    assert "".join(gpt.stream_response(None, round_number=1)) == "Homework should go.\n\nIt wastes time."
+    assert gpt.conversation_history[-1] == {'role': 'assistant', 'content': "Homework should go.\n\nIt wastes time."}
+
+def test_a_stream_closed_early_keeps_what_was_generated(make_gpt):
+    gpt = make_gpt(["Homework ", "should go.", " It wastes time."])
+    stream = gpt.stream_response(None, round_number=1)
+    assert next(stream) == "Homework "
+    stream.close()
+    assert gpt.conversation_history[-1] == {'role': 'assistant', 'content': "Homework "}
+
+def test_a_stream_that_fails_before_any_text_drops_its_prompt(make_gpt):
+    gpt = make_gpt(ConnectionError("connection reset"))
+    history = list(gpt.conversation_history)
+    with pytest.raises(ConnectionError):
+        list(gpt.stream_response(None, round_number=1))
+    assert gpt.conversation_history == history
+
+def test_a_stream_without_usage_estimates_its_completion_tokens(make_gpt):
+    gpt = make_gpt(["Homework ", "should go."])
+    gpt.last_completion_tokens = 999
+    "".join(gpt.stream_response(None, round_number=1))
+    assert 0 < gpt.last_completion_tokens < 10
@@ -0,0 +1,104 @@
+"""PlaybackEngine behaviour on a NullSink, so no sound hardware is needed."""
+import os
+import time
+import wave
+import threading
+import numpy as numpy
+import pytest
+from audio_codec import AudioDecodeError
+from playback import NullSink, PlaybackEngine
+
+SAMPLE_RATE = 16000
+
+def write_wav(path, seconds, value):
+    """Write a mono clip whose every sample is value, so played audio can be traced back to it."""
+    samples = numpy.full(int(seconds * SAMPLE_RATE), value, dtype=numpy.int16)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def make_engine():
+    engines = []
+
+    def make(realtime=False, **kwargs):
+        sink = NullSink(realtime=realtime, capture=True)
+        engine = PlaybackEngine(sink=sink, sample_rate=SAMPLE_RATE, block_frames=256, buffer_seconds=0.25, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+def test_clips_play_back_to_back_in_order(tmp_path, make_engine):
+    engine = make_engine()
+    first = engine.enqueue(write_wav(tmp_path / 'first.wav', 0.3, 100))
+    second = engine.enqueue(write_wav(tmp_path / 'second.wav', 0.2, 200))
+
+    assert engine.wait_idle(timeout=5)
+    played = numpy.concatenate(engine.sink.captured).ravel()
+    played = played[played != 0]
+    assert played.tolist() == [100] * first.total_frames + [200] * second.total_frames
+    assert first.frames_played == first.total_frames == int(0.3 * SAMPLE_RATE)
+    assert second.frames_played == second.total_frames == int(0.2 * SAMPLE_RATE)
+    assert not first.interrupted and not second.interrupted
+
+def test_interrupt_stops_current_clip_and_drops_queue(tmp_path, make_engine):
+    started = threading.Event()
+    engine = make_engine(realtime=True, on_progress=lambda item, frames: started.set())
+    cleaned = []
+    playing = engine.enqueue(write_wav(tmp_path / 'long.wav', 5.0, 100), after_decode=cleaned.append)
+    queued = engine.enqueue(write_wav(tmp_path / 'queued.wav', 1.0, 200), after_decode=cleaned.append)
+
+    assert started.wait(5)
+    engine.interrupt()
+
+    assert playing.wait(1) and queued.wait(1)
+    assert playing.interrupted and queued.interrupted
+    assert playing.frames_played < int(5.0 * SAMPLE_RATE)
+    assert queued.frames_played == 0
+    assert not engine.busy
+    # The queued clip was never decoded but its file is still released
+    assert wait_for(lambda: sorted(cleaned) == sorted([playing.path, queued.path]))
+
+def test_after_decode_runs_for_every_clip(tmp_path, make_engine):
+    engine = make_engine()
+
+    def remove(path):
+        os.remove(path)
+
+    items = [engine.enqueue(write_wav(tmp_path / f'{index}.wav', 0.1, 100 + index), after_decode=remove)
+             for index in range(3)]
+
+    assert engine.wait_idle(timeout=5)
+    assert wait_for(lambda: not any(os.path.exists(item.path) for item in items))
+
+def test_decode_failure_fails_only_that_clip(tmp_path, make_engine):
+    engine = make_engine()
+    corrupt = tmp_path / 'corrupt.wav'
+    corrupt.write_bytes(b'not a wav file')
+    cleaned = []
+
+    with pytest.raises(AudioDecodeError):
+        engine.play(str(corrupt), after_decode=cleaned.append)
+    assert wait_for(lambda: cleaned == [str(corrupt)])
+
+    # Errors other than AudioDecodeError must not kill the decoder either
+    with pytest.raises(OSError):
+        engine.play(str(tmp_path / 'missing.wav'))
+
+    item = engine.play(write_wav(tmp_path / 'good.wav', 0.1, 100))
+    assert item.error is None
+    assert item.frames_played == item.total_frames
@@ -0,0 +1,73 @@
+"""Sentence boundaries for streamed TTS, however the text is split into deltas."""
+import asyncio
+from sentence_segmenter import SentenceSegmenter, segment_async_stream, segment_stream
+
+TEXT = ("Cars pollute our cities and harm our health. Dr. Smith's study shows this clearly! "
+        "Do we really want that for our children? I think not.")
+
+def characters(text):
+    return list(text)
+
+def test_splits_on_sentence_punctuation():
+    assert list(segment_stream([TEXT], min_chars=10)) == [
+        "Cars pollute our cities and harm our health.",
+        "Dr. Smith's study shows this clearly!",
+        "Do we really want that for our children?",
+        "I think not.",
+    ]
+
+def test_result_does_not_depend_on_delta_boundaries():
+    whole = list(segment_stream([TEXT], min_chars=10))
+    assert list(segment_stream(characters(TEXT), min_chars=10)) == whole
+    words = [word + ' ' for word in TEXT.split(' ')]
+    assert list(segment_stream(words, min_chars=10)) == whole
+
+def test_abbreviations_and_initials_do_not_end_sentences():
+    text = "As J. S. Mill argued, liberty matters, e.g. in speech. Mr. Jones agrees with that point."
+    assert list(segment_stream(characters(text), min_chars=10)) == [
+        "As J. S. Mill argued, liberty matters, e.g. in speech.",
+        "Mr. Jones agrees with that point.",
+    ]
+
+def test_short_sentences_merge_with_the_next():
+    text = "No. That claim is simply wrong, and here is why. Yes."
+    assert list(segment_stream([text], min_chars=20)) == [
+        "No. That claim is simply wrong, and here is why.",
+        "Yes.",
+    ]
+
+def test_closing_quotes_stay_with_their_sentence():
+    text = 'They said "this will never work." It did work in the end, though.'
+    assert list(segment_stream([text], min_chars=10)) == [
+        'They said "this will never work."',
+        "It did work in the end, though.",
+    ]
+
+def test_paragraph_breaks_end_sentences():
+    text = "First, consider the evidence\n\nSecond, consider the cost of inaction"
+    assert list(segment_stream([text], min_chars=10)) == [
+        "First, consider the evidence",
+        "Second, consider the cost of inaction",
+    ]
+
+def test_feed_waits_for_whitespace_after_punctuation():
+    segmenter = SentenceSegmenter(min_chars=5)
+    # "3." could still be "3.5", so nothing is emitted until the next character arrives
+    assert segmenter.feed("Growth was 3.") == []
+    assert segmenter.feed("5 percent. Then") == ["Growth was 3.5 percent."]
+    assert segmenter.flush() == ["Then"]
+    assert segmenter.flush() == []
+
+def test_empty_stream():
+    assert list(segment_stream([])) == []
+    assert list(segment_stream(["", "  "])) == []
+
+def test_async_stream_matches_sync():
+    async def deltas():
+        for delta in characters(TEXT):
+            yield delta
+
+    async def collect():
+        return [sentence async for sentence in segment_async_stream(deltas(), min_chars=10)]
+
+    assert asyncio.run(collect()) == list(segment_stream([TEXT], min_chars=10))
@@ -0,0 +1,107 @@
+"""Session persistence on both backends: round trips, TTL expiry and LRU eviction."""
+import pytest
+import session_store
+from session_store import MemorySessionBackend, SQLiteSessionBackend, SessionStore
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store.time, 'time', clock.time)
+    return clock
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path, clock):
+    if request.param == 'memory':
+        return MemorySessionBackend(max_entries=10, ttl=60)
+    return SQLiteSessionBackend(str(tmp_path / 'sessions.sqlite3'), ttl=60, purge_interval=0)
+
+def test_session_round_trip(backend):
+    store = SessionStore(backend)
+    session = store.create()
+    session.reset('This house would ban cars', 'for')
+    session.round_count = 3
+    session.conversation_history.append({'role': 'user', 'content': 'hello'})
+    store.save(session)
+
+    loaded = store.load(session.session_id)
+    assert loaded.motion == 'This house would ban cars'
+    assert loaded.position == 'for'
+    assert loaded.round_count == 3
+    assert loaded.conversation_history == session.conversation_history
+
+def test_loaded_sessions_do_not_share_state(backend):
+    store = SessionStore(backend)
+    session = store.create()
+    store.save(session)
+    store.load(session.session_id).conversation_history.append({'role': 'user', 'content': 'unsaved'})
+    assert len(store.load(session.session_id).conversation_history) == 1
+
+def test_unknown_and_missing_ids(backend):
+    store = SessionStore(backend)
+    assert store.load(None) is None
+    assert store.load('') is None
+    assert store.load('no-such-session') is None
+
+def test_idle_sessions_expire(backend, clock):
+    store = SessionStore(backend)
+    session = store.create()
+    store.save(session)
+    clock.now += 59
+    assert store.load(session.session_id) is not None
+    # Loading refreshed it, so it lives another full TTL
+    clock.now += 59
+    assert store.load(session.session_id) is not None
+    clock.now += 61
+    assert store.load(session.session_id) is None
+
+def test_delete(backend):
+    store = SessionStore(backend)
+    session = store.create()
+    store.save(session)
+    store.delete(session.session_id)
+    assert store.load(session.session_id) is None
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    backend = MemorySessionBackend(max_entries=2, ttl=60)
+    backend.put('a', {'round_count': 1})
+    clock.now += 1
+    backend.put('b', {'round_count': 1})
+    clock.now += 1
+    backend.get('a')  # 'b' is now the least recently used
+    backend.put('c', {'round_count': 1})
+    assert len(backend) == 2
+    assert backend.get('b') is None
+    assert backend.get('a') is not None and backend.get('c') is not None
+
+def test_memory_backend_drops_expired_sessions_on_write(clock):
+    backend = MemorySessionBackend(max_entries=10, ttl=60)
+    backend.put('old', {})
+    clock.now += 120
+    backend.put('new', {})
+    assert len(backend) == 1
+
+def test_sqlite_backend_purges_expired_rows(tmp_path, clock):
+    backend = SQLiteSessionBackend(str(tmp_path / 'sessions.sqlite3'), ttl=60, purge_interval=0)
+    backend.put('old', {})
+    clock.now += 120
+    backend.put('new', {})
+    assert len(backend) == 1
+
+def test_sqlite_sessions_are_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'sessions.sqlite3')
+    first = SessionStore(SQLiteSessionBackend(path, ttl=60))
+    session = first.create()
+    session.reset('Motion', 'against')
+    first.save(session)
+    assert SessionStore(SQLiteSessionBackend(path, ttl=60)).load(session.session_id).position == 'against'
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        session_store.create_session_store('redis')
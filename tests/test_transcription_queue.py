@@ -0,0 +1,69 @@
+"""Batching and clip splitting of the transcription queue, with the Whisper decode stubbed out."""
+import numpy as numpy
+from transcription_queue import TranscriptionScheduler, split_on_silence
+
+SAMPLE_RATE = 16000
+
+def tone(seconds, amplitude=0.5):
+    return numpy.full(int(seconds * SAMPLE_RATE), amplitude, dtype=numpy.float32)
+
+def silence(seconds):
+    return numpy.zeros(int(seconds * SAMPLE_RATE), dtype=numpy.float32)
+
+class FakeScheduler(TranscriptionScheduler):
+    """Decodes each clip as its length; clips whose first sample is negative fail the whole batch."""
+
+    def __init__(self, max_wait_ms=0):
+        super().__init__(max_batch_size=8, max_wait_ms=max_wait_ms)
+        self.batches = []
+
+    def _decode(self, jobs):
+        self.batches.append(len(jobs))
+        if any(job.audio[0] < 0 for job in jobs):
+            raise ValueError("undecodable clip")
+        return [[str(len(job.audio))] for job in jobs]
+
+def test_short_clips_are_not_split():
+    audio = tone(10)
+    pieces = split_on_silence(audio, 30 * SAMPLE_RATE)
+    assert len(pieces) == 1 and len(pieces[0]) == len(audio)
+
+def test_long_clips_are_cut_in_the_pause_before_the_limit():
+    audio = numpy.concatenate([tone(27), silence(1), tone(10)])
+    pieces = split_on_silence(audio, 30 * SAMPLE_RATE)
+    assert len(pieces) == 2
+    assert 27 * SAMPLE_RATE <= len(pieces[0]) <= 28 * SAMPLE_RATE
+    assert numpy.concatenate(pieces).tolist() == audio.tolist()
+
+def test_pieces_never_exceed_the_limit():
+    audio = tone(95)
+    pieces = split_on_silence(audio, 30 * SAMPLE_RATE)
+    assert all(len(piece) <= 30 * SAMPLE_RATE for piece in pieces)
+    assert sum(len(piece) for piece in pieces) == len(audio)
+
+def test_empty_audio_is_one_piece():
+    assert [len(piece) for piece in split_on_silence(silence(0), 30 * SAMPLE_RATE)] == [0]
+
+def test_batch_results_go_to_their_own_callers():
+    scheduler = FakeScheduler()
+    jobs = [scheduler.submit(tone(seconds)) for seconds in (1, 2, 3)]
+    assert [job.result(5) for job in jobs] == [str(SAMPLE_RATE), str(2 * SAMPLE_RATE), str(3 * SAMPLE_RATE)]
+
+def test_one_bad_clip_does_not_fail_its_batch():
+    # A long batching window so all three clips land in one batch
+    scheduler = FakeScheduler(max_wait_ms=200)
+    jobs = [
+        scheduler.submit(tone(1)),
+        scheduler.submit(tone(1, amplitude=-0.5)),
+        scheduler.submit(tone(2)),
+    ]
+    results = []
+    for job in jobs:
+        try:
+            results.append(job.result(5))
+        except ValueError:
+            results.append('failed')
+    assert results == [str(SAMPLE_RATE), 'failed', str(2 * SAMPLE_RATE)]
+    assert scheduler.batches == [3, 1, 1, 1]
+    stats = scheduler.stats()
+    assert stats['completed'] == 2 and stats['failed'] == 1
@@ -0,0 +1,136 @@
+"""Run headless bot-vs-bot debates, e.g. to regression-test prompt changes.
+
+Reads one motion per line (same format as prewarm_openings.py) and has two
+GPT handlers argue each motion for and against over a number of rounds.
+Debates run in parallel worker processes and each finished transcript is
+appended to a JSONL file as soon as it completes. Debate ids start with
+the run's start time, so repeated runs into the same output file (or audio
+directory) never collide.
+
+    python tournament.py motions.txt --rounds 3 --repeats 2 --workers 8 --output results.jsonl
+    python tournament.py motions.txt --audio-dir tournament_audio
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from gpt_handler import GPTHandler
+from prewarm_openings import read_motions
+from openai_scheduler import openai_scheduler
+from config import (MAX_ROUNDS, GPT_MODEL, GPT_TEMPERATURE, PROMPT_VERSION, ELEVEN_LABS_VOICE_ID,
+                    OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE)
+
+# Per-process TTS handler, created by the pool initializer when audio is rendered
+_tts = None
+
+def init_worker(render_audio, workers):
+    global _tts
+    # Rate limits are per process, so each worker gets its share of the account's
+    openai_scheduler.set_limits(OPENAI_REQUESTS_PER_MINUTE / workers, OPENAI_TOKENS_PER_MINUTE / workers)
+    if render_audio:
+        from offline_tts import pyttsx3_pool
+        from tts_handler import TTSHandler
+        # Debates already run one per worker process; a full engine pool in each would multiply the processes
+        pyttsx3_pool.workers = 1
+        _tts = TTSHandler(playback=False)
+        _tts.warmup()
+
+def render_turn(text, audio_dir, debate_id, turn_index, side):
+    """Synthesize a turn into audio_dir and return the file's path."""
+    audio_file = _tts.text_to_speech(text, ELEVEN_LABS_VOICE_ID)
+    target_dir = os.path.join(audio_dir, debate_id)
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, f"{turn_index:02d}_{side}{os.path.splitext(audio_file)[1]}")
+    shutil.move(audio_file, target)
+    return target
+
+def run_debate(debate_id, motion, rounds, audio_dir=None):
+    """Argue one motion between two bots and return the transcript record."""
+    sides = {}
+    for side in ('for', 'against'):
+        sides[side] = GPTHandler()
+        sides[side].set_debate_context(side, motion)
+        sides[side].priority = 'batch'
+
+    turns = []
+    started = time.perf_counter()
+    last_speech = None
+    for round_number in range(1, rounds + 1):
+        is_closing = round_number == rounds
+        for side in ('for', 'against'):
+            gpt = sides[side]
+            turn_started = time.perf_counter()
+            text = gpt.generate_response(last_speech, round_number=round_number, is_closing=is_closing)
+            turn = {
+                'round': round_number,
+                'side': side,
+                'kind': 'opening' if last_speech is None else 'closing' if is_closing else 'rebuttal',
+                'text': text,
+                'completion_tokens': gpt.last_completion_tokens,
+                'seconds': round(time.perf_counter() - turn_started, 3)
+            }
+            if audio_dir is not None:
+                turn['audio'] = render_turn(text, audio_dir, debate_id, len(turns), side)
+            turns.append(turn)
+            last_speech = text
+
+    return {
+        'debate_id': debate_id,
+        'motion': motion,
+        'rounds': rounds,
+        'model': GPT_MODEL,
+        'temperature': GPT_TEMPERATURE,
+        'prompt_version': PROMPT_VERSION,
+        'turns': turns,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless bot-vs-bot debates")
+    parser.add_argument('motions', help="Text file with one motion per line")
+    parser.add_argument('--rounds', type=int, default=MAX_ROUNDS, help="Rounds per debate; the last is the closing")
+    parser.add_argument('--repeats', type=int, default=1, help="Debates per motion")
+    parser.add_argument('--workers', type=int, default=4, help="Debates run concurrently, one process each")
+    parser.add_argument('--output', default='tournament.jsonl', help="JSONL file transcripts are appended to")
+    parser.add_argument('--audio-dir', help="Also synthesize every turn into this directory")
+    args = parser.parse_args()
+
+    run_id = time.strftime('%Y%m%d-%H%M%S')
+    jobs = [(f"{run_id}-{index:04d}-{repeat}", motion)
+            for index, motion in enumerate(read_motions(args.motions))
+            for repeat in range(args.repeats)]
+    print(f"Run {run_id}: {len(jobs)} debates on {args.workers} workers")
+
+    failures = 0
+    workers = max(1, args.workers)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                   initargs=(args.audio_dir is not None, workers))
+    try:
+        with open(args.output, 'a', encoding='utf-8') as output:
+            futures = {executor.submit(run_debate, debate_id, motion, args.rounds, args.audio_dir): (debate_id, motion)
+                       for debate_id, motion in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                debate_id, motion = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failures += 1
+                    logging.error(f"Debate {debate_id} on '{motion}' failed: {e}")
+                    record = {'debate_id': debate_id, 'motion': motion, 'error': str(e)}
+                record['run_id'] = run_id
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                print(f"[{done}/{len(jobs)}] {motion}")
+    except KeyboardInterrupt:
+        print("Interrupted; finished debates are in", args.output)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    print(f"Done with {failures} failures. Transcripts: {args.output}")
+
+if __name__ == '__main__':
+    main()
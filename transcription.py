@@ -0,0 +1,99 @@
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional, Union
+import numpy as numpy
+from audio_codec import WHISPER_SAMPLE_RATE, decode_audio_bytes, prepare_audio_array
+from whisper_registry import whisper_registry
+from metrics import metrics
+
+def load_audio(audio: Union[bytes, numpy.ndarray, str], sample_rate: Optional[int] = None):
+    """Normalize uploaded bytes, recorder arrays or file paths into model input.
+
+    Bytes and arrays become a 16 kHz float32 buffer in memory; paths are
+    passed through for Whisper to load itself.
+    """
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return decode_audio_bytes(bytes(audio))
+    if isinstance(audio, numpy.ndarray):
+        return prepare_audio_array(audio, sample_rate or WHISPER_SAMPLE_RATE)
+    return audio
+
+def transcribe_audio(audio: Union[bytes, numpy.ndarray, str], sample_rate: Optional[int] = None,
+                     model_name: Optional[str] = None) -> str:
+    model = whisper_registry.get(model_name)
+    with metrics.timed('transcription'):
+        result = model.transcribe(load_audio(audio, sample_rate))
+    return result["text"]
+
+class IncrementalTranscriber:
+    """Transcribe utterance segments on a background worker while recording continues.
+
+    Each segment is conditioned on the text transcribed so far, and finish()
+    only has to wait for the last segment once the speaker stops.
+    on_partial, if given, is called on the worker with the transcript so far
+    after every segment.
+    """
+
+    def __init__(self, sample_rate: int, model_name: Optional[str] = None,
+                 on_partial: Optional[Callable[[str], None]] = None):
+        self.sample_rate = sample_rate
+        self.model_name = model_name
+        self.on_partial = on_partial
+        self._segments: "queue.Queue" = queue.Queue()
+        self._texts: List[str] = []
+        self._lock = threading.Lock()
+        self._error: Optional[Exception] = None
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def add_segment(self, audio: numpy.ndarray) -> None:
+        self._segments.put(audio)
+
+    def partial_text(self) -> str:
+        """Transcript of the segments finished so far."""
+        with self._lock:
+            return " ".join(self._texts)
+
+    def cancel(self) -> None:
+        """Stop the worker without waiting for a transcript."""
+        self._segments.put(None)
+
+    def finish(self) -> str:
+        """Wait for queued segments and return the full transcript."""
+        self._segments.put(None)
+        with metrics.timed('transcription_finish'):
+            self._worker.join()
+        if self._error is not None:
+            raise self._error
+        return self.partial_text()
+
+    def _run(self) -> None:
+        try:
+            model = whisper_registry.get(self.model_name)
+        except Exception as e:
+            # Keep draining segments so finish() raises this instead of returning nothing
+            self._error = e
+        while True:
+            audio = self._segments.get()
+            if audio is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                # Condition on the tail of the transcript for consistent wording
+                with metrics.timed('transcription_segment'):
+                    result = model.transcribe(prepare_audio_array(audio, self.sample_rate),
+                                              initial_prompt=self.partial_text()[-200:] or None)
+            except Exception as e:
+                self._error = e
+                continue
+            text = result["text"].strip()
+            if text:
+                with self._lock:
+                    self._texts.append(text)
+                if self.on_partial is not None:
+                    try:
+                        self.on_partial(self.partial_text())
+                    except Exception as e:
+                        logging.warning(f"Partial transcript callback failed: {e}")
@@ -0,0 +1,164 @@
+import threading
+import queue
+import time
+import logging
+from concurrent.futures import Future
+from typing import List, Optional
+import numpy as numpy
+from whisper_registry import whisper_registry
+from metrics import metrics
+from audio_codec import WHISPER_SAMPLE_RATE
+from config import TRANSCRIBE_MAX_BATCH, TRANSCRIBE_MAX_WAIT_MS, TRANSCRIBE_SPLIT_SEARCH_SECONDS
+
+def split_on_silence(audio: numpy.ndarray, max_samples: int,
+                     search_samples: int = int(TRANSCRIBE_SPLIT_SEARCH_SECONDS * WHISPER_SAMPLE_RATE),
+                     window: int = WHISPER_SAMPLE_RATE // 20) -> List[numpy.ndarray]:
+    """Cut audio into pieces of at most max_samples without splitting words.
+
+    Each cut falls in the quietest window of the last search_samples before
+    the limit, rather than exactly at it.
+    """
+    search_samples = min(search_samples, max_samples)
+    pieces = []
+    start = 0
+    while len(audio) - start > max_samples:
+        end = start + max_samples
+        usable = search_samples // window * window
+        region = audio[end - usable:end]
+        energy = numpy.square(region.reshape(-1, window)).mean(axis=1)
+        # The latest of equally quiet windows keeps pieces as long as possible
+        quietest = len(energy) - 1 - int(numpy.argmin(energy[::-1]))
+        cut = end - usable + quietest * window + window // 2
+        pieces.append(audio[start:cut])
+        start = cut
+    pieces.append(audio[start:])
+    return pieces
+
+class TranscriptionJob:
+    def __init__(self, audio: numpy.ndarray):
+        self.audio = audio
+        self.future: Future = Future()
+        self.submitted_at = time.perf_counter()
+
+class TranscriptionScheduler:
+    """Batch concurrent transcription requests through one shared model.
+
+    Requests are collected for up to max_wait_ms, split at pauses into
+    segments of at most 30 seconds, padded and decoded together in batches
+    of at most max_batch_size segments. Each caller gets a Future for its
+    own text. If a batch fails, its requests are retried one at a time so
+    a single bad clip only fails its own caller.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, max_batch_size: int = TRANSCRIBE_MAX_BATCH,
+                 max_wait_ms: int = TRANSCRIBE_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: "queue.Queue[TranscriptionJob]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'batches': 0,
+            'segments': 0,
+            'max_queue_depth': 0,
+            'total_wait_seconds': 0.0
+        }
+
+    def submit(self, audio: numpy.ndarray) -> Future:
+        """Queue 16 kHz float32 audio and return a Future for its transcript."""
+        job = TranscriptionJob(audio)
+        self._ensure_worker()
+        self._pending.put(job)
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._pending.qsize())
+        return job.future
+
+    def transcribe(self, audio: numpy.ndarray, timeout: Optional[float] = None) -> str:
+        return self.submit(audio).result(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._pending.qsize()
+        stats['avg_batch_segments'] = stats['segments'] / stats['batches'] if stats['batches'] else 0.0
+        finished = stats['completed'] + stats['failed']
+        stats['avg_wait_seconds'] = stats['total_wait_seconds'] / finished if finished else 0.0
+        return stats
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            jobs = [self._pending.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(jobs) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    jobs.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(jobs)
+
+    def _process(self, jobs: List[TranscriptionJob]) -> None:
+        started = time.perf_counter()
+        try:
+            texts = self._decode(jobs)
+        except Exception as e:
+            if len(jobs) > 1:
+                logging.warning(f"Batched transcription failed, retrying each request alone: {e}")
+                for job in jobs:
+                    self._process([job])
+                return
+            logging.error(f"Transcription failed: {e}")
+            jobs[0].future.set_exception(e)
+            self._record(jobs, started, failed=True)
+            return
+
+        for job, parts in zip(jobs, texts):
+            job.future.set_result(" ".join(part for part in parts if part))
+        self._record(jobs, started, failed=False)
+
+    def _decode(self, jobs: List[TranscriptionJob]) -> List[List[str]]:
+        import torch
+        import whisper
+        model = whisper_registry.get(self.model_name)
+        segments = []
+        for index, job in enumerate(jobs):
+            for piece in split_on_silence(job.audio, whisper.audio.N_SAMPLES):
+                chunk = whisper.pad_or_trim(piece)
+                segments.append((index, whisper.log_mel_spectrogram(chunk, model.dims.n_mels)))
+
+        options = whisper.DecodingOptions(fp16=model.device.type == 'cuda', without_timestamps=True)
+        texts: List[List[str]] = [[] for _ in jobs]
+        for batch_start in range(0, len(segments), self.max_batch_size):
+            batch = segments[batch_start:batch_start + self.max_batch_size]
+            mels = torch.stack([mel for _, mel in batch]).to(model.device)
+            with metrics.timed('transcription_batch'):
+                results = whisper.decode(model, mels, options)
+            for (index, _), result in zip(batch, results):
+                texts[index].append(result.text.strip())
+            with self._lock:
+                self._stats['batches'] += 1
+                self._stats['segments'] += len(batch)
+        return texts
+
+    def _record(self, jobs: List[TranscriptionJob], started: float, failed: bool) -> None:
+        finished = time.perf_counter()
+        for job in jobs:
+            metrics.observe('transcription', finished - job.submitted_at)
+        with self._lock:
+            self._stats['failed' if failed else 'completed'] += len(jobs)
+            self._stats['total_wait_seconds'] += sum(started - job.submitted_at for job in jobs)
+
+transcription_scheduler = TranscriptionScheduler()
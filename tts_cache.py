@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized audio chunks.
+
+    Entries are keyed by a hash of the normalized text, service, voice and
+    voice settings, and evicted least-recently-used once the byte budget is
+    exceeded. Access times are kept in file mtimes so the LRU order
+    survives restarts.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (path, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace and unicode variants that do not change the speech."""
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+    def make_key(self, text: str, service: str, voice_id: Optional[str] = None,
+                 settings: Optional[dict] = None) -> str:
+        payload = json.dumps({
+            'text': self.normalize(text),
+            'service': service,
+            'voice_id': voice_id,
+            'settings': settings or {}
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached file for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(entry[0])
+        except OSError:
+            pass
+        return entry[0]
+
+    def put(self, key: str, audio_file: str) -> None:
+        """Copy a synthesized file into the cache."""
+        suffix = os.path.splitext(audio_file)[1]
+        target = os.path.join(self.directory, key + suffix)
+        try:
+            # Write to a temporary name first so readers never see partial files
+            fd, staging = tempfile.mkstemp(dir=self.directory, suffix='.part')
+            os.close(fd)
+            shutil.copyfile(audio_file, staging)
+            os.replace(staging, target)
+            size = os.path.getsize(target)
+        except OSError as e:
+            logging.warning(f"Failed to cache TTS audio: {e}")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key, remove_file=self._entries[key][0] != target)
+            self._entries[key] = (target, size)
+            self._total_bytes += size
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _load_index(self) -> None:
+        """Rebuild the index from the cache directory, oldest access first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            key, suffix = os.path.splitext(name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if suffix == '.part':
+                # Leftover from an interrupted write; recent ones may belong to another worker
+                if time.time() - stat.st_mtime > 3600:
+                    os.remove(path)
+                continue
+            entries.append((stat.st_mtime, key, path, stat.st_size))
+
+        for _, key, path, size in sorted(entries):
+            self._entries[key] = (path, size)
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key: str, remove_file: bool = True) -> None:
+        path, size = self._entries.pop(key)
+        self._total_bytes -= size
+        if remove_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+tts_cache = TTSCache()
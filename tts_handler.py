@@ -1,57 +1,122 @@
-import pyttsx3
-from gtts import gTTS
 import os
+import re
 import wave
-import tempfile
-import pygame
+import shutil
 import time
 import logging
 import threading
-from pydub import AudioSegment
+import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from eleven_labs import ElevenLabsHandler
-from typing import Dict, List
+from tts_cache import tts_cache
+from artifact_store import artifact_store
+from audio_codec import OUTPUT_SUFFIXES, AudioDecodeError, concatenate_audio, convert_to_wav
+from provider_scheduler import HedgedScheduler, AllProvidersFailed
+from metrics import metrics
+from playback import get_player
+from offline_tts import pyttsx3_pool
+from config import (TTS_CACHE_ENABLED, TTS_MAX_WORKERS, TTS_SERVICE_CONCURRENCY, TTS_RETRY_COUNT,
+                    TTS_RETRY_BACKOFF)
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
 
 class TTSError(Exception):
     """Custom exception for TTS service failures"""
     pass
 
 class TTSHandler:
-    def __init__(self):
+    """Text-to-speech with provider fallback.
+
+    Heavy audio libraries are imported on first use. Servers pass
+    playback=False so no output device is ever opened; call warmup()
+    (e.g. from a background thread) to initialize the offline engine.
+
+    With output_format 'mp3' or 'opus', finished audio is encoded at
+    output_bitrate before it is returned. 'wav' returns what the service
+    produced, which is MP3 for ElevenLabs.
+    """
+
+    def __init__(self, playback=True, output_format='wav', output_bitrate='48k'):
+        if output_format not in OUTPUT_SUFFIXES:
+            raise ValueError(f"Unsupported audio output format: {output_format}")
+        self.output_format = output_format
+        self.output_bitrate = output_bitrate
         self.services = {
             'elevenlabs': {'available': False, 'handler': None, 'max_chars': 5000},
             'pyttsx3': {'available': False, 'handler': None, 'max_chars': 5000},
             'gtts': {'available': True, 'handler': None, 'max_chars': 5000}
         }
-        self.file_locks: Dict[str, threading.Lock] = {}
-        self.retry_count = 3
+        self.retry_count = TTS_RETRY_COUNT
+        self.retry_backoff = TTS_RETRY_BACKOFF
+        self.executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix='tts')
+        self.scheduler = HedgedScheduler(max_workers=TTS_MAX_WORKERS)
+        # Bound in-flight requests per service to respect provider rate limits
+        self.service_slots = {
+            service: threading.BoundedSemaphore(TTS_SERVICE_CONCURRENCY.get(service, 1))
+            for service in self.services
+        }
+        # asyncio counterparts of service_slots, for the async server
+        self.async_service_slots = {
+            service: asyncio.Semaphore(TTS_SERVICE_CONCURRENCY.get(service, 1))
+            for service in self.services
+        }
+        self.playback = playback
+        self.player = None
         self._initialize_services()
-        self._initialize_audio()
-        self.temp_files: List[str] = []
+        if playback:
+            self._initialize_audio()
 
     def _initialize_services(self):
-        """Initialize TTS services with proper error handling"""
+        """Initialize the network TTS services; offline engines wait for warmup()"""
         try:
             self.services['elevenlabs']['handler'] = ElevenLabsHandler()
             self.services['elevenlabs']['available'] = True
         except Exception as e:
             logging.warning(f"ElevenLabs initialization failed: {e}")
 
+    def warmup(self):
+        """Start the pyttsx3 worker processes, each of which loads native speech drivers"""
+        if self.services['pyttsx3']['available']:
+            return
         try:
-            self.services['pyttsx3']['handler'] = pyttsx3.init()
+            pyttsx3_pool.start()
+            self.services['pyttsx3']['handler'] = pyttsx3_pool
             self.services['pyttsx3']['available'] = True
         except Exception as e:
             logging.warning(f"pyttsx3 initialization failed: {e}")
 
     def _initialize_audio(self):
-        """Initialize audio playback system"""
+        """Open the shared playback engine"""
         try:
-            pygame.mixer.init()
+            self.player = get_player()
         except Exception as e:
             logging.error(f"Failed to initialize audio system: {e}")
             raise TTSError("Audio system initialization failed")
 
     def _chunk_text(self, text: str, max_chars: int) -> List[str]:
-        """Split text into chunks that respect sentence boundaries."""
+        """Split text into paragraph-aligned chunks that respect sentence boundaries.
+
+        Chunk boundaries depend only on the surrounding paragraph, so texts
+        that share paragraphs produce identical chunks and share cache entries.
+        """
+        paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+        chunks = []
+        heading = ""
+        for paragraph in paragraphs:
+            # Fold short lines such as headings into the paragraph that follows
+            if heading:
+                paragraph = f"{heading}\n{paragraph}"
+                heading = ""
+            if len(paragraph) < 80:
+                heading = paragraph
+                continue
+            chunks.extend(self._pack_sentences(paragraph, max_chars))
+        if heading:
+            chunks.extend(self._pack_sentences(heading, max_chars))
+        return chunks or [text]
+
+    def _pack_sentences(self, text: str, max_chars: int) -> List[str]:
+        """Greedily pack sentences into chunks of at most max_chars."""
         if len(text) <= max_chars:
             return [text]
 
@@ -73,68 +138,309 @@ class TTSHandler:
         return chunks
 
     def _get_temp_file(self, suffix: str) -> str:
-        """Create and track temporary files."""
-        temp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-        self.temp_files.append(temp.name)
-        return temp.name
+        """Create a scratch file tracked by the artifact store."""
+        return artifact_store.new_path(suffix)
 
     def _combine_audio_files(self, audio_files: List[str]) -> str:
-        """Combine multiple audio files into a single file."""
-        combined_audio = AudioSegment.empty()
+        """Combine multiple audio files into one in the output format, streaming PCM block by block."""
+        combined_file = self._get_temp_file(OUTPUT_SUFFIXES[self.output_format])
+        with metrics.timed('audio_concat'):
+            concatenate_audio(audio_files, combined_file, self.output_format, self.output_bitrate)
         for audio_file in audio_files:
-            combined_audio += AudioSegment.from_file(audio_file)
-        combined_file = self._get_temp_file('.wav')
-        combined_audio.export(combined_file, format='wav')
+            self.cleanup_audio(audio_file)
         return combined_file
 
+    def _encode_output(self, audio_file: str) -> str:
+        """Re-encode a finished file in the compressed output format, if one is configured.
+
+        Encoding failures fall back to serving the file as produced.
+        """
+        suffix = OUTPUT_SUFFIXES[self.output_format]
+        if self.output_format == 'wav' or audio_file.endswith(suffix):
+            return audio_file
+        encoded_file = self._get_temp_file(suffix)
+        try:
+            with metrics.timed('audio_encode'):
+                concatenate_audio([audio_file], encoded_file, self.output_format, self.output_bitrate)
+        except (AudioDecodeError, OSError) as e:
+            logging.warning(f"Encoding audio as {self.output_format} failed: {e}")
+            self.cleanup_audio(encoded_file)
+            return audio_file
+        self.cleanup_audio(audio_file)
+        return encoded_file
+
     def text_to_speech(self, text, voice_id, fallback_order=['elevenlabs', 'pyttsx3', 'gtts']):
-        """Convert text to speech using available services with fallback"""
-        errors = []
-        
-        for service in fallback_order:
-            if not self.services[service]['available']:
-                continue
-                
+        """Convert text to speech, racing the next service in fallback_order if one is slow or failing"""
+        services = [service for service in fallback_order if self.services[service]['available']]
+        try:
+            # Deadlines are learned per 500 characters of text
+            with metrics.timed('tts_total'):
+                audio_file = self.scheduler.run(services, lambda service: self._synthesize(service, text, voice_id),
+                                                discard=self.cleanup_audio, units=max(1.0, len(text) / 500))
+        except AllProvidersFailed as e:
+            logging.error(str(e))
+            raise TTSError(str(e))
+        return self._encode_output(audio_file)
+
+    def _synthesize(self, service, text, voice_id):
+        """Synthesize a whole text with a single service."""
+        # Split text into manageable chunks
+        chunks = self._chunk_text(text, self.services[service]['max_chars'])
+        audio_files = self._synthesize_chunks(service, chunks, voice_id)
+        return self._combine_audio_files(audio_files) if len(audio_files) > 1 else audio_files[0]
+
+    def _synthesize_chunks(self, service, chunks, voice_id) -> List[str]:
+        """Synthesize chunks concurrently and return their files in text order."""
+        if len(chunks) == 1:
+            return [self._synthesize_chunk(service, chunks[0], voice_id)]
+
+        futures = [self.executor.submit(self._synthesize_chunk, service, chunk, voice_id) for chunk in chunks]
+        try:
+            return [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+                # Remove audio from chunks that succeeded or are still running
+                future.add_done_callback(self._discard_result)
+            raise
+
+    def _discard_result(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self.cleanup_audio(future.result())
+
+    def _synthesize_chunk(self, service, chunk, voice_id):
+        """Synthesize one chunk, serving it from the audio cache when possible."""
+        cache_key = None
+        if TTS_CACHE_ENABLED:
+            cache_key = tts_cache.make_key(chunk, service, voice_id if service == 'elevenlabs' else None,
+                                           self._voice_settings(service))
+            cached_file = self._copy_from_cache(cache_key)
+            if cached_file:
+                return cached_file
+
+        # ElevenLabs retries with backoff inside its HTTP session
+        attempts = 1 if service == 'elevenlabs' else self.retry_count
+        for attempt in range(attempts):
             try:
-                # Split text into manageable chunks
-                chunks = self._chunk_text(text, self.services[service]['max_chars'])
-                audio_files = []
-
-                for chunk in chunks:
-                    for attempt in range(self.retry_count):
-                        try:
-                            if service == 'elevenlabs':
-                                audio_files.append(self._eleven_labs_tts(chunk, voice_id))
-                            elif service == 'pyttsx3':
-                                audio_files.append(self._pyttsx3_tts(chunk))
-                            elif service == 'gtts':
-                                audio_files.append(self._gtts_tts(chunk))
-                            break
-                        except Exception as e:
-                            if attempt == self.retry_count - 1:
-                                raise e
-                            time.sleep(1)
-
-                return self._combine_audio_files(audio_files) if len(audio_files) > 1 else audio_files[0]
+                with self.service_slots[service], metrics.timed(f'tts_{service}'):
+                    if service == 'elevenlabs':
+                        audio_file = self._eleven_labs_tts(chunk, voice_id)
+                    elif service == 'pyttsx3':
+                        audio_file = self._pyttsx3_tts(chunk)
+                    elif service == 'gtts':
+                        audio_file = self._gtts_tts(chunk)
+                break
             except Exception as e:
-                errors.append(f"{service}: {str(e)}")
-                continue
+                if attempt == attempts - 1:
+                    raise e
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+        if cache_key:
+            tts_cache.put(cache_key, audio_file)
+        return audio_file
+
+    def _copy_from_cache(self, cache_key) -> Optional[str]:
+        """Copy a cached chunk to a temp file the caller is free to delete."""
+        cached_file = tts_cache.get(cache_key)
+        if cached_file is None:
+            return None
+        audio_file = self._get_temp_file(os.path.splitext(cached_file)[1])
+        try:
+            shutil.copyfile(cached_file, audio_file)
+        except OSError:
+            # Evicted between lookup and copy
+            self.cleanup_audio(audio_file)
+            return None
+        return audio_file
+
+    def _voice_settings(self, service) -> dict:
+        """Settings that change how a service renders a given text."""
+        handler = self.services[service]['handler']
+        if service == 'elevenlabs':
+            return {'model_id': handler.model_id, **handler.voice_settings}
+        if service == 'pyttsx3':
+            return handler.voice_settings
+        return {'lang': 'en'}
+
+    def stream_to_speech(self, sentences: Iterable[str], voice_id) -> Iterator[Tuple[str, str]]:
+        """Synthesize sentences as they arrive, yielding (sentence, audio_file) in order.
+
+        Reading the sentence source and synthesizing run on background threads,
+        so text generation, synthesis and the caller's playback overlap.
+        """
+        pending_text = queue.Queue(maxsize=32)
+        ready_audio = queue.Queue(maxsize=4)
+        stopped = threading.Event()
+        done = object()
+
+        def put(target, item):
+            # Give up once the consumer has gone away instead of blocking forever
+            while not stopped.is_set():
+                try:
+                    target.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_sentences():
+            try:
+                for sentence in sentences:
+                    if not put(pending_text, sentence):
+                        return
+                put(pending_text, done)
+            except Exception as e:
+                put(pending_text, e)
+            finally:
+                # Stop a generator source (e.g. a GPT stream) the consumer no longer needs
+                close = getattr(sentences, 'close', None)
+                if close is not None:
+                    close()
 
-        error_msg = "All TTS services failed: " + "; ".join(errors)
-        logging.error(error_msg)
-        raise TTSError(error_msg)
+        def synthesize_sentences():
+            while not stopped.is_set():
+                try:
+                    item = pending_text.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if item is done or isinstance(item, Exception):
+                    put(ready_audio, item)
+                    return
+                try:
+                    audio_file = self.text_to_speech(item, voice_id)
+                except Exception as e:
+                    put(ready_audio, e)
+                    return
+                if not put(ready_audio, (item, audio_file)):
+                    self.cleanup_audio(audio_file)
+                    return
+
+        threading.Thread(target=read_sentences, daemon=True).start()
+        threading.Thread(target=synthesize_sentences, daemon=True).start()
+
+        try:
+            while True:
+                item = ready_audio.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+
+    async def text_to_speech_async(self, text, voice_id, fallback_order=['elevenlabs', 'pyttsx3', 'gtts']):
+        """Async counterpart of text_to_speech for the async server.
+
+        Services race through the same scheduler, so hedging, health and
+        circuit breaking are shared with the sync path. ElevenLabs is awaited
+        on the event loop; the other services are local engines or blocking
+        clients and run on executor threads.
+        """
+        services = [service for service in fallback_order if self.services[service]['available']]
+
+        async def synthesize(service):
+            if service == 'elevenlabs':
+                return await self._synthesize_async(text, voice_id)
+            return await asyncio.to_thread(self._synthesize, service, text, voice_id)
+
+        try:
+            with metrics.timed('tts_total'):
+                audio_file = await self.scheduler.run_async(services, synthesize, discard=self.cleanup_audio,
+                                                            units=max(1.0, len(text) / 500))
+        except AllProvidersFailed as e:
+            logging.error(str(e))
+            raise TTSError(str(e))
+        # Encoding decodes PCM, so keep it off the event loop
+        return await asyncio.to_thread(self._encode_output, audio_file)
+
+    async def _synthesize_async(self, text, voice_id):
+        chunks = self._chunk_text(text, self.services['elevenlabs']['max_chars'])
+        results = await asyncio.gather(*(self._synthesize_chunk_async(chunk, voice_id) for chunk in chunks),
+                                       return_exceptions=True)
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    self.cleanup_audio(result)
+            raise failures[0]
+        if len(results) == 1:
+            return results[0]
+        # Concatenation decodes PCM, so keep it off the event loop
+        return await asyncio.to_thread(self._combine_audio_files, results)
+
+    async def _synthesize_chunk_async(self, chunk, voice_id):
+        cache_key = None
+        if TTS_CACHE_ENABLED:
+            cache_key = tts_cache.make_key(chunk, 'elevenlabs', voice_id, self._voice_settings('elevenlabs'))
+            cached_file = await asyncio.to_thread(self._copy_from_cache, cache_key)
+            if cached_file:
+                return cached_file
+
+        async with self.async_service_slots['elevenlabs']:
+            with metrics.timed('tts_elevenlabs'):
+                audio_file = await self.services['elevenlabs']['handler'].atext_to_speech(chunk, voice_id)
+
+        if cache_key:
+            await asyncio.to_thread(tts_cache.put, cache_key, audio_file)
+        return audio_file
+
+    async def stream_to_speech_async(self, sentences: AsyncIterable[str], voice_id,
+                                     lookahead: int = 4) -> AsyncIterator[Tuple[str, str]]:
+        """Async counterpart of stream_to_speech.
+
+        Up to lookahead sentences are synthesized concurrently ahead of the
+        one being yielded.
+        """
+        pending = asyncio.Queue(maxsize=lookahead)
+        done = object()
+
+        async def read_sentences():
+            try:
+                async for sentence in sentences:
+                    task = asyncio.ensure_future(self.text_to_speech_async(sentence, voice_id))
+                    await pending.put((sentence, task))
+                await pending.put(done)
+            except Exception as e:
+                await pending.put(e)
+
+        reader = asyncio.ensure_future(read_sentences())
+        try:
+            while True:
+                item = await pending.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                sentence, task = item
+                yield sentence, await task
+        finally:
+            reader.cancel()
+            # Drop audio for sentences the consumer will never see
+            while not pending.empty():
+                item = pending.get_nowait()
+                if isinstance(item, tuple):
+                    item[1].add_done_callback(self._discard_task_result)
+                    item[1].cancel()
+
+    def _discard_task_result(self, task):
+        if not task.cancelled() and task.exception() is None:
+            self.cleanup_audio(task.result())
 
     def _eleven_labs_tts(self, text, voice_id):
         return self.services['elevenlabs']['handler'].text_to_speech(text, voice_id)
 
     def _pyttsx3_tts(self, text):
         wav_file = self._get_temp_file('.wav')
-        self.services['pyttsx3']['handler'].save_to_file(text, wav_file)
-        self.services['pyttsx3']['handler'].runAndWait()
-        return wav_file
+        try:
+            return self.services['pyttsx3']['handler'].synthesize(text, wav_file)
+        except Exception:
+            self.cleanup_audio(wav_file)
+            raise
 
     def _gtts_tts(self, text):
         mp3_file = self._get_temp_file('.mp3')
+        from gtts import gTTS
         tts = gTTS(text=text, lang='en')
         tts.save(mp3_file)
         # Convert MP3 to WAV for better compatibility
@@ -143,15 +449,26 @@ class TTSHandler:
     def _convert_to_wav(self, mp3_file):
         """Convert MP3 to WAV format for better playback compatibility"""
         try:
-            wav_file = mp3_file.replace('.mp3', '.wav')
-            audio = AudioSegment.from_mp3(mp3_file)
-            audio.export(wav_file, format='wav')
-            os.remove(mp3_file)  # Clean up the MP3 file
+            wav_file = self._get_temp_file('.wav')
+            convert_to_wav(mp3_file, wav_file)
+            self.cleanup_audio(mp3_file)  # Clean up the MP3 file
             return wav_file
         except Exception as e:
             raise TTSError(f"Audio conversion failed: {e}")
 
     def play_audio(self, audio_file):
+        """Play a file after anything already queued, blocking until it ends."""
+        item = self.queue_audio(audio_file)
+        with metrics.timed('playback'):
+            item.wait()
+        if item.error is not None:
+            logging.error(f"Playback error: {item.error}")
+
+    def queue_audio(self, audio_file, label=None, cleanup=False):
+        """Queue a file for gapless playback and return its PlaybackItem without waiting.
+
+        With cleanup=True the file is deleted as soon as it has been decoded.
+        """
         if not os.path.exists(audio_file):
             raise TTSError(f"Audio file not found: {audio_file}")
 
@@ -160,16 +477,32 @@ class TTSHandler:
         except Exception as e:
             raise TTSError(f"Invalid audio file: {e}")
 
-        pygame.mixer.music.load(audio_file)
-        pygame.mixer.music.play()
-        
-        try:
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
-        except Exception as e:
-            logging.error(f"Playback error: {e}")
-        finally:
-            pygame.mixer.music.unload()
+        if self.player is None:
+            self._initialize_audio()
+        return self.player.enqueue(audio_file, label, after_decode=self.cleanup_audio if cleanup else None)
+
+    def speak(self, text, voice_id, on_audio=None):
+        """Synthesize and play text chunk by chunk, starting as soon as the first chunk is ready.
+
+        on_audio, if given, is called with each chunk's audio file before it is queued.
+        """
+        chunks = self._chunk_text(text, min(service['max_chars'] for service in self.services.values()))
+        for _, audio_file in self.stream_to_speech(chunks, voice_id):
+            if on_audio is not None:
+                on_audio(audio_file)
+            self.queue_audio(audio_file, cleanup=True)
+        self.wait_for_playback()
+
+    def wait_for_playback(self):
+        """Block until everything queued has been played."""
+        if self.player is not None:
+            with metrics.timed('playback'):
+                self.player.wait_idle()
+
+    def stop_playback(self):
+        """Interrupt the current clip and drop everything queued."""
+        if self.player is not None:
+            self.player.interrupt()
 
     def _validate_audio_file(self, audio_file):
         """Validate audio file before playback"""
@@ -179,5 +512,4 @@ class TTSHandler:
                     raise TTSError("Invalid WAV file format")
 
     def cleanup_audio(self, audio_file):
-        from temp_file_manager import temp_file_manager
-        temp_file_manager.remove_file(audio_file)
+        artifact_store.discard(audio_file)
@@ -0,0 +1,110 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from config import WHISPER_MODEL, WHISPER_MEMORY_CAP_MB
+
+class WhisperModelRegistry:
+    """Process-wide cache of loaded Whisper models.
+
+    Each model is loaded once and kept resident; when the total size goes
+    over the memory cap the least recently used models are evicted.
+    """
+
+    def __init__(self, default_model: str = WHISPER_MODEL, memory_cap_mb: int = WHISPER_MEMORY_CAP_MB):
+        self.default_model = default_model
+        self.memory_cap_bytes = memory_cap_mb * 1024 * 1024
+        self._models: "OrderedDict[str, dict]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name: Optional[str] = None):
+        """Return a resident model, loading it on first use."""
+        name = name or self.default_model
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                return self._touch(name, entry)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so resident models stay usable meanwhile
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    return self._touch(name, entry)
+
+            started = time.perf_counter()
+            import whisper
+            model = whisper.load_model(name)
+            entry = {
+                'model': model,
+                'bytes': self._model_bytes(model),
+                'load_seconds': time.perf_counter() - started,
+                'last_used': time.time(),
+                'uses': 0
+            }
+            logging.info(f"Loaded Whisper model '{name}' in {entry['load_seconds']:.1f}s")
+
+            with self._lock:
+                self._models[name] = entry
+                self.loads += 1
+                self._evict(keep=name)
+                return self._touch(name, entry)
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> None:
+        """Load models ahead of the first transcription."""
+        for name in names or [self.default_model]:
+            self.get(name)
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            self._models.pop(name, None)
+
+    def stats(self) -> dict:
+        """Resident models with their size and usage, plus registry totals."""
+        with self._lock:
+            return {
+                'models': {
+                    name: {
+                        'bytes': entry['bytes'],
+                        'load_seconds': entry['load_seconds'],
+                        'last_used': entry['last_used'],
+                        'uses': entry['uses']
+                    }
+                    for name, entry in self._models.items()
+                },
+                'resident_bytes': sum(entry['bytes'] for entry in self._models.values()),
+                'memory_cap_bytes': self.memory_cap_bytes,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
+
+    def _touch(self, name: str, entry: dict):
+        entry['last_used'] = time.time()
+        entry['uses'] += 1
+        self._models.move_to_end(name)
+        return entry['model']
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used models until the cap is respected."""
+        total = sum(entry['bytes'] for entry in self._models.values())
+        for name in list(self._models):
+            if total <= self.memory_cap_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._models.pop(name)['bytes']
+            self.evictions += 1
+            logging.info(f"Evicted Whisper model '{name}' to stay under the memory cap")
+
+    @staticmethod
+    def _model_bytes(model) -> int:
+        params = sum(p.numel() * p.element_size() for p in model.parameters())
+        buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+        return params + buffers
+
+whisper_registry = WhisperModelRegistry()